@@ -3,6 +3,10 @@ ASGI config for carona project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+O stream SSE de notificacao (notificacao:api_eventos) só funciona servido por
+aqui, num servidor ASGI (ex.: `uvicorn carona.asgi:application`); sob WSGI ele
+responde 204 e o front-end continua no polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -78,7 +78,8 @@ INSTALLED_APPS = [
     'passageiros',
     'pagamentos',
     'corrida',
-    'notificacao', 
+    'notificacao',
+    'fila',
 ]
 
 MIDDLEWARE = [
@@ -107,6 +108,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notificacao.context_processors.notificacoes',
             ],
         },
     },
@@ -125,6 +127,33 @@ DATABASES = {
     }
 }
 
+# Modo SQLite para concorrência (WAL + BEGIN IMMEDIATE).
+# Os PRAGMAs são aplicados a cada nova conexão; desative com SQLITE_WAL=0.
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 20))  # segundos
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # seguro com WAL (só perde a última transação em queda de energia)
+    "busy_timeout": SQLITE_BUSY_TIMEOUT * 1000,  # ms
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 134217728)),  # 128 MB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -65536)),  # negativo = KiB (64 MB)
+    "temp_store": "MEMORY",
+}
+
+if SQLITE_WAL:
+    DATABASES['default']['OPTIONS'] = {
+        # escritas pegam o lock na abertura da transação, evitando
+        # "database is locked" na promoção de leitura para escrita.
+        # Por isso nenhuma transação pode fazer I/O de rede (HTTP na AbacatePay
+        # etc.): o lock ficaria preso durante a chamada, bloqueando todo escritor
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'init_command': ''.join(f"PRAGMA {k}={v};" for k, v in SQLITE_PRAGMAS.items()),
+    }
+    # conexões persistentes (evita reabrir o arquivo e reaplicar os PRAGMAs a cada request)
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -168,6 +197,9 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Blob store dos QR Codes PIX (pagamentos/qr.py), endereçado por sha256
+PAGAMENTOS_QR_DIR = os.getenv("PAGAMENTOS_QR_DIR", os.path.join(BASE_DIR, 'media', 'qr'))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
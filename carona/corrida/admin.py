@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Corrida, SolicitacaoCarona
+from .models import Corrida, CorridaHistorico, SolicitacaoCarona
 
 
 @admin.register(SolicitacaoCarona)
@@ -70,3 +70,12 @@ class CorridaAdmin(admin.ModelAdmin):
         self.message_user(request, f"{count} corrida(s) selecionadas — exportação fictícia executada.")
     exportar_selecionadas_json.short_description = "Exportar corridas selecionadas (exemplo)"
 
+
+
+@admin.register(CorridaHistorico)
+class CorridaHistoricoAdmin(admin.ModelAdmin):
+    list_display = ("corrida_id", "motorista", "origem", "destino", "data", "status", "passageiros", "arquivada_em")
+    list_filter = ("status", "data")
+    search_fields = ("origem", "destino", "motorista__nome", "motorista__email")
+    exclude = ("rota_comprimida",)
+    readonly_fields = ("arquivada_em",)
@@ -0,0 +1,16 @@
+# corrida/management/commands/arquivar_corridas.py
+from django.core.management.base import BaseCommand
+
+from corrida.services.arquivamento import DIAS_PADRAO, LOTE_PADRAO, arquivar_corridas
+
+
+class Command(BaseCommand):
+    help = "Move corridas finalizadas/canceladas antigas para o histórico compacto."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=DIAS_PADRAO, help="Idade mínima (dias desde o encerramento)")
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+
+    def handle(self, *args, **opts):
+        total = arquivar_corridas(dias=opts["dias"], lote=opts["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{total} corrida(s) arquivada(s)."))
@@ -0,0 +1,146 @@
+# corrida/management/commands/benchmark_sqlite.py
+"""
+Benchmark de concorrência do SQLite: compara o modo padrão (journal DELETE +
+BEGIN DEFERRED) com o modo de produção configurado em settings (WAL + PRAGMAs +
+BEGIN IMMEDIATE).
+
+A carga imita o aceite de solicitações: cada transação lê as vagas da corrida,
+decrementa e grava uma notificação, enquanto threads leitoras simulam a busca.
+
+Uso:
+    python manage.py benchmark_sqlite --escritores 8 --leitores 4 --segundos 5
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = """
+CREATE TABLE corrida (id INTEGER PRIMARY KEY, vagas INTEGER NOT NULL, origem TEXT, destino TEXT);
+CREATE TABLE notificacao (id INTEGER PRIMARY KEY, corrida_id INTEGER, mensagem TEXT);
+"""
+
+
+def _conectar(caminho, modo_wal, timeout):
+    conn = sqlite3.connect(caminho, timeout=timeout, isolation_level=None, check_same_thread=False)
+    if modo_wal:
+        for chave, valor in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            conn.execute(f"PRAGMA {chave}={valor}")
+    return conn
+
+
+def _preparar_banco(caminho, modo_wal, corridas):
+    conn = _conectar(caminho, modo_wal, timeout=5)
+    conn.executescript(SCHEMA)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO corrida (id, vagas, origem, destino) VALUES (?, ?, ?, ?)",
+        [(i, 10 ** 9, f"Origem {i}", f"Destino {i}") for i in range(1, corridas + 1)],
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _rodar(modo_wal, escritores, leitores, segundos, corridas, timeout):
+    fd, caminho = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(fd)
+    os.unlink(caminho)
+    _preparar_banco(caminho, modo_wal, corridas)
+
+    begin = "BEGIN IMMEDIATE" if modo_wal else "BEGIN"
+    fim = time.monotonic() + segundos
+    lock = threading.Lock()
+    stats = {"commits": 0, "erros_lock": 0, "leituras": 0}
+
+    def escritor(n):
+        conn = _conectar(caminho, modo_wal, timeout)
+        i = n
+        while time.monotonic() < fim:
+            corrida_id = (i % corridas) + 1
+            i += escritores
+            try:
+                conn.execute(begin)
+                vagas = conn.execute("SELECT vagas FROM corrida WHERE id = ?", (corrida_id,)).fetchone()[0]
+                if vagas > 0:
+                    conn.execute("UPDATE corrida SET vagas = vagas - 1 WHERE id = ?", (corrida_id,))
+                    conn.execute(
+                        "INSERT INTO notificacao (corrida_id, mensagem) VALUES (?, ?)",
+                        (corrida_id, "Sua solicitação foi ACEITA!"),
+                    )
+                conn.execute("COMMIT")
+                with lock:
+                    stats["commits"] += 1
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                with lock:
+                    stats["erros_lock"] += 1
+        conn.close()
+
+    def leitor(n):
+        conn = _conectar(caminho, modo_wal, timeout)
+        while time.monotonic() < fim:
+            try:
+                conn.execute("SELECT id, vagas, origem, destino FROM corrida WHERE vagas > 0 LIMIT 50").fetchall()
+                with lock:
+                    stats["leituras"] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    stats["erros_lock"] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=escritor, args=(n,)) for n in range(escritores)]
+    threads += [threading.Thread(target=leitor, args=(n,)) for n in range(leitores)]
+    inicio = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.monotonic() - inicio
+
+    for sufixo in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.unlink(caminho + sufixo)
+        except FileNotFoundError:
+            pass
+
+    stats["duracao"] = duracao
+    stats["commits_s"] = stats["commits"] / duracao if duracao else 0.0
+    stats["leituras_s"] = stats["leituras"] / duracao if duracao else 0.0
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Mede throughput de escrita concorrente no SQLite (modo padrão x WAL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escritores", type=int, default=8)
+        parser.add_argument("--leitores", type=int, default=4)
+        parser.add_argument("--segundos", type=float, default=5.0)
+        parser.add_argument("--corridas", type=int, default=20, help="Corridas disputadas (menos = mais contenção)")
+        parser.add_argument("--timeout", type=float, default=5.0, help="Timeout de lock por conexão (s)")
+
+    def handle(self, *args, **opts):
+        resultados = {}
+        for nome, modo_wal in (("padrao", False), ("wal", True)):
+            self.stdout.write(f"Rodando modo {nome}...")
+            resultados[nome] = _rodar(
+                modo_wal, opts["escritores"], opts["leitores"], opts["segundos"], opts["corridas"], opts["timeout"]
+            )
+
+        self.stdout.write("")
+        self.stdout.write(f"{'modo':<8} {'commits':>9} {'commits/s':>10} {'leituras/s':>11} {'erros lock':>11}")
+        for nome, r in resultados.items():
+            self.stdout.write(
+                f"{nome:<8} {r['commits']:>9} {r['commits_s']:>10.1f} {r['leituras_s']:>11.1f} {r['erros_lock']:>11}"
+            )
+
+        base = resultados["padrao"]["commits_s"]
+        if base:
+            ganho = resultados["wal"]["commits_s"] / base
+            self.stdout.write(self.style.SUCCESS(f"Ganho de throughput de escrita: {ganho:.2f}x"))
@@ -0,0 +1,30 @@
+# corrida/management/commands/expirar_corridas.py
+"""
+Expira corridas ativas vencidas. Pensado para rodar periodicamente (cron),
+ex.: */10 * * * * python manage.py expirar_corridas
+ou em loop com --intervalo.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from corrida.services.expiracao import LOTE_PADRAO, expirar_corridas_vencidas
+
+
+class Command(BaseCommand):
+    help = "Move corridas ativas cuja saída já passou para o status 'expirada'."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+        parser.add_argument("--intervalo", type=int, default=0, help="Segundos entre varreduras (0 = roda uma vez)")
+
+    def handle(self, *args, **opts):
+        while True:
+            resultado = expirar_corridas_vencidas(lote=opts["lote"])
+            self.stdout.write(
+                f"{resultado['corridas']} corrida(s) expirada(s), "
+                f"{resultado['solicitacoes']} solicitação(ões) pendente(s) encerrada(s)."
+            )
+            if not opts["intervalo"]:
+                break
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,18 @@
+# corrida/management/commands/reindexar_busca.py
+from django.core.management.base import BaseCommand
+
+from corrida.services.busca import fts_disponivel, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice FTS de busca textual das corridas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        if not fts_disponivel():
+            self.stdout.write(self.style.WARNING("Índice FTS indisponível neste banco (rode as migrações no SQLite)."))
+            return
+        total = reconstruir_indice(lote=opts["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{total} corrida(s) indexada(s)."))
@@ -0,0 +1,54 @@
+# Índice FTS5 para o fallback textual da busca de corridas
+
+import unicodedata
+
+from django.db import migrations
+
+
+CAMPOS = (
+    "origem", "destino",
+    "bairro_origem", "bairro_destino",
+    "cidade_origem", "cidade_destino",
+    "estado_origem", "estado_destino",
+)
+
+
+def _normalizar(txt):
+    if not txt:
+        return ""
+    sem_acento = ''.join(c for c in unicodedata.normalize('NFKD', txt) if not unicodedata.combining(c))
+    return sem_acento.strip().lower()
+
+
+def criar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    Corrida = apps.get_model("corrida", "Corrida")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS corrida_busca "
+        "USING fts5(texto, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    linhas = []
+    for c in Corrida.objects.only("id", *CAMPOS).iterator(chunk_size=1000):
+        texto = " ".join(p for p in (_normalizar(getattr(c, f)) for f in CAMPOS) if p)
+        linhas.append((c.pk, texto))
+    if linhas:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany("INSERT INTO corrida_busca (rowid, texto) VALUES (%s, %s)", linhas)
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS corrida_busca")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0010_corridatemplate_corrida_parent_template'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0011_corrida_busca_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='corrida',
+            name='status',
+            field=models.CharField(choices=[('ativa', 'Ativa'), ('em_andamento', 'Em andamento'), ('finalizada', 'Finalizada'), ('cancelada', 'Cancelada'), ('expirada', 'Expirada')], default='ativa', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='corrida',
+            index=models.Index(fields=['status', 'data'], name='corrida_cor_status_5f6f46_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0012_corrida_status_expirada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorridaHistorico',
+            fields=[
+                ('corrida', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='historico', serialize=False, to='corrida.corrida')),
+                ('origem', models.CharField(max_length=100)),
+                ('destino', models.CharField(max_length=100)),
+                ('cidade_origem', models.CharField(blank=True, max_length=50, null=True)),
+                ('cidade_destino', models.CharField(blank=True, max_length=50, null=True)),
+                ('data', models.DateField(blank=True, null=True)),
+                ('horario_saida', models.TimeField(blank=True, null=True)),
+                ('valor', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('status', models.CharField(choices=[('ativa', 'Ativa'), ('em_andamento', 'Em andamento'), ('finalizada', 'Finalizada'), ('cancelada', 'Cancelada'), ('expirada', 'Expirada')], max_length=20)),
+                ('distancia_m', models.FloatField(blank=True, null=True)),
+                ('passageiros', models.PositiveIntegerField(default=0)),
+                ('rota_comprimida', models.BinaryField(blank=True, null=True)),
+                ('iniciada_em', models.DateTimeField(blank=True, null=True)),
+                ('encerrada_em', models.DateTimeField(blank=True, null=True)),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('motorista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_corridas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Histórico de Corrida',
+                'verbose_name_plural': 'Histórico de Corridas',
+                'indexes': [models.Index(fields=['motorista', '-data'], name='corrida_cor_motoris_448aa0_idx')],
+            },
+        ),
+    ]
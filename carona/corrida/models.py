@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -69,12 +72,14 @@ class Corrida(models.Model):
     STATUS_EM_ANDAMENTO = 'em_andamento'
     STATUS_FINALIZADA = 'finalizada'
     STATUS_CANCELADA = 'cancelada'
+    STATUS_EXPIRADA = 'expirada'
 
     STATUS_CHOICES = [
         (STATUS_ATIVA, 'Ativa'),
         (STATUS_EM_ANDAMENTO, 'Em andamento'),
         (STATUS_FINALIZADA, 'Finalizada'),
         (STATUS_CANCELADA, 'Cancelada'),
+        (STATUS_EXPIRADA, 'Expirada'),
     ]
 
     motorista = models.ForeignKey(
@@ -127,6 +132,12 @@ class Corrida(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # varredura de expiração: status='ativa' AND data < hoje
+            models.Index(fields=['status', 'data']),
+        ]
+
     def __str__(self):
         return f'Corrida {self.origem} → {self.destino} ({self.motorista})'
 
@@ -177,31 +188,11 @@ class Corrida(models.Model):
         self.iniciada_em = timezone.now()
         self.save(update_fields=['status', 'iniciada_em', 'atualizado_em'])
 
-        # --- gera Payment automaticamente ---
-        from pagamentos.models import Payment
-        from pagamentos.services import criar_pix_qr  # ajuste para onde você implementou
-
-        if not Payment.objects.filter(corrida=self).exists():
-            valor = self.valor or (self.parent_template.valor if self.parent_template else 0)
-            amount_cents = int(round(float(valor) * 100))
-
-            p = Payment.objects.create(
-                corrida=self,
-                user=None,  # passageiros ainda não definidos
-                amount_cents=amount_cents,
-                status="PENDING"
-            )
-
-            external_id = f"corrida-{self.id}-payment-{p.id}"
-            result = criar_pix_qr(amount_cents, f"Pagamento corrida #{self.id}", external_id)
-
-            if result.get("ok"):
-                data = result.get("data", {})
-                p.brCode = data.get("brCode")
-                p.brCodeBase64 = data.get("brCodeBase64")
-                p.abacate_id = data.get("id")
-                p.status = "CREATED"
-                p.save()
+        # --- gera um Payment por passageiro aceito ---
+        # só grava os Payments e as entradas da outbox; as cobranças PIX (HTTP na AbacatePay)
+        # são criadas em lote depois do commit por um job da fila — ver pagamentos/cobrancas.py
+        from pagamentos.cobrancas import registrar_cobrancas_da_corrida
+        registrar_cobrancas_da_corrida(self)
 
         return True
 
@@ -215,20 +206,19 @@ class Corrida(models.Model):
         return True
 
     def decrease_vaga(self):
-        if self.vagas_disponiveis <= 0:
+        # UPDATE condicional (vagas > 0) — ver services/vagas.py
+        from .services.vagas import reservar_vagas
+        if not reservar_vagas(self.id):
             return False
-        self.vagas_disponiveis -= 1
-        self.save(update_fields=['vagas_disponiveis', 'atualizado_em'])
+        self.refresh_from_db(fields=['vagas_disponiveis', 'atualizado_em'])
         return True
 
     def increase_vaga(self):
-        # respeita max_passengers do template quando presente
-        if self.parent_template:
-            max_p = self.parent_template.max_passengers
-            if self.vagas_disponiveis >= max_p:
-                return False
-        self.vagas_disponiveis += 1
-        self.save(update_fields=['vagas_disponiveis', 'atualizado_em'])
+        # respeita max_passengers do template quando presente (na própria condição do UPDATE)
+        from .services.vagas import liberar_vagas
+        if not liberar_vagas(self.id):
+            return False
+        self.refresh_from_db(fields=['vagas_disponiveis', 'atualizado_em'])
         return True
 
     def confirmed_passengers_count(self):
@@ -269,3 +259,51 @@ class SolicitacaoCarona(models.Model):
 
 
 
+
+
+class CorridaHistorico(models.Model):
+    """
+    Registro compacto (frio) de corridas finalizadas/canceladas antigas.
+    A linha em Corrida continua existindo (SolicitacaoCarona e Payment apontam para ela),
+    mas sem a geometria; a rota fica aqui comprimida (zlib). Ver services/arquivamento.py.
+    """
+    corrida = models.OneToOneField(Corrida, on_delete=models.CASCADE, primary_key=True, related_name='historico')
+    motorista = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='historico_corridas'
+    )
+
+    origem = models.CharField(max_length=100)
+    destino = models.CharField(max_length=100)
+    cidade_origem = models.CharField(max_length=50, blank=True, null=True)
+    cidade_destino = models.CharField(max_length=50, blank=True, null=True)
+
+    data = models.DateField(null=True, blank=True)
+    horario_saida = models.TimeField(null=True, blank=True)
+    valor = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Corrida.STATUS_CHOICES)
+    distancia_m = models.FloatField(null=True, blank=True)
+    passageiros = models.PositiveIntegerField(default=0)
+
+    rota_comprimida = models.BinaryField(null=True, blank=True)
+
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    encerrada_em = models.DateTimeField(null=True, blank=True)
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Histórico de Corrida"
+        verbose_name_plural = "Histórico de Corridas"
+        indexes = [
+            models.Index(fields=['motorista', '-data']),
+        ]
+
+    def __str__(self):
+        return f'Histórico {self.origem} → {self.destino} ({self.data})'
+
+    def rota(self):
+        """Descomprime a rota arquivada ([[lat, lon], ...])."""
+        if not self.rota_comprimida:
+            return []
+        return json.loads(zlib.decompress(bytes(self.rota_comprimida)).decode('utf-8'))
@@ -0,0 +1,108 @@
+# corrida/services/arquivamento.py
+"""
+Separação quente/frio das corridas.
+
+Corridas finalizadas, canceladas ou expiradas há mais de N dias ganham um registro
+compacto em CorridaHistorico (com a rota comprimida) e a linha em Corrida é
+"esvaziada": rota, bbox e pontos_count são zerados e a corrida sai do índice de
+busca. A linha em si permanece para preservar os vínculos de SolicitacaoCarona e
+Payment.
+"""
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from corrida.models import Corrida, CorridaHistorico, SolicitacaoCarona
+from corrida.services.busca import remover_do_indice
+
+logger = logging.getLogger(__name__)
+
+DIAS_PADRAO = getattr(settings, "CORRIDA_ARQUIVAMENTO_DIAS", 90)
+LOTE_PADRAO = 200
+
+STATUS_ARQUIVAVEIS = (Corrida.STATUS_FINALIZADA, Corrida.STATUS_CANCELADA, Corrida.STATUS_EXPIRADA)
+
+
+def comprimir_rota(rota) -> Optional[bytes]:
+    if not rota:
+        return None
+    return zlib.compress(json.dumps(rota, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def corridas_arquivaveis(corte: datetime):
+    return Corrida.objects.filter(
+        Q(encerrada_em__lt=corte) | Q(encerrada_em__isnull=True, atualizado_em__lt=corte),
+        status__in=STATUS_ARQUIVAVEIS,
+        historico__isnull=True,
+    )
+
+
+def _arquivar_lote(corte, lote):
+    with transaction.atomic():
+        corridas = list(
+            corridas_arquivaveis(corte)
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("id")[:lote]
+        )
+        if not corridas:
+            return 0
+
+        ids = [c.id for c in corridas]
+        passageiros = dict(
+            SolicitacaoCarona.objects
+            .filter(corrida_id__in=ids, status=SolicitacaoCarona.STATUS_ACEITA)
+            .values("corrida_id")
+            .annotate(n=Count("id"))
+            .values_list("corrida_id", "n")
+        )
+
+        CorridaHistorico.objects.bulk_create([
+            CorridaHistorico(
+                corrida_id=c.id,
+                motorista_id=c.motorista_id,
+                origem=c.origem,
+                destino=c.destino,
+                cidade_origem=c.cidade_origem,
+                cidade_destino=c.cidade_destino,
+                data=c.data,
+                horario_saida=c.horario_saida,
+                valor=c.valor,
+                status=c.status,
+                distancia_m=c.distancia_m,
+                passageiros=passageiros.get(c.id, 0),
+                rota_comprimida=comprimir_rota(c.rota),
+                iniciada_em=c.iniciada_em,
+                encerrada_em=c.encerrada_em,
+            )
+            for c in corridas
+        ])
+
+        Corrida.objects.filter(id__in=ids).update(
+            rota=[],
+            pontos_count=0,
+            bbox_min_lat=None, bbox_max_lat=None,
+            bbox_min_lon=None, bbox_max_lon=None,
+        )
+        remover_do_indice(ids)
+    return len(corridas)
+
+
+def arquivar_corridas(dias: int = DIAS_PADRAO, lote: int = LOTE_PADRAO, agora: Optional[datetime] = None) -> int:
+    """Arquiva em lotes as corridas encerradas há mais de `dias`. Retorna o total arquivado."""
+    corte = (agora or timezone.now()) - timedelta(days=dias)
+    total = 0
+    while True:
+        n = _arquivar_lote(corte, lote)
+        total += n
+        if n < lote:
+            break
+    if total:
+        logger.info("Arquivadas %s corrida(s) encerradas antes de %s", total, corte.isoformat())
+    return total
@@ -0,0 +1,158 @@
+# corrida/services/busca.py
+"""
+Índice de busca textual das corridas (SQLite FTS5).
+
+A tabela virtual `corrida_busca` guarda, por corrida (rowid = corrida.id), uma cópia
+sem acentos e em minúsculas dos campos de endereço. É mantida em sincronia pelos
+signals de Corrida (ver corrida/signals.py) e consultada com MATCH + bm25, de modo
+que "sao paulo" encontra "São Paulo" sem varrer a tabela de corridas.
+
+Em bancos sem FTS5 (ex.: Postgres) cai no filtro antigo por icontains.
+"""
+import logging
+import re
+from typing import Iterable, List
+
+from django.db import connection
+from django.db.models import Q
+
+from corrida.models import Corrida
+from corrida.utils import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+TABELA_BUSCA = "corrida_busca"
+
+CAMPOS_BUSCA = (
+    "origem", "destino",
+    "bairro_origem", "bairro_destino",
+    "cidade_origem", "cidade_destino",
+    "estado_origem", "estado_destino",
+)
+
+LIMITE_RESULTADOS = 200
+
+_fts_disponivel = None
+
+
+def fts_disponivel() -> bool:
+    """True se o banco atual é SQLite e a tabela FTS já foi criada (migração 0011)."""
+    global _fts_disponivel
+    if _fts_disponivel is None:
+        if connection.vendor != "sqlite":
+            _fts_disponivel = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA_BUSCA]
+                )
+                _fts_disponivel = cursor.fetchone() is not None
+    return _fts_disponivel
+
+
+def texto_indexavel(corrida) -> str:
+    """Concatena os campos de endereço normalizados (sem acento, minúsculo)."""
+    partes = (normalizar_texto(getattr(corrida, campo, None) or "") for campo in CAMPOS_BUSCA)
+    return " ".join(p for p in partes if p)
+
+
+def indexar_corrida(corrida) -> None:
+    if not fts_disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA} WHERE rowid = %s", [corrida.pk])
+        cursor.execute(
+            f"INSERT INTO {TABELA_BUSCA} (rowid, texto) VALUES (%s, %s)",
+            [corrida.pk, texto_indexavel(corrida)],
+        )
+
+
+def remover_do_indice(corrida_ids: Iterable[int]) -> None:
+    ids = list(corrida_ids)
+    if not ids or not fts_disponivel():
+        return
+    with connection.cursor() as cursor:
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA} WHERE rowid IN ({placeholders})", ids)
+
+
+def reconstruir_indice(lote: int = 1000) -> int:
+    """Recria o índice inteiro a partir da tabela de corridas. Retorna o total indexado."""
+    if not fts_disponivel():
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_BUSCA}")
+        qs = Corrida.objects.only("id", *CAMPOS_BUSCA).order_by("id")
+        linhas = []
+        for corrida in qs.iterator(chunk_size=lote):
+            linhas.append((corrida.pk, texto_indexavel(corrida)))
+            if len(linhas) >= lote:
+                cursor.executemany(f"INSERT INTO {TABELA_BUSCA} (rowid, texto) VALUES (%s, %s)", linhas)
+                total += len(linhas)
+                linhas = []
+        if linhas:
+            cursor.executemany(f"INSERT INTO {TABELA_BUSCA} (rowid, texto) VALUES (%s, %s)", linhas)
+            total += len(linhas)
+    return total
+
+
+def _palavras(termo: str) -> List[str]:
+    return re.findall(r"\w+", normalizar_texto(termo))
+
+
+def montar_consulta_fts(termo: str) -> str:
+    """
+    Cada palavra vira um prefixo ("paul"*) e a frase inteira entra como frase exata,
+    tudo em OR — mesma semântica do filtro antigo, mas ranqueada pelo bm25
+    (corridas que batem mais termos aparecem primeiro).
+    """
+    palavras = _palavras(termo)
+    if not palavras:
+        return ""
+    partes = [f'"{p}"*' for p in dict.fromkeys(palavras)]
+    if len(palavras) > 1:
+        partes.append('"' + " ".join(palavras) + '"')
+    return " OR ".join(partes)
+
+
+def _filtro_icontains(termo: str) -> Q:
+    termo_busca = normalizar_texto(termo)
+    palavras = [p for p in termo_busca.split() if p]
+    tokens = list(dict.fromkeys(palavras + [termo_busca]))
+
+    texto_q = Q()
+    for t in tokens:
+        for campo in CAMPOS_BUSCA:
+            texto_q |= Q(**{f"{campo}__icontains": t})
+    return texto_q
+
+
+def buscar_corridas_texto(termo: str, status: str = Corrida.STATUS_ATIVA, limite: int = LIMITE_RESULTADOS) -> List[Corrida]:
+    """
+    Retorna as corridas (no status pedido) cujo endereço casa com `termo`,
+    ordenadas por relevância.
+    """
+    if not fts_disponivel():
+        return list(Corrida.objects.filter(Q(status=status) & _filtro_icontains(termo)).distinct()[:limite])
+
+    consulta = montar_consulta_fts(termo)
+    if not consulta:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT c.id
+              FROM {TABELA_BUSCA} b
+              JOIN {Corrida._meta.db_table} c ON c.id = b.rowid
+             WHERE {TABELA_BUSCA} MATCH %s AND c.status = %s
+             ORDER BY bm25({TABELA_BUSCA})
+             LIMIT %s
+            """,
+            [consulta, status, limite],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    por_id = Corrida.objects.select_related("motorista", "parent_template").in_bulk(ids)
+    return [por_id[i] for i in ids if i in por_id]
@@ -0,0 +1,29 @@
+# corrida/services/eventos.py
+"""Publicação de mudanças de status de SolicitacaoCarona no stream SSE."""
+from corrida.models import Corrida
+from notificacao import eventos
+
+
+def dados_solicitacao(solicitacao) -> dict:
+    return {
+        "id": solicitacao.id,
+        "corrida_id": solicitacao.corrida_id,
+        "status": solicitacao.status,
+    }
+
+
+def publicar_solicitacoes(solicitacoes) -> None:
+    """Avisa passageiro e motorista de cada solicitação (após o commit)."""
+    if not eventos.ha_assinantes():
+        return
+    solicitacoes = list(solicitacoes)
+    motoristas = dict(
+        Corrida.objects.filter(id__in={s.corrida_id for s in solicitacoes})
+        .values_list("id", "motorista_id")
+    )
+    for s in solicitacoes:
+        eventos.publicar(
+            [s.passageiro_id, motoristas.get(s.corrida_id)],
+            "solicitacao",
+            dados_solicitacao(s),
+        )
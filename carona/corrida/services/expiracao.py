@@ -0,0 +1,101 @@
+# corrida/services/expiracao.py
+"""
+Varredura de corridas vencidas: corridas 'ativa' cuja data/horário de saída já
+passou (e que nunca foram iniciadas) viram 'expirada', saem do índice de busca
+e os passageiros com solicitação pendente são avisados.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from corrida.models import Corrida, SolicitacaoCarona
+from corrida.services.busca import remover_do_indice
+from corrida.services.eventos import publicar_solicitacoes
+from notificacao.models import Notificacao
+from notificacao.services import notificar_em_lote, nova as nova_notificacao
+
+logger = logging.getLogger(__name__)
+
+# minutos após o horário de saída até a corrida ser considerada vencida
+TOLERANCIA_MIN = getattr(settings, "CORRIDA_EXPIRACAO_TOLERANCIA_MIN", 120)
+LOTE_PADRAO = 500
+
+
+def corridas_vencidas(agora: Optional[datetime] = None):
+    """Queryset (usa o índice status+data) das corridas ativas já vencidas."""
+    agora = timezone.localtime(agora or timezone.now())
+    limite = agora - timedelta(minutes=TOLERANCIA_MIN)
+    return Corrida.objects.filter(
+        Q(data__lt=limite.date()) | Q(data=limite.date(), horario_saida__lte=limite.time()),
+        status=Corrida.STATUS_ATIVA,
+    )
+
+
+def _expirar_lote(agora, lote):
+    with transaction.atomic():
+        ids = list(
+            corridas_vencidas(agora)
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return 0, 0
+
+        Corrida.objects.filter(id__in=ids, status=Corrida.STATUS_ATIVA).update(
+            status=Corrida.STATUS_EXPIRADA, atualizado_em=timezone.now()
+        )
+
+        pendentes = list(
+            SolicitacaoCarona.objects
+            .filter(corrida_id__in=ids, status=SolicitacaoCarona.STATUS_PENDENTE)
+            .select_related("corrida")
+            .only("id", "passageiro_id", "corrida__id", "corrida__origem", "corrida__destino")
+        )
+        if pendentes:
+            SolicitacaoCarona.objects.filter(id__in=[s.id for s in pendentes]).update(
+                status=SolicitacaoCarona.STATUS_RECUSADA
+            )
+            for s in pendentes:
+                s.status = SolicitacaoCarona.STATUS_RECUSADA
+            publicar_solicitacoes(pendentes)
+            notificar_em_lote(
+                nova_notificacao(
+                    usuario_id=s.passageiro_id,
+                    titulo="Corrida expirada",
+                    mensagem=f"A corrida {s.corrida.origem} → {s.corrida.destino} expirou sem ser iniciada. Sua solicitação foi encerrada.",
+                    tipo=Notificacao.TIPO_CORRIDA_EXPIRADA,
+                    dados={
+                        "corrida_id": s.corrida.id,
+                        "solicitacao_id": s.id,
+                        "link": reverse("corrida:detalhe", args=[s.corrida.id]),
+                    },
+                )
+                for s in pendentes
+            )
+
+        remover_do_indice(ids)
+    return len(ids), len(pendentes)
+
+
+def expirar_corridas_vencidas(agora: Optional[datetime] = None, lote: int = LOTE_PADRAO) -> dict:
+    """
+    Expira as corridas vencidas em lotes (uma transação por lote).
+    Retorna {"corridas": n, "solicitacoes": m}.
+    """
+    total_corridas = total_solicitacoes = 0
+    while True:
+        n, m = _expirar_lote(agora, lote)
+        total_corridas += n
+        total_solicitacoes += m
+        if n < lote:
+            break
+    if total_corridas:
+        logger.info("Expiradas %s corrida(s); %s solicitação(ões) pendente(s) encerrada(s)", total_corridas, total_solicitacoes)
+    return {"corridas": total_corridas, "solicitacoes": total_solicitacoes}
@@ -0,0 +1,205 @@
+# corrida/services/vagas.py
+"""
+Reserva e liberação de vagas sem lock de linha.
+
+Cada operação é um único UPDATE condicional (ex.: WHERE vagas_disponiveis >= n)
+e o número de linhas afetadas diz se deu certo. Assim aceitar passageiros não
+precisa de select_for_update na corrida e rajadas de aceites não se serializam
+esperando o lock.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from corrida.models import Corrida, SolicitacaoCarona
+from corrida.services.eventos import publicar_solicitacoes
+
+
+class SemVagas(Exception):
+    """A corrida não tem vagas suficientes."""
+
+
+class SolicitacaoIndisponivel(Exception):
+    """A solicitação não está em um status que permita a transição pedida."""
+
+
+class CorridaIndisponivel(SolicitacaoIndisponivel):
+    """A corrida não está mais ativa (expirada, cancelada, iniciada): não aceita passageiros."""
+
+
+# status a partir dos quais o motorista pode aceitar (recusada = mudou de ideia),
+# sempre em corrida ainda ativa: a expiração recusa as pendentes da corrida vencida
+STATUS_ACEITAVEIS = (SolicitacaoCarona.STATUS_PENDENTE, SolicitacaoCarona.STATUS_RECUSADA)
+
+
+def reservar_vagas(corrida_id: int, quantidade: int = 1) -> bool:
+    """Decrementa `quantidade` vagas se houver. True se reservou."""
+    if quantidade <= 0:
+        return True
+    atualizadas = Corrida.objects.filter(
+        id=corrida_id, vagas_disponiveis__gte=quantidade
+    ).update(
+        vagas_disponiveis=F('vagas_disponiveis') - quantidade,
+        atualizado_em=timezone.now(),
+    )
+    return atualizadas == 1
+
+
+def liberar_vagas(corrida_id: int, quantidade: int = 1) -> bool:
+    """Devolve `quantidade` vagas, respeitando max_passengers do template quando houver."""
+    if quantidade <= 0:
+        return True
+    atualizadas = Corrida.objects.filter(
+        Q(parent_template__isnull=True)
+        | Q(vagas_disponiveis__lte=F('parent_template__max_passengers') - quantidade),
+        id=corrida_id,
+    ).update(
+        vagas_disponiveis=F('vagas_disponiveis') + quantidade,
+        atualizado_em=timezone.now(),
+    )
+    return atualizadas == 1
+
+
+def aceitar_solicitacao(solicitacao: SolicitacaoCarona) -> None:
+    """
+    Marca a solicitação como ACEITA e reserva uma vaga, atomicamente.
+    Levanta CorridaIndisponivel, SolicitacaoIndisponivel ou SemVagas (nada é
+    gravado nesses casos).
+    """
+    with transaction.atomic():
+        mudou = SolicitacaoCarona.objects.filter(
+            id=solicitacao.id, status__in=STATUS_ACEITAVEIS, corrida__status=Corrida.STATUS_ATIVA
+        ).update(status=SolicitacaoCarona.STATUS_ACEITA)
+        if not mudou:
+            if not Corrida.objects.filter(id=solicitacao.corrida_id, status=Corrida.STATUS_ATIVA).exists():
+                raise CorridaIndisponivel()
+            raise SolicitacaoIndisponivel()
+        if not reservar_vagas(solicitacao.corrida_id):
+            raise SemVagas()
+        solicitacao.status = SolicitacaoCarona.STATUS_ACEITA
+        publicar_solicitacoes([solicitacao])
+
+
+def recusar_solicitacao(solicitacao: SolicitacaoCarona) -> None:
+    """
+    Marca a solicitação como RECUSADA; se ela estava aceita, devolve a vaga.
+    Levanta SolicitacaoIndisponivel se já estiver recusada/cancelada.
+    """
+    with transaction.atomic():
+        estava_aceita = SolicitacaoCarona.objects.filter(
+            id=solicitacao.id, status=SolicitacaoCarona.STATUS_ACEITA
+        ).update(status=SolicitacaoCarona.STATUS_RECUSADA)
+        if estava_aceita:
+            liberar_vagas(solicitacao.corrida_id)
+        elif not SolicitacaoCarona.objects.filter(
+            id=solicitacao.id, status=SolicitacaoCarona.STATUS_PENDENTE
+        ).update(status=SolicitacaoCarona.STATUS_RECUSADA):
+            raise SolicitacaoIndisponivel()
+        solicitacao.status = SolicitacaoCarona.STATUS_RECUSADA
+        publicar_solicitacoes([solicitacao])
+
+
+class _ConflitoLote(Exception):
+    pass
+
+
+def responder_em_lote(motorista_id: int, itens):
+    """
+    Aplica várias respostas ('aceitar' | 'rejeitar') de uma vez, numa transação.
+
+    `itens` é uma lista de (solicitacao_id, acao). A capacidade é validada por
+    corrida para o lote inteiro: ou todos os aceites daquela corrida cabem nas
+    vagas, ou nenhum é aplicado. Retorna (resultados, aplicadas), onde
+    `resultados` tem um dict por item e `aplicadas` é a lista de
+    (SolicitacaoCarona, acao) efetivamente gravadas (para notificar).
+    """
+    resultados = {}
+    pedidos = {}
+    for sid, acao in itens:
+        if acao not in ('aceitar', 'rejeitar'):
+            resultados[sid] = {"id": sid, "ok": False, "erro": "Ação inválida."}
+        elif sid in pedidos:
+            resultados[sid] = {"id": sid, "ok": False, "erro": "Solicitação repetida no lote."}
+        else:
+            pedidos[sid] = acao
+
+    solicitacoes = SolicitacaoCarona.objects.select_related('corrida', 'passageiro').in_bulk(list(pedidos))
+
+    aceites = {}            # corrida_id -> [solicitacao]
+    recusas_aceitas = {}    # corrida_id -> [solicitacao] (devolvem vaga)
+    recusas_pendentes = []
+    for sid, acao in pedidos.items():
+        s = solicitacoes.get(sid)
+        if s is None:
+            resultados[sid] = {"id": sid, "ok": False, "erro": "Solicitação não encontrada."}
+        elif s.corrida.motorista_id != motorista_id:
+            resultados[sid] = {"id": sid, "ok": False, "erro": "Sem permissão."}
+        elif acao == 'aceitar' and s.corrida.status != Corrida.STATUS_ATIVA:
+            resultados[sid] = {"id": sid, "ok": False, "erro": "A corrida não está mais ativa."}
+        elif acao == 'aceitar' and s.status in STATUS_ACEITAVEIS:
+            aceites.setdefault(s.corrida_id, []).append(s)
+        elif acao == 'rejeitar' and s.status == SolicitacaoCarona.STATUS_ACEITA:
+            recusas_aceitas.setdefault(s.corrida_id, []).append(s)
+        elif acao == 'rejeitar' and s.status == SolicitacaoCarona.STATUS_PENDENTE:
+            recusas_pendentes.append(s)
+        else:
+            resultados[sid] = {"id": sid, "ok": False, "erro": "Solicitação já respondida."}
+
+    aplicadas = []
+    with transaction.atomic():
+        # recusas de aceitos primeiro: a vaga devolvida já vale para os aceites do mesmo lote
+        for corrida_id, grupo in recusas_aceitas.items():
+            mudou = SolicitacaoCarona.objects.filter(
+                id__in=[s.id for s in grupo], status=SolicitacaoCarona.STATUS_ACEITA
+            ).update(status=SolicitacaoCarona.STATUS_RECUSADA)
+            liberar_vagas(corrida_id, mudou)
+
+        for corrida_id, grupo in aceites.items():
+            ids = [s.id for s in grupo]
+            try:
+                with transaction.atomic():
+                    if not reservar_vagas(corrida_id, len(grupo)):
+                        raise SemVagas()
+                    mudou = SolicitacaoCarona.objects.filter(
+                        id__in=ids, status__in=STATUS_ACEITAVEIS, corrida__status=Corrida.STATUS_ATIVA
+                    ).update(status=SolicitacaoCarona.STATUS_ACEITA)
+                    if mudou != len(grupo):
+                        raise _ConflitoLote()
+            except SemVagas:
+                erro = "Vagas insuficientes para todos os aceites desta corrida."
+                for s in grupo:
+                    resultados[s.id] = {"id": s.id, "ok": False, "erro": erro}
+                continue
+            except _ConflitoLote:
+                for s in grupo:
+                    resultados[s.id] = {"id": s.id, "ok": False, "erro": "Solicitação alterada durante o lote."}
+                continue
+            for s in grupo:
+                s.status = SolicitacaoCarona.STATUS_ACEITA
+                aplicadas.append((s, 'aceitar'))
+
+        if recusas_pendentes:
+            SolicitacaoCarona.objects.filter(
+                id__in=[s.id for s in recusas_pendentes], status=SolicitacaoCarona.STATUS_PENDENTE
+            ).update(status=SolicitacaoCarona.STATUS_RECUSADA)
+
+        # confere quais recusas realmente foram gravadas (concorrência com outro request)
+        recusas = [s for g in recusas_aceitas.values() for s in g] + recusas_pendentes
+        if recusas:
+            finais = dict(
+                SolicitacaoCarona.objects.filter(id__in=[s.id for s in recusas]).values_list('id', 'status')
+            )
+            for s in recusas:
+                if finais.get(s.id) == SolicitacaoCarona.STATUS_RECUSADA:
+                    s.status = SolicitacaoCarona.STATUS_RECUSADA
+                    aplicadas.append((s, 'rejeitar'))
+                else:
+                    resultados[s.id] = {"id": s.id, "ok": False, "erro": "Solicitação alterada durante o lote."}
+
+        publicar_solicitacoes(s for s, _acao in aplicadas)
+
+    for s, _acao in aplicadas:
+        resultados[s.id] = {"id": s.id, "ok": True, "status": s.status}
+
+    ordem = [sid for sid, _ in itens]
+    return [resultados[sid] for sid in dict.fromkeys(ordem)], aplicadas
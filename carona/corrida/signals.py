@@ -0,0 +1,27 @@
+# corrida/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Corrida, SolicitacaoCarona
+from .services.busca import CAMPOS_BUSCA, indexar_corrida, remover_do_indice
+from .services.eventos import publicar_solicitacoes
+
+
+@receiver(post_save, sender=Corrida)
+def atualizar_indice_busca(sender, instance, update_fields=None, **kwargs):
+    # saves parciais que não mexem em endereço (iniciar/encerrar/vagas) não reindexam
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_BUSCA):
+        return
+    indexar_corrida(instance)
+
+
+@receiver(post_delete, sender=Corrida)
+def remover_indice_busca(sender, instance, **kwargs):
+    remover_do_indice([instance.pk])
+
+
+@receiver(post_save, sender=SolicitacaoCarona)
+def publicar_status_solicitacao(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "status" not in update_fields:
+        return
+    publicar_solicitacoes([instance])
@@ -2,6 +2,54 @@ document.addEventListener("DOMContentLoaded", function() {
     const btnPagar = document.querySelector(".btn-pagar");
     const mensagensContainer = document.getElementById("mensagens-corrida");
 
+    const statusPagamento = document.getElementById("pagamento-status");
+
+    // status do pagamento empurrado pelo stream SSE (só o Payment desta página: cada passageiro tem o seu)
+    document.addEventListener("carona:pagamento", function (ev) {
+        if (!statusPagamento || !statusPagamento.dataset.paymentId) return;
+        if (String(ev.detail.id) !== statusPagamento.dataset.paymentId) return;
+        aplicarStatusPagamento(ev.detail.status);
+        if (ev.detail.status === "PAID") {
+            const btn = document.querySelector(".btn-pagar");
+            if (btn) btn.remove();
+        }
+    });
+
+    // sem stream SSE conectado, acompanha o status por long-poll (o servidor segura a requisição até mudar)
+    function aguardarStatusPagamento(etag) {
+        const paymentId = statusPagamento && statusPagamento.dataset.paymentId;
+        if (!paymentId) return;
+        if (window.CaronaEventos && window.CaronaEventos.ativo) {
+            setTimeout(() => aguardarStatusPagamento(etag), 30000);
+            return;
+        }
+        const headers = { "Accept": "application/json" };
+        if (etag) headers["If-None-Match"] = etag;
+        fetch(`/pagamentos/status/${paymentId}/aguardar/`, { headers: headers, cache: "no-store" })
+        .then(res => {
+            if (res.status === 304) return aguardarStatusPagamento(etag);
+            if (!res.ok) throw new Error("HTTP " + res.status);
+            const novaEtag = res.headers.get("ETag");
+            return res.json().then(data => {
+                aplicarStatusPagamento(data.status);
+                if (data.status === "PAID") {
+                    const btn = document.querySelector(".btn-pagar");
+                    if (btn) btn.remove();
+                } else {
+                    aguardarStatusPagamento(novaEtag);
+                }
+            });
+        })
+        .catch(err => {
+            console.error(err);
+            setTimeout(() => aguardarStatusPagamento(etag), 5000);
+        });
+    }
+
+    if (statusPagamento && statusPagamento.dataset.paymentId && statusPagamento.textContent.trim() !== "Pago") {
+        aguardarStatusPagamento(null);
+    }
+
     if (!btnPagar) return;
 
     btnPagar.addEventListener("click", function() {
@@ -20,8 +68,8 @@ document.addEventListener("DOMContentLoaded", function() {
             if (data.ok) {
                 mostrarMensagem("Pagamento efetuado com sucesso!", "success");
 
-                // Atualiza o status do pagamento no card
-                atualizarStatusPagamento(corridaId);
+                // Pagamento via carteira é síncrono: já está pago
+                aplicarStatusPagamento("PAID");
 
                 // Remove o botão após pagamento
                 btnPagar.remove();
@@ -35,30 +83,18 @@ document.addEventListener("DOMContentLoaded", function() {
         });
     });
 
-    function atualizarStatusPagamento(corridaId) {
-        fetch(`/pagamentos/corrida/${corridaId}/status/`, {  // endpoint que retorna JSON {status: "PAID"/"PENDING"}
-            method: "GET",
-            headers: {
-                "X-CSRFToken": getCookie("csrftoken"),
-                "Accept": "application/json"
-            },
-        })
-        .then(res => res.json())
-        .then(data => {
-            const statusElem = document.querySelector(".status-badge");
-            if (!statusElem) return;
-
-            if (data.status === "PAID") {
-                statusElem.textContent = "Pago";
-                statusElem.className = "status-badge status-finalizada";
-            } else {
-                statusElem.textContent = "Pendente";
-                statusElem.className = "status-badge status-em_andamento";
-            }
-        })
-        .catch(err => {
-            console.error(err);
-        });
+    function aplicarStatusPagamento(status) {
+        if (!statusPagamento) return;
+        if (status === "PAID") {
+            statusPagamento.textContent = "Pago";
+            statusPagamento.className = "status-badge status-finalizada";
+        } else if (status === "EXPIRED") {
+            statusPagamento.textContent = "Expirado";
+            statusPagamento.className = "status-badge status-cancelada";
+        } else {
+            statusPagamento.textContent = "Pendente";
+            statusPagamento.className = "status-badge status-em_andamento";
+        }
     }
 
     function mostrarMensagem(texto, tipo) {
@@ -41,7 +41,8 @@
   async function atualizarBadge() {
     if (typeof URL_CONTAGEM === 'undefined') return;
     try {
-      const res = await fetch(URL_CONTAGEM + "?_=" + Date.now(), { credentials: 'same-origin' });
+      // 'no-cache' revalida com If-None-Match: o servidor responde 304 se a contagem não mudou
+      const res = await fetch(URL_CONTAGEM, { credentials: 'same-origin', cache: 'no-cache' });
       if (!res.ok) return;
       const js = await res.json();
       const badge = qs('#notif-badge');
@@ -307,7 +308,17 @@
     atualizarBotoesSolicitacoes();
     atualizarBotoesCorrida();
     atualizarBadge();
-    if (typeof URL_CONTAGEM !== 'undefined') setInterval(atualizarBadge, 20000);
+    // com o stream SSE conectado, o polling fica parado
+    if (typeof URL_CONTAGEM !== 'undefined') {
+      setInterval(function () {
+        if (!(window.CaronaEventos && window.CaronaEventos.ativo)) atualizarBadge();
+      }, 20000);
+    }
+  });
+
+  document.addEventListener('carona:notificacao', atualizarBadge);
+  document.addEventListener('carona:solicitacao', function (ev) {
+    marcarSolicitacaoNoDOM(ev.detail.id, ev.detail.status);
   });
 
 })();
@@ -391,6 +391,12 @@
 
     setTimeout(() => sincronizarEstadoBotoes(), 300);
 
+    // solicitação respondida/expirada pelo motorista: atualiza o card sem novo fetch
+    document.addEventListener('carona:solicitacao', function (ev) {
+      const d = ev.detail || {};
+      atualizarBotoesParaCorrida(d.corrida_id, d.status === 'PENDENTE' ? d.id : null);
+    });
+
   });
 
 })();
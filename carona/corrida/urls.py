@@ -23,6 +23,7 @@ urlpatterns = [
     path('api/minhas_solicitacoes/', views.minhas_solicitacoes_api, name='minhas_solicitacoes_api'),
     # corrida/urls.py
     path('api/aceitar_solicitacao/', views.api_aceitar_solicitacao, name='api_aceitar_solicitacao'),
+    path('api/responder_solicitacoes/', views.api_responder_solicitacoes_lote, name='api_responder_solicitacoes_lote'),
 
 
     # Rotas de solicitação (mantidas dentro do app "corrida")
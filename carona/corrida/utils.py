@@ -1,4 +1,5 @@
 import requests
+import unicodedata
 from django.conf import settings
 import openrouteservice
 from math import radians, cos, sin, asin, sqrt
@@ -100,4 +101,15 @@ def nearest_point_on_route(ponto, rota):
     Retorna a menor distância entre um ponto (lat, lon) e uma rota (lista de [lat, lon]).
     """
     lat, lon = ponto
-    return min(haversine(lat, lon, p[0], p[1]) for p in rota) if rota else float("inf")
\ No newline at end of file
+    return min(haversine(lat, lon, p[0], p[1]) for p in rota) if rota else float("inf")
+
+def remover_acentos(txt):
+    if not txt:
+        return ""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', txt)
+        if not unicodedata.combining(c)
+    )
+
+def normalizar_texto(txt):
+    return remover_acentos(txt).strip().lower()
@@ -3,8 +3,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from .forms import CorridaForm
-from .models import Corrida, SolicitacaoCarona
-from .utils import geocode_endereco, gerar_rota, nearest_point_on_route
+from .models import Corrida, CorridaHistorico, SolicitacaoCarona
+from .utils import geocode_endereco, gerar_rota, nearest_point_on_route, remover_acentos, normalizar_texto
+from .services.arquivamento import STATUS_ARQUIVAVEIS
+from .services.busca import buscar_corridas_texto
+from .services.vagas import (
+    aceitar_solicitacao, recusar_solicitacao, responder_em_lote, CorridaIndisponivel, SemVagas, SolicitacaoIndisponivel,
+)
 from django.views.decorators.http import require_POST, require_GET
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
 import json, unicodedata, requests, logging, math
@@ -13,12 +18,15 @@ from django.urls import reverse
 from django.views.decorators.cache import cache_page
 from decimal import Decimal, InvalidOperation
 from django.conf import settings
+from django.utils import timezone
 from django.db import IntegrityError, transaction, models as dj_models
-from django.db.models import Prefetch
+from django.db.models import Count, Prefetch, Value
+from django.db.models.functions import Coalesce
 from notificacao.models import Notificacao
+from notificacao.services import notificar, notificar_em_lote, nova as nova_notificacao
 from pagamentos.models import Payment
+from pagamentos.expiracao import status_efetivo
 
-from pagamentos.services import criar_pix_qr
 from django.http import Http404
 from urllib.parse import quote_plus
 import re
@@ -28,7 +36,6 @@ from typing import Optional, Tuple
 
 from django.db.models import Q
 
-from pagamentos.services import create_payment_for_corrida
 
 
 # tolerâncias (caemback para valores padrão caso não estejam em settings)
@@ -577,10 +584,76 @@ def editar_corrida(request, corrida_id):
     return render(request, 'corrida/editar_corrida.html', {'form': form, 'corrida': corrida})       
 
 
+HISTORICO_POR_PAGINA = 30
+
+
+def _cursor_historico(h) -> str:
+    """Cursor keyset "<data>_<horário>_<id da corrida>" de uma linha do histórico."""
+    return f"{h.ordem_data.isoformat()}_{h.ordem_hora.isoformat()}_{h.pk}"
+
+
+def _ler_cursor_historico(valor):
+    try:
+        d, h, cid = valor.split("_", 2)
+        return date.fromisoformat(d), time.fromisoformat(h), int(cid)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _pagina_historico(qs, cursor):
+    """Uma página da fonte, em (data, horário, id) decrescente; sem data/horário conta como o mais antigo."""
+    qs = qs.annotate(
+        ordem_data=Coalesce('data', Value(date.min)),
+        ordem_hora=Coalesce('horario_saida', Value(time.min)),
+    )
+    if cursor:
+        d, h, cid = cursor
+        qs = qs.filter(
+            Q(ordem_data__lt=d) | Q(ordem_data=d, ordem_hora__lt=h) | Q(ordem_data=d, ordem_hora=h, pk__lt=cid)
+        )
+    return list(qs.order_by('-ordem_data', '-ordem_hora', '-pk')[:HISTORICO_POR_PAGINA + 1])
+
+
 @login_required
 def historico_corridas(request):
-    # Lógica para mostrar o histórico de corridas
-    return render(request, 'corrida/historico_corridas.html')
+    # paginação keyset: ?antes=<cursor> traz a página seguinte; cada fonte devolve
+    # só uma página e o merge fica com as HISTORICO_POR_PAGINA primeiras
+    cursor = _ler_cursor_historico(request.GET.get('antes'))
+    como_passageiro = SolicitacaoCarona.objects.filter(
+        passageiro=request.user, status=SolicitacaoCarona.STATUS_ACEITA
+    ).values('corrida_id')
+    # arquivadas vêm da tabela fria (CorridaHistorico), sem carregar rotas
+    arquivadas = _pagina_historico(
+        CorridaHistorico.objects
+        .filter(Q(motorista=request.user) | Q(corrida_id__in=como_passageiro))
+        .defer('rota_comprimida')
+        .select_related('motorista'),
+        cursor,
+    )
+    # encerradas há menos de CORRIDA_ARQUIVAMENTO_DIAS ainda estão só em Corrida
+    recentes = _pagina_historico(
+        Corrida.objects
+        .filter(
+            Q(motorista=request.user) | Q(id__in=como_passageiro),
+            status__in=STATUS_ARQUIVAVEIS,
+            historico__isnull=True,
+        )
+        .only('id', 'motorista__nome', 'origem', 'destino', 'cidade_origem', 'cidade_destino',
+              'data', 'horario_saida', 'valor', 'status')
+        .select_related('motorista')
+        .annotate(passageiros=Count('solicitacoes', filter=Q(solicitacoes__status=SolicitacaoCarona.STATUS_ACEITA))),
+        cursor,
+    )
+    historico = sorted(arquivadas + recentes, key=lambda h: (h.ordem_data, h.ordem_hora, h.pk), reverse=True)
+    proximo_cursor = None
+    if len(historico) > HISTORICO_POR_PAGINA:
+        historico = historico[:HISTORICO_POR_PAGINA]
+        proximo_cursor = _cursor_historico(historico[-1])
+    return render(request, 'corrida/historico_corridas.html', {
+        'historico': historico,
+        'proximo_cursor': proximo_cursor,
+        'primeira_pagina': cursor is None,
+    })
 
 def detalhe_corrida(request, pk):
     corrida = get_object_or_404(Corrida, id=pk)
@@ -596,6 +669,10 @@ def cancelar_corrida(request, corrida_id):
         if corrida.status == 'ativa':
             corrida.status = 'cancelada'
             messages.success(request, 'Corrida cancelada com sucesso.')
+        elif CorridaHistorico.objects.filter(corrida=corrida).exists():
+            # corrida arquivada não tem mais rota no registro quente
+            messages.error(request, 'Corrida arquivada não pode ser reativada.')
+            return redirect('corrida:lista_corridas')
         else:
             corrida.status = 'ativa'
             messages.success(request, 'Corrida reativada com sucesso.')
@@ -647,16 +724,7 @@ def geocode_ajax(request):
 #                               normalizando para a busca                            #
 #------------------------------------------------------------------------------------#
 
-def remover_acentos(txt):
-    if not txt:
-        return ""
-    return ''.join(
-        c for c in unicodedata.normalize('NFKD', txt)
-        if not unicodedata.combining(c)
-    )
-
-def normalizar_texto(txt):
-    return remover_acentos(txt).strip().lower()
+# remover_acentos / normalizar_texto ficam em utils (usados também pelo índice de busca)
 
 
 @login_required
@@ -756,28 +824,11 @@ def buscar_corridas(request):
             corridas_serializadas.append(ser)
 
     # ================================================================
-    # 2) GEOCODE FALHOU → FALLBACK DE BUSCA POR TEXTO (USANDO Q / icontains)
+    # 2) GEOCODE FALHOU → FALLBACK DE BUSCA POR TEXTO (ÍNDICE FTS, RANQUEADO)
     # ================================================================
     else:
         try:
-            # tokens: cada palavra + a frase inteira (para "sao paulo")
-            palavras = [p for p in termo_busca.split() if p]
-            tokens = list(dict.fromkeys(palavras + [termo_busca]))  # remove duplicatas mantendo ordem
-
-            texto_q = Q()
-            for t in tokens:
-                texto_q |= (
-                    Q(origem__icontains=t) |
-                    Q(destino__icontains=t) |
-                    Q(bairro_origem__icontains=t) |
-                    Q(bairro_destino__icontains=t) |
-                    Q(cidade_origem__icontains=t) |
-                    Q(cidade_destino__icontains=t) |
-                    Q(estado_origem__icontains=t) |
-                    Q(estado_destino__icontains=t)
-                )
-
-            candidatos_qs = Corrida.objects.filter(Q(status="ativa") & texto_q).distinct()
+            candidatos_qs = buscar_corridas_texto(termo_busca)
 
             # montar mapa de solicitações
             solicitacoes_map = {}
@@ -887,9 +938,9 @@ def solicitar_carona(request, corrida_id):
                 else:
                     return JsonResponse({'erro': 'Você já solicitou esta carona.'}, status=400)
 
-            # 🔔 Criar notificação para o motorista (usando o campo `dados` para metadados)
-            Notificacao.objects.create(
-                usuario=corrida.motorista,
+            # 🔔 Notificação para o motorista (gravada após o commit, usando `dados` para metadados)
+            notificar(
+                corrida.motorista,
                 titulo="Nova solicitação de vaga",
                 mensagem=f"{user.nome} solicitou uma vaga na sua corrida de {corrida.origem} → {corrida.destino}.",
                 tipo=Notificacao.TIPO_SOLICITACAO_RECEBIDA,
@@ -931,8 +982,8 @@ def cancelar_solicitacao(request, solicitacao_id):
     solicit.save(update_fields=['status'])
 
     # Notificar motorista
-    Notificacao.objects.create(
-        usuario=solicit.corrida.motorista,
+    notificar(
+        solicit.corrida.motorista,
         titulo="Solicitação cancelada",
         mensagem=f"{request.user.nome} cancelou a solicitação da corrida {solicit.corrida.origem} → {solicit.corrida.destino}.",
         tipo=Notificacao.TIPO_SOLICITACAO_RESPONDIDA,
@@ -970,26 +1021,20 @@ def responder_solicitacao(request, solicitacao_id):
 
     try:
         with transaction.atomic():
-            # bloqueia a corrida para evitar race conditions
-            corrida_locked = Corrida.objects.select_for_update().get(id=corrida.id)
-
             if action == 'aceitar':
-                # Verifica vagas no objeto bloqueado
-                if corrida_locked.vagas_disponiveis <= 0:
+                # UPDATE condicional na corrida (vagas > 0), sem select_for_update
+                try:
+                    aceitar_solicitacao(solicit)
+                except SemVagas:
                     return JsonResponse({'erro': 'Não há vagas disponíveis.'}, status=400)
-
-                # atualiza solicitação
-                solicit.status = SolicitacaoCarona.STATUS_ACEITA
-                solicit.save(update_fields=['status'])
-
-                # decrementa vagas com F() para segurança concorrente
-                Corrida.objects.filter(id=corrida.id).update(
-                    vagas_disponiveis=dj_models.F('vagas_disponiveis') - 1
-                )
-
-                # Notifica passageiro
-                Notificacao.objects.create(
-                    usuario=solicit.passageiro,
+                except CorridaIndisponivel:
+                    return JsonResponse({'erro': 'A corrida não está mais ativa.'}, status=400)
+                except SolicitacaoIndisponivel:
+                    return JsonResponse({'erro': 'Solicitação já respondida.'}, status=400)
+
+                # Notifica passageiro (após o commit)
+                notificar(
+                    solicit.passageiro,
                     mensagem=f"Sua solicitação para a corrida {corrida.origem} → {corrida.destino} foi ACEITA!",
                     dados={
                         "corrida_id": corrida.id,
@@ -999,13 +1044,15 @@ def responder_solicitacao(request, solicitacao_id):
                     tipo=Notificacao.TIPO_SOLICITACAO_RESPONDIDA
                 )
 
-            else:  # rejeitar
-                solicit.status = SolicitacaoCarona.STATUS_RECUSADA
-                solicit.save(update_fields=['status'])
+            else:  # rejeitar (se estava aceita, a vaga volta)
+                try:
+                    recusar_solicitacao(solicit)
+                except SolicitacaoIndisponivel:
+                    return JsonResponse({'erro': 'Solicitação já respondida.'}, status=400)
 
-                # Notifica passageiro
-                Notificacao.objects.create(
-                    usuario=solicit.passageiro,
+                # Notifica passageiro (após o commit)
+                notificar(
+                    solicit.passageiro,
                     mensagem=f"Sua solicitação para a corrida {corrida.origem} → {corrida.destino} foi RECUSADA.",
                     dados={
                         "corrida_id": corrida.id,
@@ -1024,6 +1071,55 @@ def responder_solicitacao(request, solicitacao_id):
     return JsonResponse({'ok': True, 'status': solicit.status})
 
 
+LOTE_MAX_SOLICITACOES = 200
+
+
+@login_required
+@require_POST
+def api_responder_solicitacoes_lote(request):
+    """
+    Responde várias solicitações (de uma ou mais corridas do motorista) de uma vez.
+    Corpo JSON: {"itens": [{"id": 12, "acao": "aceitar"}, {"id": 13, "acao": "rejeitar"}]}
+    Retorna o resultado de cada item; tudo roda numa única transação.
+    """
+    try:
+        corpo = json.loads(request.body or b"{}")
+        itens = [(int(i["id"]), str(i.get("acao") or i.get("action"))) for i in corpo.get("itens", [])]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'ok': False, 'erro': 'JSON inválido.'}, status=400)
+
+    if not itens:
+        return JsonResponse({'ok': False, 'erro': 'Nenhuma solicitação informada.'}, status=400)
+    if len(itens) > LOTE_MAX_SOLICITACOES:
+        return JsonResponse({'ok': False, 'erro': f'Máximo de {LOTE_MAX_SOLICITACOES} solicitações por lote.'}, status=400)
+
+    try:
+        with transaction.atomic():
+            resultados, aplicadas = responder_em_lote(request.user.id, itens)
+
+            notificacoes = []
+            for solicit, acao in aplicadas:
+                corrida = solicit.corrida
+                resposta = "ACEITA!" if acao == 'aceitar' else "RECUSADA."
+                notificacoes.append(nova_notificacao(
+                    solicit.passageiro,
+                    mensagem=f"Sua solicitação para a corrida {corrida.origem} → {corrida.destino} foi {resposta}",
+                    dados={
+                        "corrida_id": corrida.id,
+                        "solicitacao_id": solicit.id,
+                        "link": reverse('corrida:detalhe', args=[corrida.id])
+                    },
+                    tipo=Notificacao.TIPO_SOLICITACAO_RESPONDIDA
+                ))
+            notificar_em_lote(notificacoes)
+
+    except Exception:
+        logger.exception("Erro ao responder solicitações em lote user=%s", request.user.id)
+        return JsonResponse({'ok': False, 'erro': 'Erro interno ao processar as solicitações.'}, status=500)
+
+    return JsonResponse({'ok': True, 'resultados': resultados})
+
+
 @require_GET
 def buscar_corridas_api(request):
     origem_text = request.GET.get('origem', '').strip()
@@ -1073,26 +1169,9 @@ def buscar_corridas_api(request):
         return JsonResponse({'ok': True, 'coords': coords, 'corridas': corridas_encontradas},
                             json_dumps_params={'ensure_ascii': False})
 
-    # Senão: fallback textual (procura por cidade/bairro/rua)
+    # Senão: fallback textual (procura por cidade/bairro/rua no índice FTS)
     try:
-        termo_busca = normalizar_texto(origem_text)
-        palavras = [p for p in termo_busca.split() if p]
-        tokens = list(dict.fromkeys(palavras + [termo_busca]))
-
-        texto_q = Q()
-        for t in tokens:
-            texto_q |= (
-                Q(origem__icontains=t) |
-                Q(destino__icontains=t) |
-                Q(bairro_origem__icontains=t) |
-                Q(bairro_destino__icontains=t) |
-                Q(cidade_origem__icontains=t) |
-                Q(cidade_destino__icontains=t) |
-                Q(estado_origem__icontains=t) |
-                Q(estado_destino__icontains=t)
-            )
-
-        candidatos_qs = Corrida.objects.filter(Q(status="ativa") & texto_q).distinct()
+        candidatos_qs = buscar_corridas_texto(origem_text)
 
         for c in candidatos_qs:
             corrida_dict = serialize_corrida(c)
@@ -1218,23 +1297,19 @@ def api_aceitar_solicitacao(request):
 
     try:
         with transaction.atomic():
-            # bloqueia a corrida para checagem/atualização segura
-            corrida_locked = Corrida.objects.select_for_update().get(id=corrida.id)
-
-            if corrida_locked.vagas_disponiveis <= 0:
+            # aceite + reserva de vaga via UPDATE condicional (sem lock na corrida)
+            try:
+                aceitar_solicitacao(solicitacao)
+            except SemVagas:
                 return JsonResponse({"ok": False, "error": "Não há vagas disponíveis."}, status=400)
-
-            # aceita a solicitação
-            solicitacao.status = SolicitacaoCarona.STATUS_ACEITA
-            solicitacao.save(update_fields=['status'])
-
-            # decrementa uma vaga (campo int) de forma atômica
-            corrida_locked.vagas_disponiveis = dj_models.F('vagas_disponiveis') - 1
-            corrida_locked.save(update_fields=['vagas_disponiveis'])
-
-            # notificação ao passageiro — usar reverse para link
-            Notificacao.objects.create(
-                usuario=solicitacao.passageiro,
+            except CorridaIndisponivel:
+                return JsonResponse({"ok": False, "error": "A corrida não está mais ativa."}, status=400)
+            except SolicitacaoIndisponivel:
+                return JsonResponse({"ok": False, "error": "Solicitação não pode mais ser aceita"}, status=400)
+
+            # notificação ao passageiro (após o commit) — usar reverse para link
+            notificar(
+                solicitacao.passageiro,
                 titulo="Solicitação Aceita",
                 mensagem=f"Sua solicitação para a corrida {corrida.origem} → {corrida.destino} foi aceita!",
                 tipo=Notificacao.TIPO_SOLICITACAO_RESPONDIDA,
@@ -1269,15 +1344,21 @@ def motorista_iniciar_corrida(request, corrida_id):
         corrida_locked = Corrida.objects.select_for_update().get(pk=corrida.id)
         corrida_locked.iniciar()
 
-        solicitacoes_aceitas = SolicitacaoCarona.objects.filter(corrida=corrida_locked, status=SolicitacaoCarona.STATUS_ACEITA)
-        for sol in solicitacoes_aceitas:
-            Notificacao.objects.create(
-                usuario=sol.passageiro,
+        # notificações vão num bulk_create depois do commit (fora do lock da corrida)
+        solicitacoes_aceitas = SolicitacaoCarona.objects.filter(
+            corrida=corrida_locked, status=SolicitacaoCarona.STATUS_ACEITA
+        ).values_list('id', 'passageiro_id')
+        link = reverse("corrida:acompanhamento", args=[corrida_locked.id])
+        notificar_em_lote(
+            nova_notificacao(
+                usuario_id=passageiro_id,
                 titulo="Corrida Iniciada",
                 mensagem=f"A corrida {corrida_locked.origem} → {corrida_locked.destino} foi iniciada pelo motorista.",
                 tipo=Notificacao.TIPO_INICIO_CORRIDA,
-                dados={"corrida_id": corrida_locked.id, "solicitacao_id": sol.id, "link": reverse("corrida:acompanhamento", args=[corrida_locked.id])}
+                dados={"corrida_id": corrida_locked.id, "solicitacao_id": sol_id, "link": link}
             )
+            for sol_id, passageiro_id in solicitacoes_aceitas
+        )
 
     messages.success(request, "Corrida iniciada com sucesso.")
     return redirect(reverse("corrida:detalhe_corrida", args=[corrida_id]))
@@ -1299,15 +1380,19 @@ def motorista_encerrar_corrida(request, corrida_id):
         corrida_locked = Corrida.objects.select_for_update().get(pk=corrida.id)
         corrida_locked.encerrar()
 
-        solicitacoes_aceitas = SolicitacaoCarona.objects.filter(corrida=corrida_locked, status=SolicitacaoCarona.STATUS_ACEITA)
-        for sol in solicitacoes_aceitas:
-            Notificacao.objects.create(
-                usuario=sol.passageiro,
+        solicitacoes_aceitas = SolicitacaoCarona.objects.filter(
+            corrida=corrida_locked, status=SolicitacaoCarona.STATUS_ACEITA
+        ).values_list('id', 'passageiro_id')
+        notificar_em_lote(
+            nova_notificacao(
+                usuario_id=passageiro_id,
                 titulo="Corrida Encerrada",
                 mensagem=f"A corrida {corrida_locked.origem} → {corrida_locked.destino} foi encerrada pelo motorista.",
                 tipo=Notificacao.TIPO_FIM_CORRIDA,
-                dados={"corrida_id": corrida_locked.id, "solicitacao_id": sol.id}
+                dados={"corrida_id": corrida_locked.id, "solicitacao_id": sol_id}
             )
+            for sol_id, passageiro_id in solicitacoes_aceitas
+        )
 
     messages.success(request, "Corrida encerrada com sucesso.")
     return redirect(reverse("corrida:detalhe_corrida", args=[corrida_id]))
@@ -1327,8 +1412,12 @@ def passageiro_acompanhamento(request, corrida_id):
         if not solicitacao:
             raise Http404("Você não tem acesso a esta corrida.")
 
-    # busca último Payment existente
-    payment_obj = Payment.objects.filter(corrida=corrida).order_by('-created_at').first()
+    # só leitura: os Payments (um por passageiro) são criados em Corrida.iniciar
+    payment_obj = None
+    if solicitacao:
+        pagamentos = Payment.objects.com_conteudo().filter(corrida=corrida).order_by('-created_at')
+        # corridas antigas têm um Payment único, sem user
+        payment_obj = pagamentos.filter(user=request.user).first() or pagamentos.filter(user__isnull=True).first()
     payment = None
 
     def _normalize_payload(payload_raw):
@@ -1356,12 +1445,17 @@ def passageiro_acompanhamento(request, corrida_id):
         # extrair billing_url (prioriza campo do model se existir)
         billing_url = getattr(payment_obj, "billing_url", None) or data.get("billing_url") or data.get("url") or data.get("payment_url") or data.get("checkout_url")
 
-        # extrair brCode / brCodeBase64
-        brCodeBase64 = getattr(payment_obj, "brCodeBase64", None) or data.get("brCodeBase64") or (data.get("payload") or {}).get("brCodeBase64")
+        # extrair brCode; a imagem do QR é servida à parte (pagamentos:qr, com cache longo)
         brCode = getattr(payment_obj, "brCode", None) or data.get("brCode") or (data.get("payload") or {}).get("brCode")
 
-        # expires_in preferencialmente vindo do data, senão default 3600
-        expires_in = data.get("expires_in", 3600)
+        # QR vencido (expires_at) não é mostrado como pagável, mesmo antes da varredura marcar EXPIRED
+        expirado = status_efetivo(payment_obj) == Payment.STATUS_EXPIRED
+        if expirado:
+            expires_in = 0
+        elif payment_obj.expires_at:
+            expires_in = max(0, int((payment_obj.expires_at - timezone.now()).total_seconds()))
+        else:
+            expires_in = data.get("expires_in", 3600)
 
         # amount_display amigável — assumes model has amount_display method
         try:
@@ -1374,141 +1468,16 @@ def passageiro_acompanhamento(request, corrida_id):
 
         payment = {
             "id": payment_obj.id,
-            "status": payment_obj.status,
+            "status": Payment.STATUS_EXPIRED if expirado else payment_obj.status,
             "abacate_id": getattr(payment_obj, "abacate_id", None),
             "amount_display": amount_display,
-            "brCodeBase64": brCodeBase64,
-            "brCode": brCode,
+            "qr_url": None if expirado else payment_obj.qr_url,
+            "brCode": None if expirado else brCode,
             "expires_in": expires_in,
             "billing_url": billing_url,
             "payload": payload,
         }
 
-    else:
-        # tentar criar/obter payment via service centralizado (recomendado)
-        try:
-            result = create_payment_for_corrida(corrida, user=request.user if request.user.is_authenticated else None)
-        except Exception as exc:
-            logger.exception("Erro ao chamar create_payment_for_corrida: %s", exc)
-            result = None
-
-        if result and isinstance(result, dict) and result.get("payment"):
-            p = result.get("payment")
-            data = result.get("data") or {}
-
-            # normalize billing_url & brcodes
-            billing_url = getattr(p, "billing_url", None) or data.get("billing_url") or data.get("url") or data.get("payment_url") or data.get("checkout_url")
-            brCodeBase64 = getattr(p, "brCodeBase64", None) or data.get("brCodeBase64") or (data.get("payload") or {}).get("brCodeBase64")
-            brCode = getattr(p, "brCode", None) or data.get("brCode") or (data.get("payload") or {}).get("brCode")
-            expires_in = data.get("expires_in", 3600)
-
-            try:
-                amount_display = p.amount_display()
-            except Exception:
-                try:
-                    amount_display = f"R$ {p.amount_cents/100:.2f}"
-                except Exception:
-                    amount_display = None
-
-            payment = {
-                "id": p.id,
-                "amount_display": amount_display,
-                "brCode": brCode,
-                "brCodeBase64": brCodeBase64,
-                "status": p.status,
-                "payload": p.payload,
-                "expires_in": expires_in,
-                "billing_url": billing_url,
-            }
-
-        else:
-            # fallback antigo: criar manualmente (se create_payment_for_corrida falhar)
-            valor = corrida.valor if corrida.valor is not None else (getattr(corrida, 'parent_template', None) and corrida.parent_template.valor)
-            if valor is None:
-                payment = None
-            else:
-                valor = Decimal(str(valor)) if not isinstance(valor, Decimal) else valor
-                amount_cents = int(round(float(valor) * 100))
-                p = Payment.objects.create(
-                    corrida=corrida,
-                    user=request.user if request.user.is_authenticated else None,
-                    amount_cents=amount_cents,
-                    status=getattr(Payment, "STATUS_PENDING", "PENDING")
-                )
-
-                description = f"Pagamento corrida #{corrida.id}"
-                external_id = f"corrida-{corrida.id}-payment-{p.id}"
-
-                # montar customer
-                customer = None
-                if request.user.is_authenticated:
-                    nome = getattr(request.user, "nome", "") or ""
-                    email = getattr(request.user, "email", "") or ""
-                    telefone = getattr(request.user, "telefone", "") or ""
-                    taxid = getattr(request.user, "cpf", None) or getattr(getattr(request.user, "profile_data", {}), "cpf", "")
-                    phone_digits = re.sub(r"\D", "", telefone)
-                    taxid_digits = re.sub(r"\D", "", str(taxid))
-                    if phone_digits and taxid_digits:
-                        customer = {
-                            "name": nome,
-                            "email": email,
-                            "cellphone": phone_digits,
-                            "taxId": taxid_digits
-                        }
-
-                # chama serviço AbacatePay diretamente (fallback)
-                try:
-                    result = criar_pix_qr(amount_cents, description, external_id, customer=customer)
-                except Exception as exc:
-                    logger.exception("Erro ao chamar criar_pix_qr fallback: %s", exc)
-                    result = None
-
-                raw = result.get("body") if isinstance(result, dict) else result
-                status_code = int(result.get("status_code", 0)) if isinstance(result, dict) else 200
-                ok = result.get("ok") if isinstance(result, dict) else True
-
-                if not ok or (status_code and status_code not in (200, 201)):
-                    # falha ao criar cobrança
-                    p.payload = raw
-                    p.status = getattr(Payment, "STATUS_FAILED", "FAILED")
-                    p.save(update_fields=["payload", "status"])
-                    payment = None
-                else:
-                    data = {}
-                    if isinstance(raw, dict):
-                        data = raw.get("data", {}) or {}
-
-                    billing_url = data.get("url") or data.get("billing_url") or data.get("payment_url") or data.get("checkout_url")
-                    p.abacate_id = data.get("id") or data.get("payment_id") or p.abacate_id
-                    p.brCode = data.get("brCode") or p.brCode
-                    p.brCodeBase64 = data.get("brCodeBase64") or p.brCodeBase64
-                    p.payload = raw
-                    p.status = getattr(Payment, "STATUS_CREATED", "CREATED")
-
-                    if billing_url and hasattr(p, "billing_url"):
-                        try:
-                            setattr(p, "billing_url", billing_url)
-                        except Exception:
-                            logger.exception("Falha ao setar campo billing_url no Payment")
-
-                    save_fields = ["abacate_id", "brCode", "brCodeBase64", "payload", "status"]
-                    if hasattr(p, "billing_url") and billing_url:
-                        save_fields.append("billing_url")
-                    try:
-                        p.save(update_fields=[f for f in save_fields if hasattr(p, f)])
-                    except Exception:
-                        p.save()
-
-                    payment = {
-                        "id": p.id,
-                        "amount_display": p.amount_display(),
-                        "brCode": p.brCode,
-                        "brCodeBase64": p.brCodeBase64,
-                        "status": p.status,
-                        "payload": p.payload,
-                        "expires_in": data.get("expires_in", 3600),
-                        "billing_url": billing_url,
-                    }
 
     # notificações
     from notificacao.models import Notificacao
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "tarefa", "status", "prioridade", "tentativas", "executar_apos", "travado_por", "criado_em")
+    list_filter = ("status", "tarefa")
+    search_fields = ("tarefa",)
+    readonly_fields = ("ultimo_erro", "criado_em", "concluido_em", "travado_por", "travado_ate")
+    actions = ["reprocessar"]
+
+    @admin.action(description="Reenfileirar (volta para pendente)")
+    def reprocessar(self, request, queryset):
+        n = queryset.exclude(status__in=[Job.STATUS_FEITO, Job.STATUS_EXECUTANDO]).update(
+            status=Job.STATUS_PENDENTE, tentativas=0, executar_apos=timezone.now()
+        )
+        self.message_user(request, f"{n} job(s) reenfileirado(s).")
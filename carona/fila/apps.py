@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class FilaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'fila'
+
+    def ready(self):
+        # registra as tarefas declaradas em <app>/tarefas.py
+        autodiscover_modules("tarefas")
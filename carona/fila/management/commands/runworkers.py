@@ -0,0 +1,64 @@
+# fila/management/commands/runworkers.py
+"""
+Workers da fila em banco, ex.:
+python manage.py runworkers --threads 4
+python manage.py runworkers --processos 2 --threads 4
+python manage.py runworkers --status
+SIGINT/SIGTERM: param de reservar jobs e terminam os que estão em andamento.
+"""
+import json
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from fila import worker
+from fila.processo import rodar_processo
+from fila.services import contagem_por_status
+from fila.tarefas import registradas
+
+
+class Command(BaseCommand):
+    help = "Executa os jobs da fila (pool de threads, opcionalmente em vários processos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="Threads por processo")
+        parser.add_argument("--processos", type=int, default=1)
+        parser.add_argument("--lote", type=int, default=1, help="Jobs reservados por vez em cada thread")
+        parser.add_argument("--espera", type=float, default=worker.ESPERA_VAZIA_S,
+                            help="Segundos de espera quando a fila está vazia")
+        parser.add_argument("--metricas", type=float, default=60.0, help="Intervalo (s) do log de métricas")
+        parser.add_argument("--status", action="store_true", help="Mostra a profundidade da fila e sai")
+
+    def handle(self, *args, **opts):
+        if opts["status"]:
+            self.stdout.write(json.dumps({"fila": contagem_por_status(), "tarefas": registradas()}))
+            return
+
+        config = (opts["threads"], opts["lote"], opts["espera"], opts["metricas"])
+        if opts["processos"] <= 1:
+            resumo = worker.rodar(*config)
+            self.stdout.write(f"Workers encerrados: {json.dumps(resumo)}")
+            return
+
+        # spawn: funciona também no Windows; cada filho faz o próprio django.setup()
+        ctx = multiprocessing.get_context("spawn")
+        filhos = [ctx.Process(target=rodar_processo, args=config, name=f"fila-{i}")
+                  for i in range(opts["processos"])]
+        for p in filhos:
+            p.start()
+
+        parar = threading.Event()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sinal, lambda *_: parar.set())
+        while not parar.wait(1.0):
+            if not any(p.is_alive() for p in filhos):
+                break
+        # SIGTERM nos filhos: cada um drena os jobs em andamento antes de sair
+        for p in filhos:
+            if p.is_alive():
+                p.terminate()
+        for p in filhos:
+            p.join()
+        self.stdout.write(f"{len(filhos)} processo(s) de workers encerrado(s).")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarefa', models.CharField(max_length=100)),
+                ('args', models.JSONField(blank=True, default=dict)),
+                ('prioridade', models.SmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EXECUTANDO', 'Executando'), ('FEITO', 'Feito'), ('MORTO', 'Dead-letter')], default='PENDENTE', max_length=12)),
+                ('executar_apos', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('max_tentativas', models.PositiveIntegerField(default=5)),
+                ('travado_por', models.CharField(blank=True, max_length=100)),
+                ('travado_ate', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-prioridade', 'executar_apos'], name='fila_job_reserva_idx')],
+            },
+        ),
+    ]
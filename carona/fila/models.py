@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Tarefa da fila em banco (fila.services / fila.worker). `tarefa` é o nome
+    registrado em fila.tarefas; `args` vira kwargs da função.
+    """
+    STATUS_PENDENTE = "PENDENTE"
+    STATUS_EXECUTANDO = "EXECUTANDO"
+    STATUS_FEITO = "FEITO"
+    STATUS_MORTO = "MORTO"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_EXECUTANDO, "Executando"),
+        (STATUS_FEITO, "Feito"),
+        (STATUS_MORTO, "Dead-letter"),
+    ]
+
+    tarefa = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    # maior prioridade sai primeiro
+    prioridade = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    executar_apos = models.DateTimeField(default=timezone.now)
+    tentativas = models.PositiveIntegerField(default=0)
+    max_tentativas = models.PositiveIntegerField(default=5)
+    # posse do job enquanto EXECUTANDO; vencida, ele volta a ser reservável
+    travado_por = models.CharField(max_length=100, blank=True)
+    travado_ate = models.DateTimeField(null=True, blank=True)
+    ultimo_erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-prioridade", "executar_apos"], name="fila_job_reserva_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tarefa} #{self.id} - {self.status}"
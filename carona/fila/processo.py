@@ -0,0 +1,13 @@
+# fila/processo.py
+"""
+Ponto de entrada dos processos filhos do runworkers (multiprocessing spawn).
+Sem imports do Django no topo: o filho reimporta este módulo antes do setup.
+"""
+
+
+def rodar_processo(threads: int, lote: int, espera_s: float, metricas_s: float) -> None:
+    import django
+    django.setup()
+
+    from fila.worker import rodar
+    rodar(threads=threads, lote=lote, espera_s=espera_s, metricas_s=metricas_s)
@@ -0,0 +1,64 @@
+# fila/services.py
+"""
+API de enfileiramento.
+
+- enfileirar: grava o job na transação corrente. Se a transação for desfeita, o
+  job some junto — é o outbox transacional: efeito colateral e dado de negócio
+  entram (ou não) juntos.
+- enfileirar_apos_commit: grava o job só depois do commit (transaction.on_commit),
+  para quem não precisa da atomicidade e não quer alongar a transação.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Job
+from .tarefas import obter
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVAS_PADRAO = 5
+
+
+def _novo_job(tarefa: str, args: Optional[dict], prioridade: int, executar_apos: Optional[datetime],
+              atraso_s: Optional[float], max_tentativas: int) -> Job:
+    obter(tarefa)  # falha cedo para nome de tarefa inexistente
+    if executar_apos is None:
+        executar_apos = timezone.now()
+        if atraso_s:
+            executar_apos += timedelta(seconds=atraso_s)
+    return Job(
+        tarefa=tarefa,
+        args=args or {},
+        prioridade=prioridade,
+        executar_apos=executar_apos,
+        max_tentativas=max_tentativas,
+    )
+
+
+def enfileirar(tarefa: str, args: Optional[dict] = None, *, prioridade: int = 0,
+               executar_apos: Optional[datetime] = None, atraso_s: Optional[float] = None,
+               max_tentativas: int = MAX_TENTATIVAS_PADRAO) -> Job:
+    """Grava o job agora (na transação corrente, se houver)."""
+    job = _novo_job(tarefa, args, prioridade, executar_apos, atraso_s, max_tentativas)
+    job.save()
+    return job
+
+
+def enfileirar_apos_commit(tarefa: str, args: Optional[dict] = None, *, prioridade: int = 0,
+                           executar_apos: Optional[datetime] = None, atraso_s: Optional[float] = None,
+                           max_tentativas: int = MAX_TENTATIVAS_PADRAO) -> None:
+    """Grava o job depois do commit da transação corrente (imediatamente fora de transação)."""
+    job = _novo_job(tarefa, args, prioridade, executar_apos, atraso_s, max_tentativas)
+    transaction.on_commit(job.save, robust=True)
+
+
+def contagem_por_status() -> dict:
+    """Profundidade da fila: {status: n}."""
+    contagem = {status: 0 for status, _ in Job.STATUS_CHOICES}
+    contagem.update(Job.objects.values_list("status").annotate(n=Count("id")).order_by())
+    return contagem
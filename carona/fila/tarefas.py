@@ -0,0 +1,38 @@
+# fila/tarefas.py
+"""
+Registro de tarefas da fila. Cada app declara as suas em <app>/tarefas.py:
+
+    from fila.tarefas import tarefa
+
+    @tarefa("pagamentos.criar_cobranca")
+    def criar_cobranca(entrada_id): ...
+
+Os módulos são importados no ready() do app fila (autodiscover_modules).
+"""
+from typing import Callable, Dict, Optional
+
+_registro: Dict[str, Callable] = {}
+
+
+class TarefaDesconhecida(LookupError):
+    """Nome de tarefa sem função registrada."""
+
+
+def tarefa(nome: Optional[str] = None):
+    """Decorator: registra a função sob `nome` (padrão: módulo.função)."""
+    def registrar(func):
+        func.nome_tarefa = nome or f"{func.__module__}.{func.__name__}"
+        _registro[func.nome_tarefa] = func
+        return func
+    return registrar
+
+
+def obter(nome: str) -> Callable:
+    try:
+        return _registro[nome]
+    except KeyError:
+        raise TarefaDesconhecida(nome) from None
+
+
+def registradas() -> list:
+    return sorted(_registro)
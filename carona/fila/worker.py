@@ -0,0 +1,220 @@
+# fila/worker.py
+"""
+Execução dos jobs da fila.
+
+`reservar` pega os próximos jobs com um único UPDATE ... RETURNING (SQLite 3.35+
+e PostgreSQL): marca EXECUTANDO, incrementa tentativas e grava a posse
+(travado_por/travado_ate) no mesmo comando, sem janela entre ler e marcar. No
+PostgreSQL a subconsulta usa FOR UPDATE SKIP LOCKED. Job EXECUTANDO com posse
+vencida (worker morto) volta a ser reservável.
+
+A função da tarefa roda fora de transação; o resultado (FEITO, nova tentativa
+com backoff ou MORTO) é gravado depois. `rodar` sobe N threads e, ao receber
+SIGINT/SIGTERM, para de reservar e espera os jobs em andamento terminarem.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.utils import timezone
+
+from .models import Job
+from .services import contagem_por_status
+from .tarefas import obter
+
+logger = logging.getLogger(__name__)
+
+# posse de um job reservado; tarefas mais longas que isso podem rodar duas vezes
+TRAVA_S = getattr(settings, "FILA_TRAVA_S", 300)
+BACKOFF_BASE_S = 10
+BACKOFF_MAX_S = 3600
+ESPERA_VAZIA_S = 1.0
+
+
+class JobReservado(NamedTuple):
+    id: int
+    tarefa: str
+    args: dict
+    prioridade: int
+    tentativas: int
+    max_tentativas: int
+
+
+def _sql_reserva() -> str:
+    tabela = connection.ops.quote_name(Job._meta.db_table)
+    skip_locked = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+    return f"""
+        UPDATE {tabela}
+           SET status = %s, tentativas = tentativas + 1, travado_por = %s, travado_ate = %s
+         WHERE id IN (
+               SELECT id FROM {tabela}
+                WHERE (status = %s AND executar_apos <= %s)
+                   OR (status = %s AND travado_ate < %s)
+                ORDER BY prioridade DESC, id
+                LIMIT %s{skip_locked}
+         )
+        RETURNING id, tarefa, args, prioridade, tentativas, max_tentativas
+    """
+
+
+def reservar(worker: str, quantidade: int = 1) -> List[JobReservado]:
+    """Reserva até `quantidade` jobs prontos para `worker`, em ordem de prioridade."""
+    agora = timezone.now()
+    ops = connection.ops
+    params = [
+        Job.STATUS_EXECUTANDO, worker, ops.adapt_datetimefield_value(agora + timedelta(seconds=TRAVA_S)),
+        Job.STATUS_PENDENTE, ops.adapt_datetimefield_value(agora),
+        Job.STATUS_EXECUTANDO, ops.adapt_datetimefield_value(agora),
+        quantidade,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_reserva(), params)
+        linhas = cursor.fetchall()
+    jobs = []
+    for id_, tarefa, args, prioridade, tentativas, max_tentativas in linhas:
+        if isinstance(args, str):
+            args = json.loads(args)
+        jobs.append(JobReservado(id_, tarefa, args or {}, prioridade, tentativas, max_tentativas))
+    # RETURNING não garante ordem
+    jobs.sort(key=lambda j: (-j.prioridade, j.id))
+    return jobs
+
+
+def _backoff(tentativas: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_S * 2 ** (tentativas - 1), BACKOFF_MAX_S))
+
+
+class Metricas:
+    """Contadores do processo (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.feitos = 0
+        self.falhas = 0
+        self.mortos = 0
+        self.duracao_total_s = 0.0
+        self.por_tarefa = Counter()
+
+    def registrar(self, tarefa: str, status: str, duracao_s: float) -> None:
+        with self._lock:
+            self.duracao_total_s += duracao_s
+            self.por_tarefa[tarefa] += 1
+            if status == Job.STATUS_FEITO:
+                self.feitos += 1
+            elif status == Job.STATUS_MORTO:
+                self.mortos += 1
+            else:
+                self.falhas += 1
+
+    def resumo(self) -> dict:
+        with self._lock:
+            executados = self.feitos + self.falhas + self.mortos
+            decorrido = time.monotonic() - self.inicio
+            return {
+                "feitos": self.feitos,
+                "falhas": self.falhas,
+                "mortos": self.mortos,
+                "jobs_por_s": round(executados / decorrido, 2) if decorrido else 0.0,
+                "duracao_media_ms": round(1000 * self.duracao_total_s / executados, 1) if executados else 0.0,
+                "por_tarefa": dict(self.por_tarefa),
+            }
+
+
+def executar(job: JobReservado, worker: str, metricas: Optional[Metricas] = None) -> str:
+    """Roda a tarefa do job e grava o resultado. Retorna o status final."""
+    inicio = time.monotonic()
+    try:
+        obter(job.tarefa)(**job.args)
+    except Exception as exc:
+        agora = timezone.now()
+        logger.exception("Job %s (%s) falhou na tentativa %s", job.id, job.tarefa, job.tentativas)
+        campos = {"ultimo_erro": f"{type(exc).__name__}: {exc}"[:2000], "travado_por": "", "travado_ate": None}
+        if job.tentativas >= job.max_tentativas:
+            status = Job.STATUS_MORTO
+            campos["concluido_em"] = agora
+            logger.error("Job %s (%s) movido para dead-letter após %s tentativas", job.id, job.tarefa, job.tentativas)
+        else:
+            status = Job.STATUS_PENDENTE
+            campos["executar_apos"] = agora + _backoff(job.tentativas)
+    else:
+        status = Job.STATUS_FEITO
+        campos = {"concluido_em": timezone.now(), "ultimo_erro": "", "travado_por": "", "travado_ate": None}
+    # só grava se a posse ainda é deste worker (se venceu, outro worker assumiu)
+    Job.objects.filter(id=job.id, status=Job.STATUS_EXECUTANDO, travado_por=worker).update(status=status, **campos)
+    if metricas is not None:
+        metricas.registrar(job.tarefa, status, time.monotonic() - inicio)
+    return status
+
+
+class Worker(threading.Thread):
+    def __init__(self, nome: str, parar: threading.Event, metricas: Metricas,
+                 lote: int = 1, espera_s: float = ESPERA_VAZIA_S):
+        super().__init__(name=nome, daemon=True)
+        self.nome = nome
+        self.parar = parar
+        self.metricas = metricas
+        self.lote = lote
+        self.espera_s = espera_s
+
+    def run(self):
+        try:
+            while not self.parar.is_set():
+                close_old_connections()
+                try:
+                    jobs = reservar(self.nome, self.lote)
+                except Exception:
+                    logger.exception("Worker %s: falha ao reservar jobs", self.nome)
+                    jobs = []
+                if not jobs:
+                    self.parar.wait(self.espera_s)
+                    continue
+                # jobs já reservados rodam até o fim mesmo durante o desligamento
+                for job in jobs:
+                    executar(job, self.nome, self.metricas)
+        finally:
+            connections.close_all()
+
+
+def rodar(threads: int = 1, lote: int = 1, espera_s: float = ESPERA_VAZIA_S, metricas_s: float = 60.0,
+          parar: Optional[threading.Event] = None) -> dict:
+    """
+    Sobe `threads` workers neste processo até SIGINT/SIGTERM (ou `parar`), drena
+    os jobs em andamento e retorna o resumo das métricas.
+    """
+    parar = parar or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sinal, lambda *_: parar.set())
+
+    prefixo = f"{socket.gethostname()}:{os.getpid()}"
+    metricas = Metricas()
+    workers = [Worker(f"{prefixo}:{i}", parar, metricas, lote, espera_s) for i in range(threads)]
+    for w in workers:
+        w.start()
+    logger.info("Fila: %s worker(s) em %s", threads, prefixo)
+
+    while not parar.wait(metricas_s):
+        try:
+            fila = contagem_por_status()
+        except Exception:
+            fila = {}
+        finally:
+            connections.close_all()
+        logger.info("Fila %s: %s | fila=%s", prefixo, metricas.resumo(), fila)
+
+    logger.info("Fila %s: drenando jobs em andamento...", prefixo)
+    for w in workers:
+        w.join()
+    resumo = metricas.resumo()
+    logger.info("Fila %s encerrada: %s", prefixo, resumo)
+    return resumo
@@ -0,0 +1,10 @@
+# notificacao/context_processors.py
+from .services import contagem_nao_lidas
+
+
+def notificacoes(request):
+    """Expõe `notificacoes_nao_lidas` (do contador em cache) para o badge do menu."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"notificacoes_nao_lidas": contagem_nao_lidas(user.id)}
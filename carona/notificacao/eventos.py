@@ -0,0 +1,81 @@
+# notificacao/eventos.py
+"""
+Pub/sub em processo para o stream SSE (views.stream_eventos).
+
+Cada conexão SSE aberta neste processo registra uma Assinatura (fila asyncio
+ligada ao event loop da conexão). `publicar` entrega os eventos depois do commit
+da transação corrente, a partir de qualquer thread, via call_soon_threadsafe.
+
+Eventos gerados em outro processo (outro worker, comandos de management) não
+passam por aqui: o stream cobre esse caso com um polling leve no banco.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Iterable
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# eventos acumulados por conexão; cliente lento perde o excedente (o polling cobre)
+TAMANHO_FILA = 100
+
+_lock = threading.Lock()
+_assinantes = defaultdict(set)  # usuario_id -> {Assinatura}
+
+
+class Assinatura:
+    def __init__(self, usuario_id: int):
+        self.usuario_id = usuario_id
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+
+    def _entregar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            pass
+
+
+def assinar(usuario_id: int) -> Assinatura:
+    """Registra uma assinatura para o usuário. Chamar de dentro do event loop."""
+    assinatura = Assinatura(usuario_id)
+    with _lock:
+        _assinantes[usuario_id].add(assinatura)
+    return assinatura
+
+
+def cancelar(assinatura: Assinatura) -> None:
+    with _lock:
+        conjunto = _assinantes.get(assinatura.usuario_id)
+        if conjunto is not None:
+            conjunto.discard(assinatura)
+            if not conjunto:
+                del _assinantes[assinatura.usuario_id]
+
+
+def ha_assinantes() -> bool:
+    """Há algum stream aberto neste processo? (evita montar eventos à toa)"""
+    return bool(_assinantes)
+
+
+def _despachar(usuario_ids, tipo: str, dados: dict) -> None:
+    with _lock:
+        alvos = [a for uid in usuario_ids for a in _assinantes.get(uid, ())]
+    for assinatura in alvos:
+        try:
+            assinatura.loop.call_soon_threadsafe(assinatura._entregar, (tipo, dados))
+        except RuntimeError:
+            # loop já encerrado; a assinatura some no finally do stream
+            pass
+
+
+def publicar(usuario_ids: Iterable[int], tipo: str, dados: dict) -> None:
+    """Entrega (tipo, dados) aos streams abertos dos usuários, após o commit."""
+    if not _assinantes:
+        return
+    ids = {uid for uid in usuario_ids if uid}
+    if ids:
+        transaction.on_commit(lambda: _despachar(ids, tipo, dados), robust=True)
@@ -0,0 +1,36 @@
+# notificacao/management/commands/manter_notificacoes.py
+"""
+Retenção de notificações: compacta repetidas em resumos e apaga lidas antigas.
+Pensado para rodar periodicamente (cron), ex.:
+0 4 * * * python manage.py manter_notificacoes
+"""
+from django.core.management.base import BaseCommand
+
+from notificacao.manutencao import (
+    DIGEST_HORAS,
+    DIGEST_MINIMO,
+    LOTE_PADRAO,
+    RETENCAO_DIAS,
+    compactar_repetidas,
+    expurgar_lidas,
+)
+
+
+class Command(BaseCommand):
+    help = "Compacta notificações repetidas por corrida e apaga notificações lidas antigas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=RETENCAO_DIAS, help="Idade mínima (dias) das lidas a apagar")
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+        parser.add_argument("--digest-horas", type=int, default=DIGEST_HORAS, help="Idade mínima (horas) para compactar")
+        parser.add_argument("--digest-minimo", type=int, default=DIGEST_MINIMO, help="Repetições mínimas para virar resumo")
+        parser.add_argument("--sem-digest", action="store_true", help="Só aplica a retenção")
+
+    def handle(self, *args, **opts):
+        compactadas = 0
+        if not opts["sem_digest"]:
+            compactadas = compactar_repetidas(horas=opts["digest_horas"], minimo=opts["digest_minimo"])
+        apagadas = expurgar_lidas(dias=opts["dias"], lote=opts["lote"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{compactadas} notificação(ões) compactada(s) em resumos, {apagadas} lida(s) apagada(s)."
+        ))
@@ -0,0 +1,122 @@
+# notificacao/manutencao.py
+"""
+Retenção e compactação de notificações.
+
+- expurgar_lidas: apaga, em lotes, notificações lidas mais velhas que N dias.
+- compactar_repetidas: junta notificações repetidas do mesmo tipo para a mesma
+  corrida (ex.: várias "Nova solicitação de vaga") num único resumo
+  ("5 novas solicitações..."), ajustando o contador de não lidas.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notificacao
+from .services import ajustar_contadores
+
+logger = logging.getLogger(__name__)
+
+RETENCAO_DIAS = getattr(settings, "NOTIFICACAO_RETENCAO_DIAS", 60)
+# só compacta o que já tem essa idade (não mexe no que o usuário acabou de receber)
+DIGEST_HORAS = getattr(settings, "NOTIFICACAO_DIGEST_HORAS", 24)
+DIGEST_MINIMO = getattr(settings, "NOTIFICACAO_DIGEST_MINIMO", 3)
+LOTE_PADRAO = 1000
+
+TITULOS_DIGEST = {
+    Notificacao.TIPO_SOLICITACAO_RECEBIDA: "{n} novas solicitações de vaga",
+    Notificacao.TIPO_SOLICITACAO_RESPONDIDA: "{n} solicitações respondidas",
+    Notificacao.TIPO_PAGAMENTO_CONFIRMADO: "{n} pagamentos confirmados",
+}
+
+
+def expurgar_lidas(dias: int = RETENCAO_DIAS, lote: int = LOTE_PADRAO, agora: Optional[datetime] = None) -> int:
+    """Apaga notificações lidas criadas há mais de `dias`, `lote` por transação."""
+    corte = (agora or timezone.now()) - timedelta(days=dias)
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Notificacao.objects
+                .filter(lida=True, criada_em__lt=corte)
+                .order_by("id")
+                .values_list("id", flat=True)[:lote]
+            )
+            if ids:
+                Notificacao.objects.filter(id__in=ids).delete()
+        total += len(ids)
+        if len(ids) < lote:
+            break
+    if total:
+        logger.info("Expurgadas %s notificação(ões) lidas anteriores a %s", total, corte.isoformat())
+    return total
+
+
+def _grupos_repetidos(corte, minimo):
+    return (
+        Notificacao.objects
+        .filter(criada_em__lt=corte, corrida__isnull=False)
+        .values("usuario_id", "corrida_id", "tipo")
+        .annotate(n=Count("id"))
+        .filter(n__gte=minimo)
+        .order_by()
+    )
+
+
+def _compactar_grupo(usuario_id, corrida_id, tipo, corte) -> int:
+    """Substitui as notificações do grupo por um resumo. Retorna quantas linhas a tabela perdeu."""
+    with transaction.atomic():
+        itens = list(
+            Notificacao.objects
+            .select_related("corrida")
+            .filter(usuario_id=usuario_id, corrida_id=corrida_id, tipo=tipo, criada_em__lt=corte)
+            .order_by("criada_em", "id")
+        )
+        if len(itens) < 2:
+            return 0
+
+        # resumos anteriores entram com a quantidade que já representavam
+        quantidade = sum(int((n.dados or {}).get("quantidade", 1)) for n in itens)
+        nao_lidas = sum(1 for n in itens if not n.lida)
+        ultima = itens[-1]
+        corrida = ultima.corrida
+
+        titulo = TITULOS_DIGEST.get(tipo, "{n} notificações").format(n=quantidade)
+        resumo = Notificacao.objects.create(
+            usuario_id=usuario_id,
+            corrida_id=corrida_id,
+            tipo=tipo,
+            titulo=titulo,
+            mensagem=f"{titulo} na corrida {corrida.origem} → {corrida.destino}.",
+            dados={
+                "corrida_id": corrida_id,
+                "digest": True,
+                "quantidade": quantidade,
+                "link": (ultima.dados or {}).get("link"),
+            },
+            lida=not nao_lidas,
+        )
+        # o resumo ocupa o lugar da mais recente na ordem cronológica
+        Notificacao.objects.filter(id=resumo.id).update(criada_em=ultima.criada_em)
+        Notificacao.objects.filter(id__in=[n.id for n in itens]).delete()
+
+        delta = (1 if nao_lidas else 0) - nao_lidas
+        if delta:
+            ajustar_contadores(Counter({usuario_id: delta}))
+    return len(itens) - 1
+
+
+def compactar_repetidas(horas: int = DIGEST_HORAS, minimo: int = DIGEST_MINIMO, agora: Optional[datetime] = None) -> int:
+    """Compacta os grupos (usuario, corrida, tipo) com `minimo`+ notificações. Retorna as linhas economizadas."""
+    corte = (agora or timezone.now()) - timedelta(hours=horas)
+    removidas = 0
+    for g in list(_grupos_repetidos(corte, minimo)):
+        removidas += _compactar_grupo(g["usuario_id"], g["corrida_id"], g["tipo"], corte)
+    if removidas:
+        logger.info("Compactadas %s notificação(ões) repetidas em resumos", removidas)
+    return removidas
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificacao', '0002_alter_notificacao_tipo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacao',
+            name='tipo',
+            field=models.CharField(choices=[('solicitacao_recebida', 'Solicitação recebida'), ('solicitacao_respondida', 'Solicitação respondida'), ('inicio_corrida', 'Início de corrida'), ('fim_corrida', 'Fim de corrida'), ('pagamento_confirmado', 'Pagamento confirmado'), ('corrida_expirada', 'Corrida expirada')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_contadores(apps, schema_editor):
+    Notificacao = apps.get_model('notificacao', 'Notificacao')
+    ContadorNotificacoes = apps.get_model('notificacao', 'ContadorNotificacoes')
+    contagens = (
+        Notificacao.objects.filter(lida=False)
+        .values('usuario_id')
+        .annotate(n=Count('id'))
+    )
+    ContadorNotificacoes.objects.bulk_create(
+        [ContadorNotificacoes(usuario_id=c['usuario_id'], nao_lidas=c['n']) for c in contagens],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificacao', '0003_alter_notificacao_tipo_expirada'),
+        ('usuarios', '0004_alter_usuario_tipo_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificacoes',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificacoes', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('nao_lidas', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_corrida(apps, schema_editor):
+    Notificacao = apps.get_model('notificacao', 'Notificacao')
+    Corrida = apps.get_model('corrida', 'Corrida')
+    existentes = set(Corrida.objects.values_list('id', flat=True))
+
+    lote = []
+    for n in Notificacao.objects.only('id', 'dados').iterator(chunk_size=1000):
+        dados = n.dados if isinstance(n.dados, dict) else {}
+        try:
+            corrida_id = int(dados.get('corrida_id') or dados.get('corrida'))
+        except (TypeError, ValueError):
+            continue
+        if corrida_id in existentes:
+            n.corrida_id = corrida_id
+            lote.append(n)
+        if len(lote) >= 1000:
+            Notificacao.objects.bulk_update(lote, ['corrida'])
+            lote = []
+    if lote:
+        Notificacao.objects.bulk_update(lote, ['corrida'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0013_corridahistorico'),
+        ('notificacao', '0004_contadornotificacoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacao',
+            name='corrida',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificacoes', to='corrida.corrida'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['usuario', '-criada_em', '-id'], name='notif_usuario_criada_idx'),
+        ),
+        migrations.RunPython(preencher_corrida, migrations.RunPython.noop),
+    ]
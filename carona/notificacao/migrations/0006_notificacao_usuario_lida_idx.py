@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0013_corridahistorico'),
+        ('notificacao', '0005_notificacao_corrida'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(fields=['usuario', 'lida', 'criada_em'], name='notif_usuario_lida_idx'),
+        ),
+    ]
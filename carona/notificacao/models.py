@@ -9,6 +9,7 @@ class Notificacao(models.Model):
     TIPO_INICIO_CORRIDA = 'inicio_corrida'
     TIPO_FIM_CORRIDA = 'fim_corrida'
     TIPO_PAGAMENTO_CONFIRMADO = 'pagamento_confirmado'
+    TIPO_CORRIDA_EXPIRADA = 'corrida_expirada'
 
     TIPO_CHOICES = [
         (TIPO_SOLICITACAO_RECEBIDA, 'Solicitação recebida'),
@@ -16,6 +17,7 @@ class Notificacao(models.Model):
         (TIPO_INICIO_CORRIDA, 'Início de corrida'),
         (TIPO_FIM_CORRIDA, 'Fim de corrida'),
         (TIPO_PAGAMENTO_CONFIRMADO, 'Pagamento confirmado'),
+        (TIPO_CORRIDA_EXPIRADA, 'Corrida expirada'),
     ]
 
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notificacoes')
@@ -23,11 +25,43 @@ class Notificacao(models.Model):
     mensagem = models.TextField()
     tipo = models.CharField(max_length=50, choices=TIPO_CHOICES)
     dados = models.JSONField(default=dict, blank=True)  # ex: {"corrida_id": 12, "solicitacao_id": 33}
+    # promovido de dados["corrida_id"] para permitir join (select_related) na listagem
+    corrida = models.ForeignKey(
+        'corrida.Corrida',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notificacoes'
+    )
     lida = models.BooleanField(default=False)
     criada_em = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-criada_em']
+        indexes = [
+            # paginação keyset da listagem: (criada_em, id) decrescentes por usuário
+            models.Index(fields=['usuario', '-criada_em', '-id'], name='notif_usuario_criada_idx'),
+            # não lidas por usuário (recontagem do contador) e retenção das lidas
+            models.Index(fields=['usuario', 'lida', 'criada_em'], name='notif_usuario_lida_idx'),
+        ]
 
     def __str__(self):
         return f"{self.usuario} - {self.titulo}"
+
+
+class ContadorNotificacoes(models.Model):
+    """
+    Contador desnormalizado de notificações não lidas por usuário.
+    Mantido pelo notificacao.services (criação em lote / marcar lida) com updates F().
+    """
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='contador_notificacoes'
+    )
+    nao_lidas = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.nao_lidas} não lida(s)"
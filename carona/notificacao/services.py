@@ -0,0 +1,142 @@
+# notificacao/services.py
+"""
+Serviço central de notificações.
+
+As notificações são montadas em memória e gravadas com um único bulk_create
+depois do commit da transação corrente (transaction.on_commit). Assim a escrita
+das notificações não prolonga locks de quem as disparou (ex.: a corrida durante
+iniciar/encerrar). Fora de transação, a gravação é imediata.
+
+O total de não lidas de cada usuário fica desnormalizado em ContadorNotificacoes
+(atualizado com F() na mesma transação do insert / da marcação como lida): o
+polling do badge lê uma linha pela chave, sem COUNT(*). Não há espelho no cache:
+com o cache padrão (LocMem, por processo) os outros processos e os workers da
+fila serviriam o badge velho até o timeout.
+"""
+import logging
+from collections import Counter
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F
+
+from . import eventos
+from .models import ContadorNotificacoes, Notificacao
+
+logger = logging.getLogger(__name__)
+
+def nova(usuario=None, *, usuario_id=None, titulo="", mensagem, tipo, dados: Optional[dict] = None,
+         corrida_id: Optional[int] = None) -> Notificacao:
+    """Monta (sem gravar) uma Notificacao. `corrida_id` vem de dados["corrida_id"] se omitido."""
+    if usuario is not None:
+        usuario_id = usuario.pk
+    dados = dados or {}
+    if corrida_id is None:
+        try:
+            corrida_id = int(dados["corrida_id"])
+        except (KeyError, TypeError, ValueError):
+            corrida_id = None
+    return Notificacao(
+        usuario_id=usuario_id,
+        titulo=titulo,
+        mensagem=mensagem,
+        tipo=tipo,
+        dados=dados,
+        corrida_id=corrida_id,
+    )
+
+
+def ajustar_contadores(por_usuario: Counter) -> None:
+    """Soma (ou subtrai, se negativo) não lidas por usuário. Chamar dentro de transação."""
+    ContadorNotificacoes.objects.bulk_create(
+        [ContadorNotificacoes(usuario_id=uid) for uid in por_usuario],
+        ignore_conflicts=True,
+    )
+    # agrupa usuários pelo mesmo delta: um UPDATE por valor distinto
+    por_delta = {}
+    for uid, delta in por_usuario.items():
+        if delta:
+            por_delta.setdefault(delta, []).append(uid)
+    for delta, ids in por_delta.items():
+        qs = ContadorNotificacoes.objects.filter(usuario_id__in=ids)
+        if delta < 0:
+            qs = qs.filter(nao_lidas__gte=-delta)
+        qs.update(nao_lidas=F("nao_lidas") + delta)
+
+
+def dados_evento(n: Notificacao) -> dict:
+    """Representação de uma notificação no stream SSE."""
+    return {
+        "id": n.id,
+        "titulo": n.titulo,
+        "mensagem": n.mensagem,
+        "tipo": n.tipo,
+        "dados": n.dados,
+        "criada_em": n.criada_em.isoformat() if n.criada_em else None,
+    }
+
+
+def _gravar(notificacoes):
+    try:
+        with transaction.atomic():
+            Notificacao.objects.bulk_create(notificacoes)
+            por_usuario = Counter(n.usuario_id for n in notificacoes if not n.lida)
+            if por_usuario:
+                ajustar_contadores(por_usuario)
+    except Exception:
+        logger.exception("Falha ao gravar %s notificação(ões)", len(notificacoes))
+        raise
+    if eventos.ha_assinantes():
+        for n in notificacoes:
+            if n.id is not None:
+                eventos.publicar([n.usuario_id], "notificacao", dados_evento(n))
+
+
+def notificar_em_lote(notificacoes: Iterable[Notificacao]) -> None:
+    """Agenda a gravação (bulk_create) das notificações para depois do commit."""
+    lista = list(notificacoes)
+    if not lista:
+        return
+    transaction.on_commit(lambda: _gravar(lista), robust=True)
+
+
+def notificar(usuario=None, **campos) -> None:
+    """Atalho para uma notificação só (mesma semântica de notificar_em_lote)."""
+    notificar_em_lote([nova(usuario, **campos)])
+
+
+def marcar_lida(usuario_id: int, notificacao_id: int) -> bool:
+    """
+    Marca a notificação como lida (UPDATE condicional) e decrementa o contador.
+    Retorna False se ela não existe / não é do usuário; True caso contrário.
+    """
+    with transaction.atomic():
+        mudou = Notificacao.objects.filter(
+            id=notificacao_id, usuario_id=usuario_id, lida=False
+        ).update(lida=True)
+        if not mudou:
+            return Notificacao.objects.filter(id=notificacao_id, usuario_id=usuario_id).exists()
+        ajustar_contadores(Counter({usuario_id: -1}))
+    return True
+
+
+def recalcular_contador(usuario_id: int) -> int:
+    """Reconta (COUNT) as não lidas e regrava o contador. Para reparo/backfill."""
+    with transaction.atomic():
+        total = Notificacao.objects.filter(usuario_id=usuario_id, lida=False).count()
+        ContadorNotificacoes.objects.update_or_create(
+            usuario_id=usuario_id, defaults={"nao_lidas": total}
+        )
+    return total
+
+
+def contagem_nao_lidas(usuario_id: int) -> int:
+    """Total de não lidas: coluna do contador, ou recontagem no primeiro acesso."""
+    total = (
+        ContadorNotificacoes.objects.filter(usuario_id=usuario_id)
+        .values_list("nao_lidas", flat=True)
+        .first()
+    )
+    if total is None:
+        return recalcular_contador(usuario_id)
+    return total
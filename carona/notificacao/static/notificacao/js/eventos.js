@@ -0,0 +1,62 @@
+// static/notificacao/js/eventos.js
+// Stream SSE do usuário (notificações, solicitações, pagamentos).
+// Cada evento é reemitido no document como CustomEvent "carona:<tipo>".
+// window.CaronaEventos.ativo diz se o stream está conectado: as páginas só
+// fazem polling quando ele não está (ex.: servidor WSGI responde 204).
+(function () {
+  'use strict';
+
+  const script = document.currentScript;
+  const estado = { ativo: false };
+  window.CaronaEventos = estado;
+
+  const urlEventos = script && script.dataset.urlEventos;
+  const urlContagem = script && script.dataset.urlContagem;
+
+  async function atualizarBadgeMenu() {
+    if (!urlContagem) return;
+    try {
+      const res = await fetch(urlContagem, { credentials: 'same-origin', cache: 'no-cache' });
+      if (!res.ok) return;
+      const js = await res.json();
+      const link = document.querySelector('.action-btn.notifications');
+      if (!link) return;
+      let badge = link.querySelector('.notification-badge');
+      if (!js.unread) {
+        if (badge) badge.remove();
+        return;
+      }
+      if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'notification-badge';
+        link.appendChild(badge);
+      }
+      badge.textContent = String(js.unread);
+    } catch (err) {
+      console.error('Erro atualizarBadgeMenu', err);
+    }
+  }
+
+  if (!window.EventSource || !urlEventos) return;
+
+  const fonte = new EventSource(urlEventos);
+  fonte.onopen = function () { estado.ativo = true; };
+  fonte.onerror = function () {
+    // reconectando (CONNECTING) ou recusado de vez (CLOSED): polling assume
+    estado.ativo = false;
+  };
+
+  ['notificacao', 'solicitacao', 'pagamento'].forEach(function (tipo) {
+    fonte.addEventListener(tipo, function (ev) {
+      let dados;
+      try {
+        dados = JSON.parse(ev.data);
+      } catch (e) {
+        return;
+      }
+      document.dispatchEvent(new CustomEvent('carona:' + tipo, { detail: dados }));
+    });
+  });
+
+  document.addEventListener('carona:notificacao', atualizarBadgeMenu);
+})();
@@ -48,7 +48,11 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 
     atualizarContagem();
-    setInterval(atualizarContagem, 6000);
+    // com o stream SSE conectado, o polling fica parado
+    setInterval(function () {
+        if (!(window.CaronaEventos && window.CaronaEventos.ativo)) atualizarContagem();
+    }, 6000);
+    document.addEventListener("carona:notificacao", atualizarContagem);
 });
 
 /* ------------------------------ */
@@ -72,7 +76,8 @@ function marcarComoLida(id, element) {
 
 /* ------------------------------ */
 function atualizarContagem() {
-    fetch("/notificacao/api/contagem/")
+    // revalida via ETag (304 quando nada mudou)
+    fetch("/notificacao/api/contagem/", { cache: "no-cache" })
         .then(r => r.json())
         .then(data => {
             const badge = document.getElementById("notif-badge");
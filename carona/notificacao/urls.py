@@ -8,5 +8,6 @@ urlpatterns = [
     path("", views.lista_notificacoes, name="lista"),
     path("api/marcar_lida/", views.api_marcar_lida, name="api_marcar_lida"),
     path("api/contagem/", views.api_contagem_nao_lidas, name="api_contagem"),
+    path("api/eventos/", views.stream_eventos, name="api_eventos"),
     
 ]
@@ -1,18 +1,67 @@
 # notificacao/views.py
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponseBadRequest
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render
+from django.db.models import Q
+from django.utils import timezone
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, Http404, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from .models import Notificacao
-from django.views.decorators.http import require_POST, require_GET
-from corrida.models import Corrida
+from django.views.decorators.http import require_POST, require_GET, condition
+from django.views.decorators.cache import cache_control
+from corrida.models import Corrida, SolicitacaoCarona
+from pagamentos.models import Payment
+from . import eventos
+from .services import contagem_nao_lidas, dados_evento, marcar_lida
 import json
 
+NOTIFICACOES_POR_PAGINA = 50
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _cursor_de(n) -> str:
+    """Cursor keyset "<microssegundos desde epoch>_<id>" da notificação."""
+    return f"{(n.criada_em - _EPOCH) // timedelta(microseconds=1)}_{n.id}"
+
+
+def _ler_cursor(valor):
+    try:
+        micros, nid = valor.split("_", 1)
+        return _EPOCH + timedelta(microseconds=int(micros)), int(nid)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
 @login_required
 def lista_notificacoes(request):
-    # mostra todas notificações do usuário (paginável se desejar)
-    notificacoes = list(Notificacao.objects.filter(usuario=request.user).order_by('-criada_em')[:100])
+    # paginação keyset em (criada_em, id): ?antes=<cursor> traz a página seguinte
+    qs = (
+        Notificacao.objects
+        .filter(usuario=request.user)
+        .select_related('corrida')
+        .only(
+            'id', 'titulo', 'mensagem', 'tipo', 'dados', 'lida', 'criada_em',
+            'corrida__id', 'corrida__status',
+        )
+        .order_by('-criada_em', '-id')
+    )
+    cursor = _ler_cursor(request.GET.get('antes'))
+    if cursor:
+        criada_em, nid = cursor
+        qs = qs.filter(Q(criada_em__lt=criada_em) | Q(criada_em=criada_em, id__lt=nid))
+
+    notificacoes = list(qs[:NOTIFICACOES_POR_PAGINA + 1])
+    proximo_cursor = None
+    if len(notificacoes) > NOTIFICACOES_POR_PAGINA:
+        notificacoes = notificacoes[:NOTIFICACOES_POR_PAGINA]
+        proximo_cursor = _cursor_de(notificacoes[-1])
 
-    # Normalizar/Enriquecer cada notificação com informações sobre a corrida (quando aplicável)
     for n in notificacoes:
         # garantir que n.dados seja dict (pode ser string JSON dependendo de como foi salvo)
         dados = n.dados
@@ -27,27 +76,15 @@ def lista_notificacoes(request):
         # expõe uma versão normalizada para o template (sem underscore)
         n.dados_normalizados = dados
 
-        # detectar corrida_id em keys comuns
-        corrida_id = None
-        if isinstance(dados, dict) and 'corrida_id' in dados:
-            corrida_id = dados.get('corrida_id')
-        elif isinstance(dados, dict) and 'corrida' in dados:
-            corrida_id = dados.get('corrida')
+        # a corrida vem do join; SET_NULL garante que corrida_id só existe se a corrida existe
+        n.corrida_exists = n.corrida_id is not None
+        n.corrida_status = n.corrida.status if n.corrida_exists else None
 
-        n.corrida_id = corrida_id
-        n.corrida_exists = False
-        n.corrida_status = None
-
-        if corrida_id:
-            try:
-                corrida = Corrida.objects.get(id=int(corrida_id))
-                n.corrida_exists = True
-                n.corrida_status = getattr(corrida, 'status', None)
-            except (Corrida.DoesNotExist, ValueError, TypeError):
-                n.corrida_exists = False
-                n.corrida_status = None
-
-    return render(request, "notificacao/lista_notificacoes.html", {"notificacoes": notificacoes})
+    return render(request, "notificacao/lista_notificacoes.html", {
+        "notificacoes": notificacoes,
+        "proximo_cursor": proximo_cursor,
+        "primeira_pagina": cursor is None,
+    })
 
 @login_required
 @require_POST
@@ -58,13 +95,156 @@ def api_marcar_lida(request):
     except Exception:
         return HttpResponseBadRequest("id inválido")
 
-    notific = get_object_or_404(Notificacao, id=nid, usuario=request.user)
-    notific.lida = True
-    notific.save(update_fields=['lida'])
-    return JsonResponse({"ok": True})
+    if not marcar_lida(request.user.id, nid):
+        raise Http404("Notificação não encontrada")
+    return JsonResponse({"ok": True, "unread": contagem_nao_lidas(request.user.id)})
+
+def _etag_contagem(request):
+    # lê o contador uma vez só; a view reaproveita o valor
+    request._nao_lidas = contagem_nao_lidas(request.user.id)
+    return f"{request.user.id}-{request._nao_lidas}"
 
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_contagem)
 def api_contagem_nao_lidas(request):
-    count = Notificacao.objects.filter(usuario=request.user, lida=False).count()
-    return JsonResponse({"unread": count})
+    return JsonResponse({"unread": request._nao_lidas})
+
+
+
+# ---------------------------------------------------------------------------
+# Stream SSE (servido pelo carona/asgi.py)
+# ---------------------------------------------------------------------------
+
+# intervalo do polling de fallback (eventos de outros processos) e do heartbeat
+SSE_POLL_S = getattr(settings, "NOTIFICACAO_SSE_POLL_S", 15)
+# a conexão é encerrada depois disso; o EventSource reconecta com Last-Event-ID
+SSE_DURACAO_MAX_S = getattr(settings, "NOTIFICACAO_SSE_DURACAO_MAX_S", 600)
+
+
+class _EstadoStream:
+    """O que o cliente já viu; descarta duplicatas entre pub/sub e polling."""
+
+    def __init__(self, usuario_id, ultima_notificacao):
+        self.usuario_id = usuario_id
+        self.ultima_notificacao = ultima_notificacao
+        self.desde = None
+        self.solicitacoes = {}
+        self.pagamentos = {}
+
+    def novo(self, tipo, dados):
+        if tipo == "notificacao":
+            if dados["id"] <= self.ultima_notificacao:
+                return False
+            self.ultima_notificacao = dados["id"]
+            return True
+        vistos = self.solicitacoes if tipo == "solicitacao" else self.pagamentos
+        if vistos.get(dados["id"]) == dados["status"]:
+            return False
+        vistos[dados["id"]] = dados["status"]
+        return True
+
+
+def _solicitacoes_acompanhadas(usuario_id):
+    return (
+        SolicitacaoCarona.objects
+        .filter(passageiro_id=usuario_id, corrida__status__in=[Corrida.STATUS_ATIVA, Corrida.STATUS_EM_ANDAMENTO])
+        .values("id", "corrida_id", "status")[:200]
+    )
+
+
+def _pagamentos_alterados(usuario_id, desde):
+    # mesmos destinatários de pagamentos.signals.interessados: dono e motorista;
+    # passageiros aceitos só no Payment antigo, sem user, compartilhado pela corrida
+    return (
+        Payment.objects
+        .filter(
+            Q(user_id=usuario_id)
+            | Q(corrida__motorista_id=usuario_id)
+            | Q(user__isnull=True, corrida__solicitacoes__passageiro_id=usuario_id,
+                corrida__solicitacoes__status=SolicitacaoCarona.STATUS_ACEITA),
+            updated_at__gte=desde,
+        )
+        .values("id", "corrida_id", "status")
+        .distinct()[:100]
+    )
+
+
+def _iniciar_estado(usuario_id, ultimo_evento):
+    if ultimo_evento is None:
+        ultimo_evento = (
+            Notificacao.objects.filter(usuario_id=usuario_id)
+            .order_by("-id").values_list("id", flat=True).first()
+        ) or 0
+    estado = _EstadoStream(usuario_id, ultimo_evento)
+    estado.desde = timezone.now()
+    for s in _solicitacoes_acompanhadas(usuario_id):
+        estado.solicitacoes[s["id"]] = s["status"]
+    return estado
+
+
+def _consultar_banco(estado):
+    """Polling de fallback: o que mudou no banco desde a última consulta."""
+    agora = timezone.now()
+    achados = [
+        ("notificacao", dados_evento(n))
+        for n in Notificacao.objects
+        .filter(usuario_id=estado.usuario_id, id__gt=estado.ultima_notificacao)
+        .order_by("id")[:50]
+    ]
+    achados += [("solicitacao", s) for s in _solicitacoes_acompanhadas(estado.usuario_id)]
+    achados += [("pagamento", p) for p in _pagamentos_alterados(estado.usuario_id, estado.desde)]
+    # margem para commits que terminaram durante a consulta
+    estado.desde = agora - timedelta(seconds=1)
+    return achados
+
+
+def _formatar(tipo, dados, ultima_notificacao):
+    return f"id: {ultima_notificacao}\nevent: {tipo}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+
+async def _stream(usuario_id, ultimo_evento):
+    assinatura = eventos.assinar(usuario_id)
+    try:
+        estado = await sync_to_async(_iniciar_estado)(usuario_id, ultimo_evento)
+        yield "retry: 5000\n\n"
+        inicio = time.monotonic()
+        proximo_poll = inicio + SSE_POLL_S
+        while time.monotonic() - inicio < SSE_DURACAO_MAX_S:
+            espera = max(0.0, proximo_poll - time.monotonic())
+            try:
+                achados = [await asyncio.wait_for(assinatura.fila.get(), timeout=espera)]
+            except asyncio.TimeoutError:
+                achados = await sync_to_async(_consultar_banco)(estado)
+                proximo_poll = time.monotonic() + SSE_POLL_S
+                yield ": ping\n\n"
+            for tipo, dados in achados:
+                if estado.novo(tipo, dados):
+                    yield _formatar(tipo, dados, estado.ultima_notificacao)
+    finally:
+        eventos.cancelar(assinatura)
+
+
+@require_GET
+async def stream_eventos(request):
+    """
+    Stream SSE do usuário: eventos `notificacao`, `solicitacao` e `pagamento`.
+    Só funciona sob ASGI; sob WSGI responde 204 (o EventSource desiste e o
+    front-end volta ao polling).
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=403)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    try:
+        ultimo_evento = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        ultimo_evento = None
+
+    response = StreamingHttpResponse(_stream(user.id, ultimo_evento), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,6 +1,16 @@
 # pagamentos/admin.py
 from django.contrib import admin
-from .models import Payment
+from django.db import transaction
+from django.utils import timezone
+
+from fila.services import enfileirar
+
+from . import status_cache
+from .eventos_processados import descomprimir, hash_evento
+from .models import (
+    CobrancaOutbox, LedgerEntry, Liquidacao, Payment, PendenciaConciliacao, Repasse, WebhookEventArquivo,
+    WebhookEventProcessed, WebhookInbox,
+)
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -8,3 +18,152 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("abacate_id", "corrida__origem", "corrida__destino", "user__email")
     readonly_fields = ("payload", "created_at", "updated_at")
+
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_id", "event_type", "cobranca", "status", "tentativas", "proxima_tentativa_em", "recebido_em")
+    list_filter = ("status", "event_type")
+    search_fields = ("event_id", "cobranca")
+    readonly_fields = ("payload", "ultimo_erro", "recebido_em", "processado_em")
+    actions = ["reprocessar"]
+
+    @admin.action(description="Reenfileirar (volta para pendente)")
+    def reprocessar(self, request, queryset):
+        # o processamento é feito por jobs da fila: cada evento reaberto ganha o seu
+        with transaction.atomic():
+            ids = list(queryset.exclude(status=WebhookInbox.STATUS_PROCESSADO).values_list("id", flat=True))
+            WebhookInbox.objects.filter(id__in=ids).update(
+                status=WebhookInbox.STATUS_PENDENTE, tentativas=0, proxima_tentativa_em=timezone.now()
+            )
+            for evento_id in ids:
+                enfileirar("pagamentos.processar_webhook", {"evento_id": evento_id}, prioridade=20)
+        self.message_user(request, f"{len(ids)} evento(s) reenfileirado(s).")
+
+
+class _BuscaPorEventId:
+    """A busca do admin recebe o event_id e procura pelo hash dele."""
+    search_fields = ("event_hash",)
+    search_help_text = "event_id do AbacatePay"
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(event_hash=hash_evento(search_term.strip())), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEventProcessed)
+class WebhookEventProcessedAdmin(_BuscaPorEventId, admin.ModelAdmin):
+    list_display = ("id", "event_hash", "event_type", "processed_at")
+    list_filter = ("event_type",)
+    date_hierarchy = "processed_at"
+
+
+@admin.register(WebhookEventArquivo)
+class WebhookEventArquivoAdmin(_BuscaPorEventId, admin.ModelAdmin):
+    list_display = ("id", "event_hash", "processed_at")
+    date_hierarchy = "processed_at"
+    exclude = ("payload_zlib",)
+    readonly_fields = ("event_hash", "processed_at", "payload")
+
+    @admin.display(description="payload")
+    def payload(self, obj):
+        return descomprimir(obj.payload_zlib)
+
+
+@admin.register(CobrancaOutbox)
+class CobrancaOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "payment", "status", "tentativas", "proxima_tentativa_em", "criado_em", "processado_em")
+    list_filter = ("status",)
+    raw_id_fields = ("payment",)
+    readonly_fields = ("ultimo_erro", "criado_em", "processado_em")
+    actions = ["reprocessar"]
+
+    @admin.action(description="Reenfileirar (volta para pendente)")
+    def reprocessar(self, request, queryset):
+        with transaction.atomic():
+            ids = list(queryset.exclude(status=CobrancaOutbox.STATUS_FEITO).values_list("id", flat=True))
+            CobrancaOutbox.objects.filter(id__in=ids).update(
+                status=CobrancaOutbox.STATUS_PENDENTE, tentativas=0, proxima_tentativa_em=timezone.now()
+            )
+            # o dead-letter deixou o Payment FAILED, e _criar só cria cobrança de PENDING
+            reabertos = list(
+                Payment.objects.filter(outbox_cobranca__id__in=ids, status=Payment.STATUS_FAILED)
+                .values_list("id", flat=True)
+            )
+            Payment.objects.filter(id__in=reabertos).update(
+                status=Payment.STATUS_PENDING, abacate_id=None, brCode=None, qr_hash=None, updated_at=timezone.now()
+            )
+            status_cache.sinalizar(reabertos)
+            if ids:
+                enfileirar("pagamentos.criar_cobrancas", {"entrada_ids": ids}, prioridade=10)
+        self.message_user(request, f"{len(ids)} cobrança(s) reenfileirada(s).")
+
+
+@admin.register(PendenciaConciliacao)
+class PendenciaConciliacaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_id", "external_id", "abacate_id", "amount_cents", "motivo", "payment", "criada_em", "resolvida_em")
+    list_filter = ("resolvida_em",)
+    search_fields = ("event_id", "external_id", "abacate_id")
+    raw_id_fields = ("payment",)
+    readonly_fields = ("payload", "criada_em")
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ("id", "carteira", "tipo", "valor", "payment", "descricao", "criado_em")
+    list_filter = ("tipo", "criado_em")
+    search_fields = ("carteira__user__email", "descricao")
+    raw_id_fields = ("carteira", "payment")
+
+    # append-only: correções entram como novo lançamento AJUSTE via ledger.registrar_lancamentos
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Liquidacao)
+class LiquidacaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "motorista", "periodo_inicio", "quantidade", "valor_bruto", "retencao", "valor_liquido", "lancamento")
+    list_filter = ("periodo_inicio",)
+    search_fields = ("motorista__email",)
+    raw_id_fields = ("motorista", "lancamento")
+    date_hierarchy = "periodo_inicio"
+
+    # gerada só por pagamentos.liquidacao.liquidar_periodo (comando liquidar_periodo)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Repasse)
+class RepasseAdmin(admin.ModelAdmin):
+    list_display = ("id", "payment", "motorista", "corrida", "valor_bruto", "retencao", "valor_liquido", "criado_em", "liquidacao")
+    list_filter = ("criado_em",)
+    search_fields = ("motorista__email",)
+    raw_id_fields = ("payment", "motorista", "corrida", "liquidacao")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
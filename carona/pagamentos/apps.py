@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PagamentosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pagamentos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,199 @@
+# pagamentos/carga.py
+"""
+Teste de carga do caminho do webhook (comando carga_webhook).
+
+`gerar_eventos` monta eventos no formato da AbacatePay, já assinados como a view
+espera (webhook.assinatura_webhook): pagamentos de cobranças existentes,
+saques, reentregas do mesmo evento e cobranças desconhecidas. `disparar` os
+envia a um servidor local com N conexões simultâneas e no máximo `taxa_por_s`
+requisições por segundo, medindo latência e erros. `resumo_inbox` mostra como o
+worker da fila está dando conta do que entrou.
+
+Só para ambiente local: `preparar_pagamentos` cria Payments de teste no banco.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from .conciliacao import LimitadorTaxa
+from .models import Payment, WebhookInbox
+from .services import nova_sessao
+from .webhook import assinatura_webhook
+
+TIPO_PAGO = "pago"
+TIPO_SAQUE = "saque"
+TIPO_DUPLICADO = "duplicado"
+TIPO_DESCONHECIDO = "desconhecido"
+MIX_PADRAO = {TIPO_PAGO: 70, TIPO_SAQUE: 10, TIPO_DUPLICADO: 10, TIPO_DESCONHECIDO: 10}
+
+USUARIO_CARGA = "carga-webhook@localhost"
+# marcas de erro de lock no corpo da resposta (página de debug) ou em ultimo_erro
+MARCAS_LOCK = ("database is locked", "database table is locked", "deadlock", "could not obtain lock")
+
+
+class Cobranca(NamedTuple):
+    abacate_id: str
+    external_id: str
+    amount_cents: int
+
+
+class Evento(NamedTuple):
+    tipo: str
+    event_id: str
+    corpo: bytes
+
+
+def evento_pago(event_id: str, cobranca: Cobranca) -> dict:
+    return {
+        "id": event_id,
+        "event": "billing.paid",
+        "data": {"billing": {
+            "id": cobranca.abacate_id,
+            "externalId": cobranca.external_id,
+            "amount": cobranca.amount_cents,
+            "status": "PAID",
+        }},
+    }
+
+
+def _evento_saque(event_id: str) -> dict:
+    return {
+        "id": event_id,
+        "event": "withdraw.done",
+        "data": {"transaction": {"id": f"tran_{uuid.uuid4().hex[:16]}", "externalId": f"saque-{uuid.uuid4().hex[:8]}"}},
+    }
+
+
+def corpo_assinado(evento: dict):
+    """(corpo, assinatura) prontos para o POST."""
+    corpo = json.dumps(evento, separators=(",", ":")).encode()
+    return corpo, assinatura_webhook(corpo)
+
+
+def preparar_pagamentos(quantidade: int) -> List[Cobranca]:
+    """Cria `quantidade` depósitos em aberto (usuário de carga) para os eventos de pagamento."""
+    User = get_user_model()
+    user = User.objects.filter(email=USUARIO_CARGA).first() or User.objects.create_user(
+        USUARIO_CARGA, "Carga Webhook", password=None
+    )
+    lote = uuid.uuid4().hex[:8]
+    payments = Payment.objects.bulk_create([
+        Payment(
+            user=user,
+            amount_cents=random.randint(100, 20000),
+            status=Payment.STATUS_CREATED,
+            payment_type=Payment.PAYMENT_TYPE_DEPOSITO,
+            abacate_id=f"bill_carga_{lote}_{i}",
+            external_id=f"carteira-{user.id}-deposito-{lote}{i:x}",
+        )
+        for i in range(quantidade)
+    ])
+    return [Cobranca(p.abacate_id, p.external_id, p.amount_cents) for p in payments]
+
+
+def gerar_eventos(quantidade: int, cobrancas: List[Cobranca], mix: Optional[dict] = None,
+                  prefixo: Optional[str] = None) -> List[Evento]:
+    """
+    Sorteia `quantidade` eventos segundo `mix` ({tipo: peso}). Pagamentos usam
+    cada cobrança uma vez (sem cobranças sobrando, viram desconhecidos);
+    duplicados reenviam um evento já gerado, com o mesmo id.
+    """
+    mix = mix or MIX_PADRAO
+    prefixo = prefixo or f"carga-{uuid.uuid4().hex[:8]}"
+    tipos, pesos = zip(*[(t, p) for t, p in mix.items() if p > 0])
+    livres = list(cobrancas)
+    random.shuffle(livres)
+    eventos: List[Evento] = []
+    for i in range(quantidade):
+        tipo = random.choices(tipos, pesos)[0]
+        if tipo == TIPO_DUPLICADO and eventos:
+            original = random.choice(eventos)
+            eventos.append(Evento(TIPO_DUPLICADO, original.event_id, original.corpo))
+            continue
+        event_id = f"{prefixo}-{i}"
+        if tipo == TIPO_SAQUE:
+            corpo, _ = corpo_assinado(_evento_saque(event_id))
+        elif tipo == TIPO_PAGO and livres:
+            corpo, _ = corpo_assinado(evento_pago(event_id, livres.pop()))
+        else:
+            tipo = TIPO_DESCONHECIDO
+            desconhecida = Cobranca(f"bill_inexistente_{uuid.uuid4().hex[:12]}", f"externo-{uuid.uuid4().hex[:8]}", 1000)
+            corpo, _ = corpo_assinado(evento_pago(event_id, desconhecida))
+        eventos.append(Evento(tipo, event_id, corpo))
+    return eventos
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def disparar(url: str, eventos: List[Evento], concorrencia: int = 16, taxa_por_s: float = 0,
+             timeout: float = 10.0) -> dict:
+    """Envia os eventos e retorna as métricas (vazão, latências em ms, status HTTP, erros)."""
+    limitador = LimitadorTaxa(taxa_por_s)
+    latencias: List[float] = []
+    status = Counter()
+    erros = Counter()
+    lock = threading.Lock()
+
+    def enviar(evento: Evento):
+        limitador.aguardar()
+        inicio = time.perf_counter()
+        try:
+            resp = session.post(url, data=evento.corpo, timeout=timeout, headers={
+                "Content-Type": "application/json",
+                "X-Webhook-Signature": assinatura_webhook(evento.corpo),
+            })
+            codigo, texto = resp.status_code, resp.text
+        except Exception as exc:
+            codigo, texto = 0, f"{type(exc).__name__}: {exc}"
+        decorrido = (time.perf_counter() - inicio) * 1000
+        with lock:
+            latencias.append(decorrido)
+            status[codigo] += 1
+            if codigo == 0:
+                erros["conexao"] += 1
+            elif codigo >= 500:
+                erros["lock" if any(m in texto for m in MARCAS_LOCK) else "http_5xx"] += 1
+
+    inicio = time.monotonic()
+    with nova_sessao(concorrencia) as session, ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        list(pool.map(enviar, eventos))
+    duracao = time.monotonic() - inicio
+    return {
+        "eventos": len(eventos),
+        "por_tipo": dict(Counter(e.tipo for e in eventos)),
+        "duracao_s": round(duracao, 2),
+        "req_por_s": round(len(eventos) / duracao, 1) if duracao else 0.0,
+        "latencia_ms": {
+            "p50": round(percentil(latencias, 50), 1),
+            "p90": round(percentil(latencias, 90), 1),
+            "p99": round(percentil(latencias, 99), 1),
+            "max": round(max(latencias, default=0.0), 1),
+        },
+        "status_http": {str(k): v for k, v in sorted(status.items())},
+        "erros": dict(erros),
+    }
+
+
+def resumo_inbox(prefixo: str) -> dict:
+    """Situação, na inbox, dos eventos da execução (mesmo banco do servidor)."""
+    eventos = WebhookInbox.objects.filter(event_id__startswith=f"{prefixo}-")
+    contagem = {s: 0 for s, _ in WebhookInbox.STATUS_CHOICES}
+    contagem.update(eventos.values_list("status").annotate(n=Count("id")).order_by())
+    erros_lock = sum(
+        1 for erro in eventos.exclude(ultimo_erro="").values_list("ultimo_erro", flat=True)
+        if any(m in erro for m in MARCAS_LOCK)
+    )
+    return {"por_status": contagem, "erros_lock": erros_lock}
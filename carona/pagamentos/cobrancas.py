@@ -0,0 +1,242 @@
+# pagamentos/cobrancas.py
+"""
+Criação assíncrona de cobranças PIX (transactional outbox).
+
+Quem cria o(s) Payment(s) chama `registrar_cobrancas` na mesma transação; nada
+de HTTP ali. As entradas são processadas por um job da fila (pagamentos.tarefas)
+logo após o commit, ou pela varredura `processar_outbox` (comando
+processar_cobrancas). `processar_entradas` reserva as entradas com UPDATEs
+condicionais (curtos, sem lock durante a chamada), chama a AbacatePay em
+paralelo (até COBRANCA_WORKERS threads, uma requests.Session compartilhada) e
+grava o resultado do lote numa transação, com UPDATEs condicionais ao
+Payment ainda PENDING. As threads só fazem HTTP; o banco é acessado apenas
+pela thread que chamou.
+Falhas voltam para a fila com backoff exponencial; depois de COBRANCA_MAX_TENTATIVAS a entrada vai
+para dead-letter e o Payment fica FAILED.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from fila.services import enfileirar
+from notificacao import eventos
+
+from . import status_cache
+from .expiracao import validade
+from .idempotencia import chave_corrida_pix
+from .models import CobrancaOutbox, Payment
+from .referencias import decompor_external_id
+from .services import criar_pix_qr, nova_sessao
+from .signals import interessados
+
+logger = logging.getLogger(__name__)
+
+COBRANCA_MAX_TENTATIVAS = getattr(settings, "ABACATEPAY_COBRANCA_MAX_TENTATIVAS", 6)
+COBRANCA_WORKERS = getattr(settings, "ABACATEPAY_COBRANCA_WORKERS", 8)
+BACKOFF_BASE_S = 15
+BACKOFF_MAX_S = 900
+# posse de uma entrada reservada: se o worker morrer no meio, ela volta para a fila
+RESERVA_S = 120
+LOTE_PADRAO = 50
+
+
+def registrar_cobrancas(itens: Iterable[Tuple[Payment, str]]) -> List[CobrancaOutbox]:
+    """
+    Agenda a criação das cobranças de [(payment, descricao), ...] com um único
+    job na fila. Chamar na transação que criou os Payments.
+    """
+    entradas = CobrancaOutbox.objects.bulk_create(
+        [CobrancaOutbox(payment=payment, descricao=descricao[:255]) for payment, descricao in itens]
+    )
+    if entradas:
+        # job na mesma transação: um worker da fila cria as cobranças logo após o commit
+        enfileirar("pagamentos.criar_cobrancas", {"entrada_ids": [e.id for e in entradas]}, prioridade=10)
+    return entradas
+
+
+def registrar_cobranca(payment: Payment, descricao: str = "") -> CobrancaOutbox:
+    """Agenda a criação da cobrança do Payment. Chamar na transação que criou o Payment."""
+    return registrar_cobrancas([(payment, descricao)])[0]
+
+
+def registrar_cobrancas_da_corrida(corrida) -> List[Payment]:
+    """
+    Cria um Payment por passageiro aceito da corrida (quem ainda não tem um) e
+    agenda as cobranças em lote. Chamado por Corrida.iniciar, dentro da transação.
+    """
+    from corrida.models import SolicitacaoCarona
+
+    valor = corrida.valor or (corrida.parent_template.valor if corrida.parent_template else 0)
+    amount_cents = int(round(float(valor or 0) * 100))
+    if not amount_cents:
+        return []
+    ja_cobrados = Payment.objects.filter(
+        corrida=corrida, payment_type=Payment.PAYMENT_TYPE_CORRIDA, user__isnull=False
+    ).values_list("user_id", flat=True)
+    passageiros = list(
+        SolicitacaoCarona.objects
+        .filter(corrida=corrida, status=SolicitacaoCarona.STATUS_ACEITA)
+        .exclude(passageiro_id__in=ja_cobrados)
+        .order_by("id")
+        .values_list("passageiro_id", flat=True)
+    )
+    if not passageiros:
+        return []
+
+    with transaction.atomic():
+        payments = Payment.objects.bulk_create([
+            Payment(corrida=corrida, user_id=passageiro_id, amount_cents=amount_cents, status=Payment.STATUS_PENDING,
+                    idempotency_key=chave_corrida_pix(passageiro_id, corrida.id))
+            for passageiro_id in passageiros
+        ])
+        # external_id leva o id do Payment: só dá para montar depois do INSERT
+        for p in payments:
+            p.external_id = f"corrida-{corrida.id}-payment-{p.id}"
+            p.ref_tipo, p.ref_objeto_id, p.ref_payment_id = decompor_external_id(p.external_id)
+        Payment.objects.bulk_update(payments, ["external_id", "ref_tipo", "ref_objeto_id", "ref_payment_id"])
+        registrar_cobrancas([(p, f"Pagamento corrida #{corrida.id}") for p in payments])
+    return payments
+
+
+def _backoff(tentativas: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_S * 2 ** (tentativas - 1), BACKOFF_MAX_S))
+
+
+def _reservar(entrada_ids) -> List[CobrancaOutbox]:
+    agora = timezone.now()
+    with transaction.atomic():
+        reservadas = [
+            entrada_id for entrada_id in entrada_ids
+            if CobrancaOutbox.objects.filter(
+                id=entrada_id, status=CobrancaOutbox.STATUS_PENDENTE, proxima_tentativa_em__lte=agora
+            ).update(tentativas=F("tentativas") + 1, proxima_tentativa_em=agora + timedelta(seconds=RESERVA_S))
+        ]
+    if not reservadas:
+        return []
+    return list(CobrancaOutbox.objects.select_related("payment").filter(id__in=reservadas).order_by("id"))
+
+
+def _external_id(p: Payment) -> str:
+    return p.external_id or f"corrida-{p.corrida_id}-payment-{p.id}"
+
+
+def _criar(entrada: CobrancaOutbox, session) -> Optional[dict]:
+    """Roda numa thread do pool: só HTTP. None = não há cobrança a criar."""
+    p = entrada.payment
+    if p.abacate_id or p.status != Payment.STATUS_PENDING:
+        # cobrança já criada por outro caminho (ou pagamento encerrado): nada a fazer
+        return None
+    try:
+        return criar_pix_qr(p.amount_cents, entrada.descricao or f"Pagamento #{p.id}", _external_id(p),
+                            session=session)
+    except Exception as exc:  # a thread nunca derruba o lote
+        logger.exception("Erro criando cobrança do payment %s", p.id)
+        return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def _aplicar(entradas: List[CobrancaOutbox], resultados: List[Optional[dict]]) -> None:
+    """Grava o resultado do lote numa transação (banco só na thread chamadora)."""
+    agora = timezone.now()
+    criados, falhos = [], []
+    for entrada, result in zip(entradas, resultados):
+        p = entrada.payment
+        if result is None or result.get("ok"):
+            if result is not None:
+                data = result.get("data") or {}
+                p.brCode = data.get("brCode")
+                p.brCodeBase64 = data.get("brCodeBase64")
+                p.abacate_id = data.get("id")
+                p.billing_url = result.get("billing_url") or p.billing_url
+                p.expires_at = validade(data, agora)
+                p.external_id = _external_id(p)
+                p.ref_tipo, p.ref_objeto_id, p.ref_payment_id = decompor_external_id(p.external_id)
+                p.status = Payment.STATUS_CREATED
+                p.updated_at = agora
+                criados.append(p)
+            entrada.status = CobrancaOutbox.STATUS_FEITO
+            entrada.processado_em = agora
+            entrada.ultimo_erro = ""
+        else:
+            entrada.ultimo_erro = str(result.get("error") or "erro desconhecido")[:2000]
+            if entrada.tentativas >= COBRANCA_MAX_TENTATIVAS:
+                entrada.status = CobrancaOutbox.STATUS_MORTO
+                p.status = Payment.STATUS_FAILED
+                p.updated_at = agora
+                falhos.append(p)
+                logger.error("Cobrança do payment %s movida para dead-letter após %s tentativas", p.id, entrada.tentativas)
+            else:
+                entrada.proxima_tentativa_em = agora + _backoff(entrada.tentativas)
+
+    campos_criados = (
+        "brCode", "qr_hash", "abacate_id", "billing_url", "external_id",
+        "ref_tipo", "ref_objeto_id", "ref_payment_id", "status", "expires_at", "updated_at",
+    )
+    with transaction.atomic():
+        # UPDATE condicional: o Payment pode ter saído de PENDING durante o HTTP
+        # (pago pela carteira, expirado); esse status não é sobrescrito
+        alterados = []
+        resultados = [(p, campos_criados) for p in criados] + [(p, ("status", "updated_at")) for p in falhos]
+        for p, campos in resultados:
+            if Payment.objects.filter(id=p.id, status=Payment.STATUS_PENDING).update(
+                **{campo: getattr(p, campo) for campo in campos}
+            ):
+                alterados.append(p)
+            else:
+                logger.info("Payment %s saiu de PENDING durante a criação da cobrança; resultado descartado", p.id)
+        CobrancaOutbox.objects.bulk_update(
+            entradas, ["status", "proxima_tentativa_em", "processado_em", "ultimo_erro"]
+        )
+        # update() não dispara post_save: avisa long-poll e SSE aqui
+        status_cache.sinalizar([p.id for p in alterados])
+        if alterados and eventos.ha_assinantes():
+            for p in alterados:
+                eventos.publicar(interessados(p), "pagamento",
+                                 {"id": p.id, "corrida_id": p.corrida_id, "status": p.status})
+
+
+def processar_entradas(entrada_ids, workers: int = COBRANCA_WORKERS) -> dict:
+    """
+    Cria as cobranças das entradas (as que ainda estão pendentes e vencidas).
+    Retorna {entrada_id: status final} só das entradas que este worker pegou.
+    """
+    entradas = _reservar(entrada_ids)
+    if not entradas:
+        return {}
+    workers = max(1, min(workers, len(entradas)))
+    with nova_sessao(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        resultados = list(pool.map(lambda entrada: _criar(entrada, session), entradas))
+    _aplicar(entradas, resultados)
+    return {entrada.id: entrada.status for entrada in entradas}
+
+
+def processar_entrada(entrada_id: int) -> str:
+    """Cria a cobrança de uma entrada. Retorna o status final dela (ou "" se outro worker a pegou)."""
+    return processar_entradas([entrada_id]).get(entrada_id, "")
+
+
+def processar_outbox(lote: int = LOTE_PADRAO, workers: int = COBRANCA_WORKERS) -> dict:
+    """
+    Cria as cobranças pendentes (até `lote`) cuja próxima tentativa já venceu, em
+    ordem de criação. Retorna contagens por status final.
+    """
+    ids = list(
+        CobrancaOutbox.objects
+        .filter(status=CobrancaOutbox.STATUS_PENDENTE, proxima_tentativa_em__lte=timezone.now())
+        .order_by("id")
+        .values_list("id", flat=True)[:lote]
+    )
+    resultado = {"criadas": 0, "falhas": 0, "mortas": 0}
+    for status in processar_entradas(ids, workers).values():
+        if status == CobrancaOutbox.STATUS_FEITO:
+            resultado["criadas"] += 1
+        elif status == CobrancaOutbox.STATUS_MORTO:
+            resultado["mortas"] += 1
+        elif status == CobrancaOutbox.STATUS_PENDENTE:
+            resultado["falhas"] += 1
+    return resultado
@@ -0,0 +1,197 @@
+# pagamentos/conciliacao.py
+"""
+Conciliação de pagamentos parados em PENDING/CREATED (webhook perdido).
+
+`conciliar` seleciona, pelo índice de status, os pagamentos em aberto há mais de
+IDADE_MIN minutos, consulta a AbacatePay em paralelo (ThreadPoolExecutor com uma
+requests.Session compartilhada e no máximo TAXA_POR_S consultas por segundo) e
+aplica o resultado de cada lote numa transação: os pagos passam por
+webhook.aplicar_pagamento; expirados/cancelados vão num único bulk_update.
+
+As threads só fazem HTTP; o banco é acessado apenas pela thread principal. Todo
+pagamento consultado recebe `conciliado_em` no commit do seu lote, então uma
+execução interrompida recomeça de onde parou (os já consultados só voltam à
+fila depois de RECONSULTA_MIN minutos).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notificacao import eventos
+
+from . import status_cache
+from .models import Payment
+from .services import nova_sessao, obter_charge
+from .signals import interessados
+from .webhook import aplicar_pagamento
+
+logger = logging.getLogger(__name__)
+
+IDADE_MIN = getattr(settings, "ABACATEPAY_CONCILIACAO_IDADE_MIN", 15)
+RECONSULTA_MIN = getattr(settings, "ABACATEPAY_CONCILIACAO_RECONSULTA_MIN", 60)
+WORKERS = getattr(settings, "ABACATEPAY_CONCILIACAO_WORKERS", 8)
+TAXA_POR_S = getattr(settings, "ABACATEPAY_CONCILIACAO_TAXA_POR_S", 10)
+LOTE_PADRAO = 200
+
+# status da cobrança na AbacatePay -> status local; o resto (PENDING...) não muda nada
+STATUS_REMOTO = {
+    "PAID": Payment.STATUS_PAID,
+    "EXPIRED": Payment.STATUS_EXPIRED,
+    "CANCELLED": Payment.STATUS_FAILED,
+    "REFUNDED": Payment.STATUS_FAILED,
+    "FAILED": Payment.STATUS_FAILED,
+}
+
+
+class LimitadorTaxa:
+    """Espaça as chamadas em no máximo `por_segundo` por segundo (compartilhado entre threads)."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> None:
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+def pagamentos_pendentes(agora: Optional[datetime] = None, idade_min: int = IDADE_MIN,
+                         reconsulta_min: int = RECONSULTA_MIN):
+    """Pagamentos em aberto, com cobrança na AbacatePay, ainda não consultados recentemente."""
+    agora = agora or timezone.now()
+    return (
+        Payment.objects
+        .filter(
+            status__in=[Payment.STATUS_PENDING, Payment.STATUS_CREATED],
+            created_at__lt=agora - timedelta(minutes=idade_min),
+            abacate_id__isnull=False,
+        )
+        .exclude(abacate_id="")
+        .filter(Q(conciliado_em__isnull=True) | Q(conciliado_em__lt=agora - timedelta(minutes=reconsulta_min)))
+    )
+
+
+def _consultar(abacate_id, session, limitador, base_url):
+    limitador.aguardar()
+    try:
+        return obter_charge(abacate_id, session=session, base_url=base_url)
+    except Exception as exc:  # a thread nunca derruba o lote
+        return {"ok": False, "data": None, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def _valor_reais(data: dict, payment: Payment) -> Decimal:
+    try:
+        centavos = int(data.get("amount") or payment.amount_cents)
+    except (TypeError, ValueError):
+        centavos = payment.amount_cents
+    try:
+        return (Decimal(centavos) / Decimal(100)).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return Decimal("0.00")
+
+
+def _aplicar_lote(ids, respostas, metricas) -> None:
+    """Aplica as respostas de um lote numa transação (banco só na thread principal)."""
+    agora = timezone.now()
+    with transaction.atomic():
+        payments = {
+            p.id: p for p in
+            Payment.objects.select_for_update().select_related("user", "corrida").filter(id__in=ids)
+        }
+        alterados = []
+        for payment_id, resposta in zip(ids, respostas):
+            p = payments.get(payment_id)
+            if p is None:
+                continue
+            p.conciliado_em = agora
+            if not resposta.get("ok"):
+                metricas["erros"] += 1
+                logger.warning("Conciliação: falha consultando payment %s (%s): %s",
+                               p.id, p.abacate_id, resposta.get("error"))
+                continue
+            data = resposta.get("data") or {}
+            novo = STATUS_REMOTO.get(str(data.get("status") or "").upper())
+            if novo is None or p.status not in (Payment.STATUS_PENDING, Payment.STATUS_CREATED):
+                # ainda em aberto lá, ou o webhook chegou durante a consulta
+                metricas["inalterados"] += 1
+                continue
+
+            p.payload = resposta.get("body") or data
+            if novo == Payment.STATUS_PAID:
+                aplicar_pagamento(p, _valor_reais(data, p), p.payload)
+                p.status = Payment.STATUS_PAID
+                p.paid_at = p.paid_at or agora
+                # save individual: dispara o post_save que publica o status no SSE
+                p.save(update_fields=["status", "paid_at", "payload", "conciliado_em", "updated_at"])
+                metricas["pagos"] += 1
+                continue
+            p.status = novo
+            p.updated_at = agora
+            alterados.append(p)
+            metricas["expirados" if novo == Payment.STATUS_EXPIRED else "falhos"] += 1
+
+        Payment.objects.bulk_update(alterados, ["status", "payload", "updated_at"])
+        # bulk_update não dispara post_save: avisa o long-poll aqui
+        status_cache.sinalizar([p.id for p in alterados])
+        Payment.objects.filter(id__in=list(payments)).update(conciliado_em=agora)
+
+        if alterados and eventos.ha_assinantes():
+            for p in alterados:
+                eventos.publicar(interessados(p), "pagamento",
+                                 {"id": p.id, "corrida_id": p.corrida_id, "status": p.status})
+
+
+def conciliar(lote: int = LOTE_PADRAO, workers: int = WORKERS, taxa_por_s: float = TAXA_POR_S,
+              limite: Optional[int] = None, idade_min: int = IDADE_MIN, reconsulta_min: int = RECONSULTA_MIN,
+              base_url: Optional[str] = None) -> dict:
+    """
+    Concilia os pagamentos pendentes em lotes de `lote`, até `limite` pagamentos
+    (None = todos). Retorna as métricas da execução.
+    """
+    metricas = {"consultados": 0, "pagos": 0, "expirados": 0, "falhos": 0,
+                "inalterados": 0, "erros": 0, "duracao_s": 0.0}
+    inicio = time.monotonic()
+    agora = timezone.now()
+    limitador = LimitadorTaxa(taxa_por_s)
+    ultimo_id = 0
+
+    with nova_sessao(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        while limite is None or metricas["consultados"] < limite:
+            tamanho = lote if limite is None else min(lote, limite - metricas["consultados"])
+            pendentes = list(
+                pagamentos_pendentes(agora, idade_min, reconsulta_min)
+                .filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", "abacate_id")[:tamanho]
+            )
+            if not pendentes:
+                break
+            ids = [pid for pid, _ in pendentes]
+            respostas = list(pool.map(
+                lambda abacate_id: _consultar(abacate_id, session, limitador, base_url),
+                [abacate_id for _, abacate_id in pendentes],
+            ))
+            _aplicar_lote(ids, respostas, metricas)
+            metricas["consultados"] += len(ids)
+            ultimo_id = ids[-1]
+
+    metricas["duracao_s"] = round(time.monotonic() - inicio, 2)
+    if metricas["consultados"]:
+        logger.info("Conciliação: %s", metricas)
+    return metricas
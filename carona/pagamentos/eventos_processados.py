@@ -0,0 +1,188 @@
+# pagamentos/eventos_processados.py
+"""
+Idempotência e retenção dos webhooks processados (WebhookEventProcessed).
+
+A tabela quente guarda só o necessário para a deduplicação: hash do event_id,
+tipo e data. O payload fica nela durante PAYLOAD_QUENTE_DIAS (consulta de
+suporte); depois `arquivar` o move comprimido para WebhookEventArquivo.
+`purgar` apaga, em lotes curtos (uma transação por lote, sem segurar o lock de
+escrita do SQLite), registros de dedupe mais velhos que DEDUPE_DIAS, arquivos
+mais velhos que ARQUIVO_DIAS e a WebhookInbox já processada mais velha que
+INBOX_DIAS (ela repete o payload). MORTO na inbox nunca é apagado.
+
+`ja_processado` consulta, antes do banco, um LRU do processo e o cache do
+Django; só respostas positivas são guardadas, e só depois do commit de
+`registrar_processado` — evento desfeito nunca fica marcado como visto.
+"""
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookEventArquivo, WebhookEventProcessed, WebhookInbox
+
+PAYLOAD_QUENTE_DIAS = getattr(settings, "WEBHOOK_PAYLOAD_QUENTE_DIAS", 7)
+DEDUPE_DIAS = getattr(settings, "WEBHOOK_DEDUPE_DIAS", 90)
+ARQUIVO_DIAS = getattr(settings, "WEBHOOK_ARQUIVO_DIAS", 365)
+INBOX_DIAS = getattr(settings, "WEBHOOK_INBOX_DIAS", 7)
+LOTE_PADRAO = 500
+TAMANHO_LRU = getattr(settings, "WEBHOOK_DEDUPE_LRU", 10000)
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def hash_evento(event_id) -> str:
+    return hashlib.sha256(str(event_id).encode("utf-8")).hexdigest()[:32]
+
+
+class _LRU:
+    """Conjunto limitado de hashes vistos recentemente neste processo."""
+
+    def __init__(self, tamanho: int):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, chave: str) -> bool:
+        with self._lock:
+            if chave not in self._itens:
+                return False
+            self._itens.move_to_end(chave)
+            return True
+
+    def adicionar(self, chave: str) -> None:
+        with self._lock:
+            self._itens[chave] = None
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+
+_recentes = _LRU(TAMANHO_LRU)
+
+
+def _chave_cache(event_hash: str) -> str:
+    return f"webhook:proc:{event_hash}"
+
+
+def _lembrar(event_hash: str) -> None:
+    _recentes.adicionar(event_hash)
+    cache.set(_chave_cache(event_hash), 1, CACHE_TIMEOUT)
+
+
+def ja_processado(event_id) -> bool:
+    event_hash = hash_evento(event_id)
+    if event_hash in _recentes:
+        return True
+    if cache.get(_chave_cache(event_hash)):
+        _recentes.adicionar(event_hash)
+        return True
+    if WebhookEventProcessed.objects.filter(event_hash=event_hash).exists():
+        _lembrar(event_hash)
+        return True
+    return False
+
+
+def registrar_processado(event_id, event_type: str, payload) -> WebhookEventProcessed:
+    """Grava o registro de dedupe (na transação corrente); LRU e cache só depois do commit."""
+    event_hash = hash_evento(event_id)
+    registro = WebhookEventProcessed.objects.create(
+        event_hash=event_hash, event_type=(event_type or "")[:100], payload=payload
+    )
+    transaction.on_commit(lambda: _lembrar(event_hash), robust=True)
+    return registro
+
+
+def comprimir(payload) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def descomprimir(comprimido) -> Optional[dict]:
+    return json.loads(zlib.decompress(bytes(comprimido)))
+
+
+def payload_do_evento(event_id) -> Optional[dict]:
+    """Payload de um evento processado, da tabela quente ou do arquivo."""
+    event_hash = hash_evento(event_id)
+    payload = WebhookEventProcessed.objects.filter(event_hash=event_hash).values_list("payload", flat=True).first()
+    if payload is not None:
+        return payload
+    comprimido = WebhookEventArquivo.objects.filter(event_hash=event_hash).values_list("payload_zlib", flat=True).first()
+    return descomprimir(comprimido) if comprimido is not None else None
+
+
+def arquivar(dias: int = PAYLOAD_QUENTE_DIAS, lote: int = LOTE_PADRAO) -> int:
+    """Move para o arquivo, comprimidos, os payloads processados há mais de `dias`. Retorna quantos."""
+    limite = timezone.now() - timedelta(days=dias)
+    total = 0
+    while True:
+        with transaction.atomic():
+            registros = list(
+                WebhookEventProcessed.objects
+                .filter(processed_at__lt=limite, payload__isnull=False)
+                .order_by("id")
+                .values_list("id", "event_hash", "processed_at", "payload")[:lote]
+            )
+            if not registros:
+                break
+            WebhookEventArquivo.objects.bulk_create(
+                [WebhookEventArquivo(event_hash=h, processed_at=em, payload_zlib=comprimir(p))
+                 for _, h, em, p in registros],
+                ignore_conflicts=True,
+            )
+            WebhookEventProcessed.objects.filter(id__in=[r[0] for r in registros]).update(payload=None)
+        total += len(registros)
+    return total
+
+
+def _apagar_em_lotes(qs, lote: int) -> int:
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(qs.order_by("id").values_list("id", flat=True)[:lote])
+            if not ids:
+                return total
+            total += qs.model.objects.filter(id__in=ids).delete()[0]
+
+
+def purgar(dedupe_dias: int = DEDUPE_DIAS, arquivo_dias: int = ARQUIVO_DIAS, inbox_dias: int = INBOX_DIAS,
+           lote: int = LOTE_PADRAO) -> dict:
+    """Apaga o que passou da retenção, em lotes. Retorna quantos de cada tabela."""
+    agora = timezone.now()
+    return {
+        "dedupe": _apagar_em_lotes(
+            WebhookEventProcessed.objects.filter(processed_at__lt=agora - timedelta(days=dedupe_dias)), lote
+        ),
+        "arquivo": _apagar_em_lotes(
+            WebhookEventArquivo.objects.filter(processed_at__lt=agora - timedelta(days=arquivo_dias)), lote
+        ),
+        "inbox": _apagar_em_lotes(
+            WebhookInbox.objects.filter(
+                status=WebhookInbox.STATUS_PROCESSADO, processado_em__lt=agora - timedelta(days=inbox_dias)
+            ),
+            lote,
+        ),
+    }
+
+
+def previa(dias_payload: int = PAYLOAD_QUENTE_DIAS, dedupe_dias: int = DEDUPE_DIAS,
+           arquivo_dias: int = ARQUIVO_DIAS, inbox_dias: int = INBOX_DIAS) -> dict:
+    """Quantos registros `arquivar` e `purgar` pegariam agora (não grava nada)."""
+    agora = timezone.now()
+    return {
+        "arquivar": WebhookEventProcessed.objects.filter(
+            processed_at__lt=agora - timedelta(days=dias_payload), payload__isnull=False
+        ).count(),
+        "dedupe": WebhookEventProcessed.objects.filter(processed_at__lt=agora - timedelta(days=dedupe_dias)).count(),
+        "arquivo": WebhookEventArquivo.objects.filter(processed_at__lt=agora - timedelta(days=arquivo_dias)).count(),
+        "inbox": WebhookInbox.objects.filter(
+            status=WebhookInbox.STATUS_PROCESSADO, processado_em__lt=agora - timedelta(days=inbox_dias)
+        ).count(),
+    }
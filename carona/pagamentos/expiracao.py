@@ -0,0 +1,101 @@
+# pagamentos/expiracao.py
+"""
+Expiração das cobranças em aberto, guiada por Payment.expires_at.
+
+Toda criação de cobrança grava expires_at (`validade`: o expiresAt devolvido
+pela AbacatePay ou, sem ele, agora + QR_VALIDADE_PADRAO_S). `expirar_vencidos`
+— comando expirar_pagamentos — passa para EXPIRED, em lotes, o que venceu há
+mais de TOLERANCIA_S, pelo índice (status, expires_at); sem expires_at, vale
+created_at + QR_VALIDADE_PADRAO_S, como em `vencido`. A tolerância deixa a
+conciliação consultar antes a cobrança que foi paga no limite e cujo webhook
+atrasou; webhook de pagamento que chega depois ainda credita normalmente.
+
+`vencido` / `status_efetivo` são a regra das telas e endpoints de status
+(acompanhamento, refresh do QR, long-poll): sem tolerância, porque o QR vencido
+já não pode ser pago, e sem esperar a varredura gravar EXPIRED.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notificacao import eventos
+
+from . import status_cache
+from .models import Payment
+from .services import expires_at_da_cobranca
+from .signals import interessados
+
+logger = logging.getLogger(__name__)
+
+# validade presumida de um QR sem expiresAt na resposta (ou sem expires_at gravado)
+QR_VALIDADE_PADRAO_S = getattr(settings, "PAGAMENTOS_QR_VALIDADE_S", 3600)
+TOLERANCIA_S = getattr(settings, "PAGAMENTOS_EXPIRACAO_TOLERANCIA_S", 15 * 60)
+LOTE_PADRAO = 500
+STATUS_ABERTOS = (Payment.STATUS_PENDING, Payment.STATUS_CREATED)
+
+
+def validade(data: Optional[dict], agora: Optional[datetime] = None) -> datetime:
+    """expires_at a gravar para uma cobrança recém-criada (`data` da resposta da AbacatePay)."""
+    return expires_at_da_cobranca(data) or (agora or timezone.now()) + timedelta(seconds=QR_VALIDADE_PADRAO_S)
+
+
+def vencido(payment: Payment, agora: Optional[datetime] = None) -> bool:
+    """Cobrança ainda em aberto cujo QR já venceu."""
+    if payment.status not in STATUS_ABERTOS:
+        return False
+    agora = agora or timezone.now()
+    if payment.expires_at:
+        return payment.expires_at <= agora
+    return payment.created_at <= agora - timedelta(seconds=QR_VALIDADE_PADRAO_S)
+
+
+def status_efetivo(payment: Payment, agora: Optional[datetime] = None) -> str:
+    """Status para mostrar ao cliente: EXPIRED se venceu, mesmo antes da varredura."""
+    return Payment.STATUS_EXPIRED if vencido(payment, agora) else payment.status
+
+
+def vencidos(agora: Optional[datetime] = None, tolerancia_s: int = TOLERANCIA_S):
+    agora = agora or timezone.now()
+    limite = agora - timedelta(seconds=tolerancia_s)
+    # sem expires_at (cobrança antiga, ou que nunca chegou à AbacatePay): validade padrão desde a criação
+    return Payment.objects.filter(
+        Q(expires_at__lte=limite)
+        | Q(expires_at__isnull=True, created_at__lte=limite - timedelta(seconds=QR_VALIDADE_PADRAO_S)),
+        status__in=STATUS_ABERTOS,
+    )
+
+
+def expirar_vencidos(lote: int = LOTE_PADRAO, tolerancia_s: int = TOLERANCIA_S,
+                     agora: Optional[datetime] = None) -> int:
+    """
+    Marca EXPIRED os pagamentos vencidos, `lote` por transação (o lock de escrita
+    do SQLite fica curto). O UPDATE repete o filtro de status: o que um webhook
+    pagou entre a leitura e a escrita fica de fora. Retorna quantos expiraram.
+    """
+    agora = agora or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(vencidos(agora, tolerancia_s).order_by("expires_at").values_list("id", flat=True)[:lote])
+            if not ids:
+                break
+            expirados = Payment.objects.filter(id__in=ids, status__in=STATUS_ABERTOS).update(
+                status=Payment.STATUS_EXPIRED, updated_at=agora
+            )
+            # update() não dispara post_save: avisa o long-poll aqui
+            status_cache.sinalizar(ids)
+            if expirados and eventos.ha_assinantes():
+                for p in Payment.objects.select_related("corrida").filter(id__in=ids, status=Payment.STATUS_EXPIRED):
+                    eventos.publicar(interessados(p), "pagamento",
+                                     {"id": p.id, "corrida_id": p.corrida_id, "status": p.status})
+        total += expirados
+        if len(ids) < lote:
+            break
+    if total:
+        logger.info("%s pagamento(s) expirado(s)", total)
+    return total
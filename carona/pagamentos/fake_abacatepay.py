@@ -0,0 +1,165 @@
+# pagamentos/fake_abacatepay.py
+"""
+Stand-in local da API da AbacatePay (comando fake_abacatepay), para testes de
+carga e desenvolvimento sem rede:
+
+    POST /v1/billing/create            cria cobrança (criar_pix_qr / criar_pix_carteira)
+    GET  /v1/billing/<id>              consulta (obter_charge; também /v1/charges e /v1/pix/charges)
+    POST /_fake/pagar/<id>             marca PAID e, com webhook_url, envia o billing.paid assinado
+    POST /_fake/status/<id>?status=X   força outro status (EXPIRED, CANCELLED...)
+
+Estado só em memória. `latencia_ms` e `taxa_erro` simulam a API lenta/instável.
+Apontar o projeto para ele com ABACATEPAY_BASE_URL=http://127.0.0.1:<porta>/v1
+(ou reconciliar_pagamentos --base-url).
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from .carga import Cobranca, corpo_assinado, evento_pago
+
+logger = logging.getLogger(__name__)
+
+# PNG 1x1 transparente: o suficiente para o blob store de QR
+QR_PNG_BASE64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+VALIDADE_S = 3600
+
+_CONSULTA = re.compile(r"^/v1/(?:pix/charges|charges|billing)/([^/]+)/?$")
+_CONTROLE = re.compile(r"^/_fake/(pagar|status)/([^/]+)/?$")
+
+
+class EstadoFake:
+    def __init__(self, latencia_ms: int = 0, taxa_erro: float = 0.0, webhook_url: Optional[str] = None):
+        self.latencia_s = latencia_ms / 1000
+        self.taxa_erro = taxa_erro
+        self.webhook_url = webhook_url
+        self.cobrancas = {}
+        self.lock = threading.Lock()
+
+    def criar(self, corpo: dict) -> dict:
+        cobranca_id = f"bill_{uuid.uuid4().hex[:20]}"
+        produtos = corpo.get("products") or [{}]
+        cobranca = {
+            "id": cobranca_id,
+            "url": f"https://abacatepay.local/pay/{cobranca_id}",
+            "amount": sum(int(p.get("price") or 0) * int(p.get("quantity") or 1) for p in produtos),
+            "status": "PENDING",
+            "externalId": corpo.get("externalId"),
+            "brCode": f"00020101021226850014br.gov.bcb.pix-{cobranca_id}",
+            "brCodeBase64": QR_PNG_BASE64,
+            "devMode": True,
+            "expiresAt": (datetime.now(dt_timezone.utc) + timedelta(seconds=VALIDADE_S)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        }
+        with self.lock:
+            self.cobrancas[cobranca_id] = cobranca
+        return cobranca
+
+    def obter(self, cobranca_id: str) -> Optional[dict]:
+        with self.lock:
+            cobranca = self.cobrancas.get(cobranca_id)
+            return dict(cobranca) if cobranca else None
+
+    def mudar_status(self, cobranca_id: str, status: str) -> Optional[dict]:
+        with self.lock:
+            cobranca = self.cobrancas.get(cobranca_id)
+            if cobranca is None:
+                return None
+            cobranca["status"] = status
+            return dict(cobranca)
+
+
+def _enviar_webhook(url: str, cobranca: dict) -> None:
+    evento = evento_pago(
+        f"evt_{uuid.uuid4().hex[:16]}",
+        Cobranca(cobranca["id"], cobranca.get("externalId") or "", cobranca["amount"]),
+    )
+    corpo, assinatura = corpo_assinado(evento)
+    try:
+        resp = requests.post(url, data=corpo, timeout=10, headers={
+            "Content-Type": "application/json", "X-Webhook-Signature": assinatura,
+        })
+        logger.info("Webhook billing.paid de %s -> HTTP %s", cobranca["id"], resp.status_code)
+    except requests.RequestException as exc:
+        logger.warning("Falha enviando webhook de %s: %s", cobranca["id"], exc)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    estado: EstadoFake = None  # definido por `servidor`
+
+    def _responder(self, codigo: int, corpo: dict) -> None:
+        dados = json.dumps(corpo).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _simular_api(self) -> bool:
+        """Latência e falhas simuladas; True se esta requisição deve falhar."""
+        if self.estado.latencia_s:
+            time.sleep(self.estado.latencia_s)
+        if self.estado.taxa_erro and random.random() < self.estado.taxa_erro:
+            self._responder(503, {"data": None, "error": "fake: falha simulada"})
+            return True
+        return False
+
+    def do_GET(self):
+        m = _CONSULTA.match(urlparse(self.path).path)
+        if not m:
+            return self._responder(404, {"data": None, "error": "rota desconhecida"})
+        if self._simular_api():
+            return
+        cobranca = self.estado.obter(m.group(1))
+        if cobranca is None:
+            return self._responder(404, {"data": None, "error": "cobrança não encontrada"})
+        self._responder(200, {"data": cobranca, "error": None})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        bruto = self.rfile.read(tamanho) if tamanho else b""
+
+        controle = _CONTROLE.match(url.path)
+        if controle:
+            acao, cobranca_id = controle.groups()
+            status = "PAID" if acao == "pagar" else (parse_qs(url.query).get("status") or ["EXPIRED"])[0].upper()
+            cobranca = self.estado.mudar_status(cobranca_id, status)
+            if cobranca is None:
+                return self._responder(404, {"data": None, "error": "cobrança não encontrada"})
+            if status == "PAID" and self.estado.webhook_url:
+                threading.Thread(target=_enviar_webhook, args=(self.estado.webhook_url, cobranca), daemon=True).start()
+            return self._responder(200, {"data": cobranca, "error": None})
+
+        if url.path.rstrip("/") not in ("/v1/billing/create", "/v1/pix/qr-code"):
+            return self._responder(404, {"data": None, "error": "rota desconhecida"})
+        if self._simular_api():
+            return
+        try:
+            corpo = json.loads(bruto or b"{}")
+        except ValueError:
+            return self._responder(400, {"data": None, "error": "JSON inválido"})
+        self._responder(200, {"data": self.estado.criar(corpo), "error": None})
+
+    def log_message(self, formato, *args):
+        logger.debug("fake_abacatepay: " + formato, *args)
+
+
+def servidor(host: str = "127.0.0.1", porta: int = 9000, latencia_ms: int = 0, taxa_erro: float = 0.0,
+             webhook_url: Optional[str] = None) -> ThreadingHTTPServer:
+    """Cria o servidor (chamar serve_forever/shutdown). porta=0 escolhe uma livre."""
+    handler = type("Handler", (_Handler,), {"estado": EstadoFake(latencia_ms, taxa_erro, webhook_url)})
+    srv = ThreadingHTTPServer((host, porta), handler)
+    srv.daemon_threads = True
+    return srv
@@ -0,0 +1,51 @@
+# pagamentos/idempotencia.py
+"""
+Idempotência na criação de pagamentos.
+
+Cada endpoint que cria Payment/cobrança grava uma chave em
+Payment.idempotency_key (índice único). A chave vem do header Idempotency-Key
+do cliente (uma por intenção: o mesmo valor em retries e duplo clique) ou é
+derivada no servidor do que identifica a operação (ex.: pagar a corrida X pelo
+passageiro Y só acontece uma vez). Requisição repetida encontra o Payment pela
+chave e devolve o resultado dele, sem nova chamada à AbacatePay.
+
+A chave do cliente é prefixada com escopo e usuário e guardada como sha256:
+clientes diferentes (ou endpoints diferentes) nunca colidem.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from .expiracao import STATUS_ABERTOS, vencido
+from .models import Payment
+
+HEADER = "Idempotency-Key"
+TAMANHO_MAX_CHAVE = 255
+
+
+def chave(escopo: str, user_id, *partes) -> str:
+    """Chave derivada no servidor: escopo + usuário + partes que identificam a operação."""
+    return ":".join(str(p) for p in (escopo, user_id, *partes))
+
+
+def chave_corrida_pix(user_id, corrida_id) -> str:
+    """Cobrança PIX do passageiro na corrida: uma só (Corrida.iniciar ou iniciar_pagamento)."""
+    return chave("corrida-pix", user_id, corrida_id)
+
+
+def chave_do_cliente(request, escopo: str) -> Optional[str]:
+    """Chave a partir do header Idempotency-Key, ou None se ausente/inválido."""
+    valor = (request.headers.get(HEADER) or "").strip()
+    if not valor or len(valor) > TAMANHO_MAX_CHAVE or not valor.isprintable():
+        return None
+    digest = hashlib.sha256(valor.encode("utf-8")).hexdigest()
+    return chave(escopo, request.user.id, digest)
+
+
+def qr_valido(payment: Payment, agora: Optional[datetime] = None) -> bool:
+    """A cobrança do Payment ainda pode ser paga (aberta, com QR/link e não expirada)?"""
+    if payment.status not in STATUS_ABERTOS:
+        return False
+    if not (payment.billing_url or payment.qr_hash or payment.brCode):
+        return False
+    return not vencido(payment, agora)
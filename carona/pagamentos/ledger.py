@@ -0,0 +1,144 @@
+# pagamentos/ledger.py
+"""
+Ledger da carteira.
+
+Toda mudança de saldo passa por `registrar_lancamentos`: numa única transação,
+cada carteira recebe um UPDATE com F() (débitos condicionados a saldo >= valor)
+e os lançamentos são gravados com um bulk_create. Não há read-modify-write em
+Python, então pagamentos concorrentes não perdem atualizações.
+
+Snapshots periódicos (`tirar_snapshots`) guardam o saldo apurado pelo ledger até
+um lançamento; `saldo_pelo_ledger` soma só o que veio depois do último.
+"""
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import Carteira, LedgerEntry, SaldoSnapshot
+
+logger = logging.getLogger(__name__)
+
+CENTAVO = Decimal("0.01")
+
+
+class SaldoInsuficiente(ValueError):
+    """A carteira não tem saldo para o débito pedido."""
+
+
+@dataclass
+class Movimento:
+    user_id: int
+    valor: Decimal                 # assinado: crédito > 0, débito < 0
+    tipo: str
+    payment_id: Optional[int] = None
+    descricao: str = ""
+
+
+def _centavos(valor) -> Decimal:
+    return Decimal(str(valor)).quantize(CENTAVO)
+
+
+def registrar_lancamentos(movimentos: Iterable[Movimento]) -> list:
+    """
+    Aplica os movimentos atomicamente: ou todos entram, ou nenhum.
+    Levanta SaldoInsuficiente se algum débito não couber no saldo.
+    Retorna os LedgerEntry criados.
+    """
+    movimentos = [m for m in movimentos if _centavos(m.valor)]
+    if not movimentos:
+        return []
+
+    with transaction.atomic():
+        user_ids = {m.user_id for m in movimentos}
+        Carteira.objects.bulk_create(
+            [Carteira(user_id=uid) for uid in user_ids], ignore_conflicts=True
+        )
+        carteiras = dict(
+            Carteira.objects.filter(user_id__in=user_ids).values_list("user_id", "id")
+        )
+
+        agora = timezone.now()
+        lancamentos = []
+        # ordem estável de carteiras: evita deadlock entre transferências cruzadas
+        for m in sorted(movimentos, key=lambda m: carteiras[m.user_id]):
+            valor = _centavos(m.valor)
+            carteira_id = carteiras[m.user_id]
+            qs = Carteira.objects.filter(id=carteira_id)
+            if valor < 0:
+                qs = qs.filter(saldo__gte=-valor)
+            if not qs.update(saldo=F("saldo") + valor, updated_at=agora):
+                raise SaldoInsuficiente("Saldo insuficiente")
+            lancamentos.append(LedgerEntry(
+                carteira_id=carteira_id,
+                tipo=m.tipo,
+                valor=valor,
+                payment_id=m.payment_id,
+                descricao=m.descricao[:255],
+            ))
+        return LedgerEntry.objects.bulk_create(lancamentos)
+
+
+def saldo_pelo_ledger(carteira_id: int) -> Decimal:
+    """Saldo recalculado: último snapshot + lançamentos posteriores."""
+    snap = (
+        SaldoSnapshot.objects.filter(carteira_id=carteira_id)
+        .order_by("-ultimo_lancamento_id")
+        .values_list("saldo", "ultimo_lancamento_id")
+        .first()
+    )
+    base, desde = snap if snap else (Decimal("0.00"), 0)
+    delta = (
+        LedgerEntry.objects.filter(carteira_id=carteira_id, id__gt=desde)
+        .aggregate(total=Sum("valor"))["total"]
+    )
+    return base + (delta or 0)
+
+
+def tirar_snapshots() -> dict:
+    """
+    Gera um snapshot para cada carteira que teve lançamentos desde o último
+    snapshot global e aponta divergências entre o ledger e Carteira.saldo.
+    Retorna {"snapshots": n, "divergentes": [carteira_id, ...]}.
+    """
+    anterior = SaldoSnapshot.objects.aggregate(m=Max("ultimo_lancamento_id"))["m"] or 0
+    with transaction.atomic():
+        ate = LedgerEntry.objects.aggregate(m=Max("id"))["m"] or 0
+        if ate <= anterior:
+            return {"snapshots": 0, "divergentes": []}
+
+        deltas = dict(
+            LedgerEntry.objects.filter(id__gt=anterior, id__lte=ate)
+            .values("carteira_id")
+            .annotate(total=Sum("valor"))
+            .values_list("carteira_id", "total")
+        )
+        novos = []
+        for carteira_id, delta in deltas.items():
+            base = (
+                SaldoSnapshot.objects.filter(carteira_id=carteira_id)
+                .order_by("-ultimo_lancamento_id")
+                .values_list("saldo", flat=True)
+                .first()
+            ) or Decimal("0.00")
+            novos.append(SaldoSnapshot(carteira_id=carteira_id, saldo=base + delta, ultimo_lancamento_id=ate))
+        SaldoSnapshot.objects.bulk_create(novos)
+
+        # divergência só é conclusiva para carteiras sem lançamentos depois de `ate`
+        com_movimento_novo = set(
+            LedgerEntry.objects.filter(id__gt=ate, carteira_id__in=deltas).values_list("carteira_id", flat=True)
+        )
+        saldos = dict(Carteira.objects.filter(id__in=deltas).values_list("id", "saldo"))
+        divergentes = [
+            s.carteira_id for s in novos
+            if s.carteira_id not in com_movimento_novo and saldos.get(s.carteira_id) != s.saldo
+        ]
+    for carteira_id in divergentes:
+        logger.error("Carteira %s diverge do ledger (saldo=%s, ledger=%s)",
+                     carteira_id, saldos.get(carteira_id),
+                     next(s.saldo for s in novos if s.carteira_id == carteira_id))
+    return {"snapshots": len(novos), "divergentes": divergentes}
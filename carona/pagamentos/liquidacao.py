@@ -0,0 +1,141 @@
+# pagamentos/liquidacao.py
+"""
+Liquidação periódica dos ganhos dos motoristas.
+
+Pagamento de corrida confirmado não credita mais a carteira do motorista na
+hora: `provisionar_repasse` grava um Repasse (bruto, retenção, líquido) e só.
+`liquidar_periodo` junta, por motorista, os repasses ainda não liquidados do
+período e faz um único crédito no ledger, numa transação por motorista. Em pico
+de pagamentos, a linha da carteira do motorista deixa de receber um UPDATE por
+corrida.
+
+A retenção da plataforma (PORCENTAGEM_RETENCAO, fração do valor) é calculada só
+em `calcular_retencao`, por corrida, e a liquidação soma os valores já
+arredondados: o relatório fecha com o que cada recibo mostrou.
+"""
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .ledger import CENTAVO, Movimento, registrar_lancamentos
+from .models import LedgerEntry, Liquidacao, Payment, Repasse
+
+logger = logging.getLogger(__name__)
+
+PORCENTAGEM_RETENCAO = Decimal(str(getattr(settings, "PORCENTAGEM_RETENCAO", 0.12)))
+ZERO = Decimal("0.00")
+
+
+def calcular_retencao(valor_bruto) -> Tuple[Decimal, Decimal]:
+    """Retorna (retenção, líquido do motorista) de um valor de corrida, em reais."""
+    valor_bruto = Decimal(str(valor_bruto)).quantize(CENTAVO)
+    retencao = (valor_bruto * PORCENTAGEM_RETENCAO).quantize(CENTAVO)
+    return retencao, valor_bruto - retencao
+
+
+def provisionar_repasse(payment: Payment) -> Optional[Repasse]:
+    """Provisiona o repasse de um pagamento de corrida pago (idempotente: um por pagamento)."""
+    motorista_id = payment.corrida.motorista_id if payment.corrida_id else None
+    if not motorista_id:
+        logger.warning("Payment %s sem corrida/motorista: repasse não provisionado", payment.id)
+        return None
+    valor_bruto = (Decimal(payment.amount_cents) / 100).quantize(CENTAVO)
+    retencao, liquido = calcular_retencao(valor_bruto)
+    repasse, _ = Repasse.objects.get_or_create(
+        payment=payment,
+        defaults={
+            "motorista_id": motorista_id,
+            "corrida_id": payment.corrida_id,
+            "valor_bruto": valor_bruto,
+            "retencao": retencao,
+            "valor_liquido": liquido,
+        },
+    )
+    return repasse
+
+
+def periodo_do_dia(dia) -> Tuple[datetime, datetime]:
+    """[00:00, 00:00 do dia seguinte) no fuso local."""
+    inicio = timezone.make_aware(datetime.combine(dia, time.min))
+    return inicio, inicio + timedelta(days=1)
+
+
+def _a_liquidar(inicio: datetime, fim: datetime):
+    return Repasse.objects.filter(liquidacao__isnull=True, criado_em__gte=inicio, criado_em__lt=fim)
+
+
+CAMPOS_VALOR = ("valor_bruto", "retencao", "valor_liquido")
+
+
+def _totais(qs) -> dict:
+    """Soma dos repasses; o SQLite soma DecimalField em ponto flutuante, daí o quantize."""
+    linha = qs.aggregate(quantidade=Count("id"), **{c: Sum(c) for c in CAMPOS_VALOR})
+    linha.update({c: Decimal(str(linha[c] or 0)).quantize(CENTAVO) for c in CAMPOS_VALOR})
+    return linha
+
+
+def previa_periodo(inicio: datetime, fim: datetime) -> list:
+    """O que `liquidar_periodo` creditaria agora, por motorista (não grava nada)."""
+    motoristas = _a_liquidar(inicio, fim).order_by("motorista_id").values_list("motorista_id", flat=True).distinct()
+    return [
+        {"motorista_id": motorista_id, **_totais(_a_liquidar(inicio, fim).filter(motorista_id=motorista_id))}
+        for motorista_id in motoristas
+    ]
+
+
+def _liquidar_motorista(motorista_id: int, inicio: datetime, fim: datetime) -> Optional[Liquidacao]:
+    with transaction.atomic():
+        liquidacao = Liquidacao.objects.create(motorista_id=motorista_id, periodo_inicio=inicio, periodo_fim=fim)
+        # UPDATE condicional: repasse já reivindicado por outra execução fica de fora
+        if not _a_liquidar(inicio, fim).filter(motorista_id=motorista_id).update(liquidacao=liquidacao):
+            liquidacao.delete()
+            return None
+        totais = _totais(Repasse.objects.filter(liquidacao=liquidacao))
+        liquidacao.quantidade = totais["quantidade"]
+        liquidacao.valor_bruto = totais["valor_bruto"]
+        liquidacao.retencao = totais["retencao"]
+        liquidacao.valor_liquido = totais["valor_liquido"]
+        lancamentos = registrar_lancamentos([Movimento(
+            user_id=motorista_id,
+            valor=liquidacao.valor_liquido,
+            tipo=LedgerEntry.TIPO_LIQUIDACAO,
+            descricao=f"Liquidação {inicio:%d/%m/%Y} ({liquidacao.quantidade} corrida(s))",
+        )])
+        liquidacao.lancamento = lancamentos[0] if lancamentos else None
+        liquidacao.save(update_fields=["quantidade", "valor_bruto", "retencao", "valor_liquido", "lancamento"])
+    return liquidacao
+
+
+def liquidar_periodo(inicio: datetime, fim: datetime) -> list:
+    """
+    Liquida os repasses provisionados em [inicio, fim): um crédito por motorista,
+    cada um na sua transação (uma falha não desfaz os outros). Reexecutar o mesmo
+    período só pega o que ainda não foi liquidado. Retorna as Liquidacao criadas.
+    """
+    motoristas = list(
+        _a_liquidar(inicio, fim).order_by("motorista_id").values_list("motorista_id", flat=True).distinct()
+    )
+    liquidacoes = []
+    for motorista_id in motoristas:
+        try:
+            liquidacao = _liquidar_motorista(motorista_id, inicio, fim)
+        except Exception:
+            logger.exception("Falha liquidando repasses do motorista %s (%s a %s)", motorista_id, inicio, fim)
+            continue
+        if liquidacao is not None:
+            liquidacoes.append(liquidacao)
+    if liquidacoes:
+        logger.info("Liquidação %s a %s: %s motorista(s), R$ %s", inicio, fim, len(liquidacoes),
+                    sum((l.valor_liquido for l in liquidacoes), ZERO))
+    return liquidacoes
+
+
+def a_liquidar_do_motorista(motorista_id: int) -> Decimal:
+    """Líquido provisionado e ainda não creditado na carteira."""
+    return _totais(Repasse.objects.filter(motorista_id=motorista_id, liquidacao__isnull=True))["valor_liquido"]
@@ -0,0 +1,81 @@
+# pagamentos/management/commands/carga_webhook.py
+"""
+Teste de carga do webhook contra um servidor local (pagamentos.carga), ex.:
+python manage.py runserver --noreload &   (ou gunicorn) e python manage.py runworkers &
+python manage.py carga_webhook --eventos 2000 --concorrencia 32 --taxa 300 --preparar 1500 --aguardar 60
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pagamentos import carga
+from pagamentos.models import WebhookInbox
+
+
+def _mix(valor: str) -> dict:
+    mix = {}
+    for parte in valor.split(","):
+        tipo, _, peso = parte.partition("=")
+        if tipo.strip() not in carga.MIX_PADRAO:
+            raise CommandError(f"Tipo desconhecido em --mix: {tipo!r} (use {', '.join(carga.MIX_PADRAO)})")
+        mix[tipo.strip()] = int(peso or 0)
+    return mix
+
+
+class Command(BaseCommand):
+    help = "Gera eventos de webhook assinados e os dispara contra um servidor local, medindo vazão e latência."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/pagamentos/webhook/abacatepay/")
+        parser.add_argument("--eventos", type=int, default=1000)
+        parser.add_argument("--concorrencia", type=int, default=16)
+        parser.add_argument("--taxa", type=float, default=0, help="Requisições por segundo (0 = sem limite)")
+        parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in carga.MIX_PADRAO.items()),
+                            help="Pesos por tipo de evento, ex.: pago=70,saque=10,duplicado=10,desconhecido=10")
+        parser.add_argument("--preparar", type=int, default=0,
+                            help="Cria N depósitos em aberto no banco para os eventos de pagamento (só DEBUG)")
+        parser.add_argument("--aguardar", type=float, default=0,
+                            help="Segundos esperando o worker esvaziar a inbox dos eventos desta execução")
+        parser.add_argument("--forcar", action="store_true", help="Permite --preparar com DEBUG=False")
+        parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+
+    def handle(self, *args, **opts):
+        if opts["preparar"] and not (settings.DEBUG or opts["forcar"]):
+            raise CommandError("--preparar grava Payments de teste: use só em ambiente local (DEBUG) ou com --forcar.")
+        secret = getattr(settings, "ABACATEPAY_WEBHOOK_SECRET", None)
+        if not secret:
+            raise CommandError("ABACATEPAY_WEBHOOK_SECRET não configurado.")
+        url = opts["url"]
+        if "webhookSecret=" not in url:
+            url += ("&" if "?" in url else "?") + f"webhookSecret={secret}"
+
+        cobrancas = carga.preparar_pagamentos(opts["preparar"]) if opts["preparar"] else []
+        prefixo = f"carga-{int(time.time())}"
+        eventos = carga.gerar_eventos(opts["eventos"], cobrancas, _mix(opts["mix"]), prefixo)
+        relatorio = carga.disparar(url, eventos, opts["concorrencia"], opts["taxa"])
+
+        if opts["aguardar"]:
+            inicio = time.monotonic()
+            prazo = inicio + opts["aguardar"]
+            while time.monotonic() < prazo and WebhookInbox.objects.filter(
+                event_id__startswith=f"{prefixo}-", status=WebhookInbox.STATUS_PENDENTE
+            ).exists():
+                time.sleep(0.5)
+            relatorio["drenagem_s"] = round(time.monotonic() - inicio, 2)
+        relatorio["inbox"] = carga.resumo_inbox(prefixo)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(relatorio))
+            return
+        lat = relatorio["latencia_ms"]
+        self.stdout.write(
+            f"{relatorio['eventos']} evento(s) {relatorio['por_tipo']} em {relatorio['duracao_s']}s "
+            f"= {relatorio['req_por_s']} req/s"
+        )
+        self.stdout.write(f"latência ms: p50={lat['p50']} p90={lat['p90']} p99={lat['p99']} max={lat['max']}")
+        self.stdout.write(f"HTTP: {relatorio['status_http']}  erros: {relatorio['erros'] or '-'}")
+        inbox = relatorio["inbox"]
+        drenagem = f" (após {relatorio['drenagem_s']}s)" if "drenagem_s" in relatorio else ""
+        self.stdout.write(f"inbox{drenagem}: {inbox['por_status']}  erros de lock: {inbox['erros_lock']}")
@@ -0,0 +1,34 @@
+# pagamentos/management/commands/expirar_pagamentos.py
+"""
+Varredura de cobranças vencidas (pagamentos.expiracao), ex.:
+*/5 * * * * python manage.py expirar_pagamentos
+ou em loop: python manage.py expirar_pagamentos --intervalo 60
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from pagamentos.expiracao import LOTE_PADRAO, TOLERANCIA_S, expirar_vencidos, vencidos
+
+
+class Command(BaseCommand):
+    help = "Marca como EXPIRED, em lotes, os pagamentos em aberto cujo expires_at já passou."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+        parser.add_argument("--tolerancia", type=int, default=TOLERANCIA_S,
+                            help="Segundos após expires_at antes de expirar (dá tempo à conciliação)")
+        parser.add_argument("--intervalo", type=float, default=0, help="Segundos entre varreduras (0 = roda uma vez)")
+        parser.add_argument("--dry-run", action="store_true", help="Só conta os vencidos")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            self.stdout.write(f"[dry-run] {vencidos(tolerancia_s=opts['tolerancia']).count()} pagamento(s) vencido(s).")
+            return
+        while True:
+            expirados = expirar_vencidos(lote=opts["lote"], tolerancia_s=opts["tolerancia"])
+            if expirados or not opts["intervalo"]:
+                self.stdout.write(f"{expirados} pagamento(s) expirado(s).")
+            if not opts["intervalo"]:
+                break
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,33 @@
+# pagamentos/management/commands/fake_abacatepay.py
+"""
+Sobe o stand-in local da AbacatePay (pagamentos.fake_abacatepay), ex.:
+python manage.py fake_abacatepay --porta 9000 --latencia-ms 150 \
+    --webhook-url "http://127.0.0.1:8000/pagamentos/webhook/abacatepay/?webhookSecret=$ABACATEPAY_WEBHOOK_SECRET"
+e, no servidor Django: ABACATEPAY_BASE_URL=http://127.0.0.1:9000/v1
+"""
+from django.core.management.base import BaseCommand
+
+from pagamentos.fake_abacatepay import servidor
+
+
+class Command(BaseCommand):
+    help = "Servidor HTTP local que imita a API da AbacatePay (criação/consulta de cobranças e webhook de pagamento)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--porta", type=int, default=9000)
+        parser.add_argument("--latencia-ms", type=int, default=0, help="Atraso artificial de cada chamada à API")
+        parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração das chamadas que falham com 503")
+        parser.add_argument("--webhook-url", default=None,
+                            help="Para onde enviar o billing.paid quando /_fake/pagar/<id> é chamado")
+
+    def handle(self, *args, **opts):
+        srv = servidor(opts["host"], opts["porta"], opts["latencia_ms"], opts["taxa_erro"], opts["webhook_url"])
+        host, porta = srv.server_address[:2]
+        self.stdout.write(f"Fake AbacatePay em http://{host}:{porta}/v1 (Ctrl+C para sair)")
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.server_close()
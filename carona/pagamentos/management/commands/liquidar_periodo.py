@@ -0,0 +1,61 @@
+# pagamentos/management/commands/liquidar_periodo.py
+"""
+Liquidação diária dos repasses dos motoristas (por padrão, o dia anterior), ex.:
+15 0 * * * python manage.py liquidar_periodo
+Recuperar dias perdidos: --data 2025-01-31 --dias 3 (29, 30 e 31/01).
+"""
+import json
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pagamentos.liquidacao import liquidar_periodo, periodo_do_dia, previa_periodo
+
+
+class Command(BaseCommand):
+    help = "Credita na carteira de cada motorista, em um lançamento, os repasses provisionados no período."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--data", default=None, help="Dia a liquidar (AAAA-MM-DD); padrão: ontem")
+        parser.add_argument("--dias", type=int, default=1, help="Quantidade de dias terminando em --data")
+        parser.add_argument("--dry-run", action="store_true", help="Só mostra o relatório, sem creditar")
+        parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+
+    def handle(self, *args, **opts):
+        if opts["data"]:
+            try:
+                ultimo = date.fromisoformat(opts["data"])
+            except ValueError:
+                raise CommandError("--data deve estar no formato AAAA-MM-DD")
+        else:
+            ultimo = timezone.localdate() - timedelta(days=1)
+        if ultimo >= timezone.localdate():
+            raise CommandError("Só dias já encerrados podem ser liquidados.")
+
+        relatorio = []
+        for i in range(max(opts["dias"], 1) - 1, -1, -1):
+            dia = ultimo - timedelta(days=i)
+            inicio, fim = periodo_do_dia(dia)
+            if opts["dry_run"]:
+                linhas = previa_periodo(inicio, fim)
+            else:
+                linhas = [
+                    {"motorista_id": l.motorista_id, "quantidade": l.quantidade, "valor_bruto": l.valor_bruto,
+                     "retencao": l.retencao, "valor_liquido": l.valor_liquido, "liquidacao_id": l.id}
+                    for l in liquidar_periodo(inicio, fim)
+                ]
+            relatorio.append({"dia": dia.isoformat(), "motoristas": linhas})
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(relatorio, default=str))
+            return
+        for periodo in relatorio:
+            linhas = periodo["motoristas"]
+            prefixo = "[dry-run] " if opts["dry_run"] else ""
+            self.stdout.write(f"{prefixo}{periodo['dia']}: {len(linhas)} motorista(s)")
+            for l in linhas:
+                self.stdout.write(
+                    f"  motorista {l['motorista_id']}: {l['quantidade']} corrida(s), bruto R$ {l['valor_bruto']}, "
+                    f"retenção R$ {l['retencao']}, líquido R$ {l['valor_liquido']}"
+                )
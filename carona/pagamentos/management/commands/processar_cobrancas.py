@@ -0,0 +1,31 @@
+# pagamentos/management/commands/processar_cobrancas.py
+"""
+Worker da outbox de cobranças PIX. Rodar em loop, ex.:
+python manage.py processar_cobrancas --intervalo 2
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from pagamentos.cobrancas import COBRANCA_WORKERS, LOTE_PADRAO, processar_outbox
+
+
+class Command(BaseCommand):
+    help = "Cria na AbacatePay as cobranças PIX pendentes da outbox (com retries e dead-letter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+        parser.add_argument("--workers", type=int, default=COBRANCA_WORKERS, help="Chamadas simultâneas à AbacatePay")
+        parser.add_argument("--intervalo", type=float, default=0, help="Segundos entre varreduras (0 = roda uma vez)")
+
+    def handle(self, *args, **opts):
+        while True:
+            resultado = processar_outbox(lote=opts["lote"], workers=opts["workers"])
+            if any(resultado.values()) or not opts["intervalo"]:
+                self.stdout.write(
+                    f"{resultado['criadas']} cobrança(s) criada(s), {resultado['falhas']} falha(s) "
+                    f"reagendada(s), {resultado['mortas']} em dead-letter."
+                )
+            if not opts["intervalo"]:
+                break
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,30 @@
+# pagamentos/management/commands/processar_webhooks.py
+"""
+Worker da inbox de webhooks do AbacatePay. Rodar em loop, ex.:
+python manage.py processar_webhooks --intervalo 2
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from pagamentos.webhook import LOTE_PADRAO, processar_inbox
+
+
+class Command(BaseCommand):
+    help = "Processa os eventos pendentes da inbox de webhooks (com retries e dead-letter)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+        parser.add_argument("--intervalo", type=float, default=0, help="Segundos entre varreduras (0 = roda uma vez)")
+
+    def handle(self, *args, **opts):
+        while True:
+            resultado = processar_inbox(lote=opts["lote"])
+            if any(resultado.values()) or not opts["intervalo"]:
+                self.stdout.write(
+                    f"{resultado['processados']} processado(s), {resultado['falhas']} falha(s) "
+                    f"reagendada(s), {resultado['mortos']} em dead-letter."
+                )
+            if not opts["intervalo"]:
+                break
+            time.sleep(opts["intervalo"])
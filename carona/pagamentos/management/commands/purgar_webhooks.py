@@ -0,0 +1,45 @@
+# pagamentos/management/commands/purgar_webhooks.py
+"""
+Retenção dos webhooks processados (pagamentos.eventos_processados), ex.:
+30 3 * * * python manage.py purgar_webhooks
+Arquiva (comprimidos) os payloads fora da janela quente e apaga, em lotes, o
+que passou da retenção.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from pagamentos import eventos_processados as ep
+
+
+class Command(BaseCommand):
+    help = "Arquiva payloads de webhooks processados e apaga registros antigos em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias-payload", type=int, default=ep.PAYLOAD_QUENTE_DIAS,
+                            help="Payload sai da tabela quente depois de N dias")
+        parser.add_argument("--dias-dedupe", type=int, default=ep.DEDUPE_DIAS,
+                            help="Registro de idempotência apagado depois de N dias")
+        parser.add_argument("--dias-arquivo", type=int, default=ep.ARQUIVO_DIAS,
+                            help="Payload arquivado apagado depois de N dias")
+        parser.add_argument("--dias-inbox", type=int, default=ep.INBOX_DIAS,
+                            help="WebhookInbox PROCESSADO apagada depois de N dias")
+        parser.add_argument("--lote", type=int, default=ep.LOTE_PADRAO)
+        parser.add_argument("--dry-run", action="store_true", help="Só conta, sem gravar")
+        parser.add_argument("--json", action="store_true", help="Relatório em JSON")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            resultado = ep.previa(opts["dias_payload"], opts["dias_dedupe"], opts["dias_arquivo"], opts["dias_inbox"])
+        else:
+            resultado = {"arquivar": ep.arquivar(opts["dias_payload"], opts["lote"])}
+            resultado.update(ep.purgar(opts["dias_dedupe"], opts["dias_arquivo"], opts["dias_inbox"], opts["lote"]))
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(resultado))
+            return
+        prefixo = "[dry-run] " if opts["dry_run"] else ""
+        self.stdout.write(
+            f"{prefixo}{resultado['arquivar']} payload(s) arquivado(s); apagados: {resultado['dedupe']} registro(s) "
+            f"de dedupe, {resultado['arquivo']} arquivo(s), {resultado['inbox']} evento(s) da inbox."
+        )
@@ -0,0 +1,47 @@
+# pagamentos/management/commands/reconciliar_pagamentos.py
+"""
+Conciliação de pagamentos parados em PENDING/CREATED com a AbacatePay, ex.:
+*/10 * * * * python manage.py reconciliar_pagamentos
+Contra um stand-in local da API: --base-url http://127.0.0.1:9000/v1
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from pagamentos import conciliacao
+
+
+class Command(BaseCommand):
+    help = "Consulta na AbacatePay os pagamentos em aberto há muito tempo e aplica o status retornado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=conciliacao.LOTE_PADRAO)
+        parser.add_argument("--workers", type=int, default=conciliacao.WORKERS)
+        parser.add_argument("--taxa", type=float, default=conciliacao.TAXA_POR_S,
+                            help="Máximo de consultas por segundo (0 = sem limite)")
+        parser.add_argument("--limite", type=int, default=None, help="Máximo de pagamentos nesta execução")
+        parser.add_argument("--idade-min", type=int, default=conciliacao.IDADE_MIN,
+                            help="Só pagamentos criados há mais de N minutos")
+        parser.add_argument("--reconsulta-min", type=int, default=conciliacao.RECONSULTA_MIN,
+                            help="Não reconsulta o que foi conciliado há menos de N minutos")
+        parser.add_argument("--base-url", default=None, help="Sobrescreve ABACATEPAY_BASE_URL")
+        parser.add_argument("--json", action="store_true", help="Métricas em JSON")
+
+    def handle(self, *args, **opts):
+        metricas = conciliacao.conciliar(
+            lote=opts["lote"],
+            workers=opts["workers"],
+            taxa_por_s=opts["taxa"],
+            limite=opts["limite"],
+            idade_min=opts["idade_min"],
+            reconsulta_min=opts["reconsulta_min"],
+            base_url=opts["base_url"],
+        )
+        if opts["json"]:
+            self.stdout.write(json.dumps(metricas))
+            return
+        self.stdout.write(
+            f"{metricas['consultados']} consultado(s) em {metricas['duracao_s']}s: "
+            f"{metricas['pagos']} pago(s), {metricas['expirados']} expirado(s), {metricas['falhos']} falho(s), "
+            f"{metricas['inalterados']} inalterado(s), {metricas['erros']} erro(s)."
+        )
@@ -0,0 +1,20 @@
+# pagamentos/management/commands/snapshot_carteiras.py
+"""
+Snapshot periódico dos saldos pelo ledger (e checagem contra Carteira.saldo), ex.:
+0 * * * * python manage.py snapshot_carteiras
+"""
+from django.core.management.base import BaseCommand
+
+from pagamentos.ledger import tirar_snapshots
+
+
+class Command(BaseCommand):
+    help = "Grava snapshots de saldo das carteiras movimentadas e aponta divergências com o ledger."
+
+    def handle(self, *args, **opts):
+        resultado = tirar_snapshots()
+        self.stdout.write(f"{resultado['snapshots']} snapshot(s) gravado(s).")
+        if resultado["divergentes"]:
+            self.stderr.write(self.style.ERROR(
+                f"Carteiras divergentes do ledger: {', '.join(map(str, resultado['divergentes']))}"
+            ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0005_webhookeventprocessed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSADO', 'Processado'), ('MORTO', 'Dead-letter')], default='PENDENTE', max_length=12)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='pagamentos__status_ae660d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from pagamentos.referencias import decompor_external_id
+
+
+def preencher_referencias(apps, schema_editor):
+    Payment = apps.get_model('pagamentos', 'Payment')
+    lote = []
+    for p in Payment.objects.exclude(external_id__isnull=True).only('id', 'external_id').iterator(chunk_size=1000):
+        p.ref_tipo, p.ref_objeto_id, p.ref_payment_id = decompor_external_id(p.external_id)
+        if p.ref_tipo:
+            lote.append(p)
+        if len(lote) >= 1000:
+            Payment.objects.bulk_update(lote, ['ref_tipo', 'ref_objeto_id', 'ref_payment_id'])
+            lote = []
+    if lote:
+        Payment.objects.bulk_update(lote, ['ref_tipo', 'ref_objeto_id', 'ref_payment_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0013_corridahistorico'),
+        ('pagamentos', '0006_webhookinbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendenciaConciliacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(db_index=True, max_length=255)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('abacate_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('external_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('amount_cents', models.PositiveIntegerField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=255)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('resolvida_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-criada_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='ref_objeto_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='ref_payment_id',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='ref_tipo',
+            field=models.CharField(blank=True, choices=[('corrida', 'Corrida'), ('carteira', 'Carteira')], max_length=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['ref_tipo', 'ref_objeto_id'], name='pagamentos__ref_tip_f73bc8_idx'),
+        ),
+        migrations.AddField(
+            model_name='pendenciaconciliacao',
+            name='payment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pendencias', to='pagamentos.payment'),
+        ),
+        migrations.RunPython(preencher_referencias, migrations.RunPython.noop),
+    ]
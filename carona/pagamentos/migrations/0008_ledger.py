@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def abrir_ledger(apps, schema_editor):
+    """Lançamento de abertura (AJUSTE) para cada carteira com saldo, mais o snapshot inicial."""
+    Carteira = apps.get_model('pagamentos', 'Carteira')
+    LedgerEntry = apps.get_model('pagamentos', 'LedgerEntry')
+    SaldoSnapshot = apps.get_model('pagamentos', 'SaldoSnapshot')
+
+    carteiras = list(Carteira.objects.exclude(saldo=0).values_list('id', 'saldo'))
+    if not carteiras:
+        return
+    LedgerEntry.objects.bulk_create(
+        [LedgerEntry(carteira_id=cid, tipo='AJUSTE', valor=saldo, descricao='Saldo de abertura do ledger')
+         for cid, saldo in carteiras],
+        batch_size=500,
+    )
+    ultimo = LedgerEntry.objects.order_by('-id').values_list('id', flat=True).first()
+    SaldoSnapshot.objects.bulk_create(
+        [SaldoSnapshot(carteira_id=cid, saldo=saldo, ultimo_lancamento_id=ultimo) for cid, saldo in carteiras],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0007_payment_referencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('DEPOSITO', 'Depósito'), ('SAQUE', 'Saque'), ('PAGAMENTO_CORRIDA', 'Pagamento de corrida'), ('REPASSE_CORRIDA', 'Repasse de corrida'), ('AJUSTE', 'Ajuste')], max_length=20)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descricao', models.CharField(blank=True, max_length=255)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('carteira', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lancamentos', to='pagamentos.carteira')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lancamentos', to='pagamentos.payment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['carteira', '-id'], name='pagamentos__carteir_d0e847_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('ultimo_lancamento_id', models.BigIntegerField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('carteira', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='pagamentos.carteira')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['carteira', '-ultimo_lancamento_id'], name='pagamentos__carteir_687c60_idx')],
+            },
+        ),
+        migrations.RunPython(abrir_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0008_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='conciliado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
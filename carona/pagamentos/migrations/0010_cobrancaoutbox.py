@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0009_payment_conciliado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobrancaOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descricao', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('FEITO', 'Feito'), ('MORTO', 'Dead-letter')], default='PENDENTE', max_length=12)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_cobranca', to='pagamentos.payment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa_em'], name='pagamentos__status_588648_idx')],
+            },
+        ),
+    ]
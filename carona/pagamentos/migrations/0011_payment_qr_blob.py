@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+def mover_qr_para_blobs(apps, schema_editor):
+    """Grava cada brCodeBase64 no blob store (pagamentos.qr) e guarda só o hash."""
+    from pagamentos import qr
+
+    Payment = apps.get_model('pagamentos', 'Payment')
+    pendentes = Payment.objects.exclude(brCodeBase64__isnull=True).exclude(brCodeBase64='').order_by('id')
+    ultimo = 0
+    # keyset em vez de iterator(): o SQLite não isola a leitura das escritas na mesma tabela
+    while lote := list(pendentes.filter(id__gt=ultimo).values_list('id', 'brCodeBase64')[:500]):
+        for payment_id, b64 in lote:
+            Payment.objects.filter(id=payment_id).update(qr_hash=qr.guardar_base64(b64))
+        ultimo = lote[-1][0]
+
+
+def restaurar_qr_da_coluna(apps, schema_editor):
+    from pagamentos import qr
+
+    Payment = apps.get_model('pagamentos', 'Payment')
+    for payment_id, qr_hash in list(Payment.objects.exclude(qr_hash__isnull=True).values_list('id', 'qr_hash')):
+        Payment.objects.filter(id=payment_id).update(brCodeBase64=qr.ler_base64(qr_hash))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0010_cobrancaoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='qr_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(mover_qr_para_blobs, restaurar_qr_da_coluna),
+        migrations.RemoveField(
+            model_name='payment',
+            name='brCodeBase64',
+        ),
+    ]
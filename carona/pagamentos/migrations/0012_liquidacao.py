@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0013_corridahistorico'),
+        ('pagamentos', '0011_payment_qr_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='tipo',
+            field=models.CharField(choices=[('DEPOSITO', 'Depósito'), ('SAQUE', 'Saque'), ('PAGAMENTO_CORRIDA', 'Pagamento de corrida'), ('REPASSE_CORRIDA', 'Repasse de corrida'), ('AJUSTE', 'Ajuste'), ('LIQUIDACAO', 'Liquidação de repasses')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Liquidacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo_inicio', models.DateTimeField()),
+                ('periodo_fim', models.DateTimeField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('valor_bruto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('retencao', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('valor_liquido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('lancamento', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='liquidacao', to='pagamentos.ledgerentry')),
+                ('motorista', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='liquidacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-periodo_fim', 'motorista_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Repasse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_bruto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('retencao', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valor_liquido', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('corrida', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='repasses', to='corrida.corrida')),
+                ('liquidacao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='repasses', to='pagamentos.liquidacao')),
+                ('motorista', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='repasses', to=settings.AUTH_USER_MODEL)),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='repasse', to='pagamentos.payment')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='liquidacao',
+            index=models.Index(fields=['motorista', '-periodo_fim'], name='pagamentos__motoris_64b90c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repasse',
+            index=models.Index(fields=['liquidacao', 'motorista', 'criado_em'], name='pagamentos__liquida_b7345e_idx'),
+        ),
+    ]
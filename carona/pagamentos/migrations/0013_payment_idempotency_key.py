@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0012_liquidacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+    ]
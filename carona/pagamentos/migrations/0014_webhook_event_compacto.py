@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:02
+
+import hashlib
+
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+
+
+def preencher_event_hash(apps, schema_editor):
+    WebhookEventProcessed = apps.get_model("pagamentos", "WebhookEventProcessed")
+    lote = []
+    for evento in WebhookEventProcessed.objects.only("id", "event_id").iterator(chunk_size=2000):
+        evento.event_hash = hashlib.sha256(str(evento.event_id).encode("utf-8")).hexdigest()[:32]
+        lote.append(evento)
+        if len(lote) >= 2000:
+            WebhookEventProcessed.objects.bulk_update(lote, ["event_hash"])
+            lote = []
+    if lote:
+        WebhookEventProcessed.objects.bulk_update(lote, ["event_hash"])
+
+
+def impedir_reversao_com_eventos(apps, schema_editor):
+    # event_id volta NOT NULL/unique e o valor original não existe mais
+    if apps.get_model("pagamentos", "WebhookEventProcessed").objects.exists():
+        raise IrreversibleError(
+            "0014 só desfaz com WebhookEventProcessed vazia: o event_id foi descartado, ficou só o hash."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0013_payment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookeventprocessed',
+            name='event_hash',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        # só ida: o event_id original não é guardado, o hash não volta a ele
+        migrations.RunPython(preencher_event_hash, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='webhookeventprocessed',
+            name='event_hash',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='webhookeventprocessed',
+            name='event_id',
+        ),
+        # na volta, roda antes de recriar event_id
+        migrations.RunPython(migrations.RunPython.noop, reverse_code=impedir_reversao_com_eventos),
+        migrations.CreateModel(
+            name='WebhookEventArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_hash', models.CharField(max_length=32, unique=True)),
+                ('processed_at', models.DateTimeField()),
+                ('payload_zlib', models.BinaryField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at'], name='pagamentos__process_10dbf8_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='webhookeventprocessed',
+            index=models.Index(fields=['processed_at'], name='pagamentos__process_582a44_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:26
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_expires_at(apps, schema_editor):
+    # cobranças em aberto criadas antes de expires_at ser gravado: validade padrão a partir da criação
+    Payment = apps.get_model("pagamentos", "Payment")
+    validade = timedelta(seconds=getattr(settings, "PAGAMENTOS_QR_VALIDADE_S", 3600))
+    Payment.objects.filter(
+        status__in=["PENDING", "CREATED"], expires_at__isnull=True
+    ).update(expires_at=models.F("created_at") + validade)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corrida', '0013_corridahistorico'),
+        ('pagamentos', '0014_webhook_event_compacto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='pagamentos__status_44aeb5_idx',
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'expires_at'], name='pagamentos__status_f149a0_idx'),
+        ),
+        migrations.RunPython(preencher_expires_at, migrations.RunPython.noop),
+    ]
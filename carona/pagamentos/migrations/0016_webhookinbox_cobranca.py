@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+def preencher_cobranca(apps, schema_editor):
+    # só os pendentes: os já aplicados não entram mais na ordenação
+    from pagamentos.webhook import chave_cobranca
+
+    WebhookInbox = apps.get_model("pagamentos", "WebhookInbox")
+    lote = []
+    for evento in WebhookInbox.objects.filter(status="PENDENTE").only("id", "payload").iterator(chunk_size=500):
+        evento.cobranca = chave_cobranca(evento.payload)
+        lote.append(evento)
+    WebhookInbox.objects.bulk_update(lote, ["cobranca"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagamentos', '0015_payment_status_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookinbox',
+            name='cobranca',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='webhookinbox',
+            index=models.Index(fields=['cobranca', 'status', 'id'], name='pagamentos__cobranc_68aed3_idx'),
+        ),
+        migrations.RunPython(preencher_cobranca, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,30 @@
+from decimal import Decimal
+
 from django.db import models
 from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
 from corrida.models import Corrida
 
+from . import qr
+from .referencias import REF_CARTEIRA, REF_CORRIDA, decompor_external_id
+
+# colunas grandes que as listagens não usam: adiadas no manager padrão
+CAMPOS_PESADOS = ("payload", "brCode")
+
+
+class PaymentQuerySet(models.QuerySet):
+    def com_conteudo(self):
+        """Carrega também payload/brCode (adiados por padrão)."""
+        # defer(None) limpa os campos adiados pelo manager
+        return self.defer(None)
+
+
+class PaymentManager(models.Manager.from_queryset(PaymentQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer(*CAMPOS_PESADOS)
+
+
 class Payment(models.Model):
     STATUS_PENDING = "PENDING"
     STATUS_CREATED = "CREATED"
@@ -34,10 +56,19 @@ class Payment(models.Model):
 
     abacate_id = models.CharField(max_length=128, null=True, blank=True, db_index=True)
     external_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    # dedupe da criação (header Idempotency-Key ou chave derivada); ver pagamentos.idempotencia
+    idempotency_key = models.CharField(max_length=128, null=True, blank=True, unique=True)
+
+    # external_id decomposto (pagamentos.referencias), preenchido no save()
+    REF_CHOICES = [(REF_CORRIDA, "Corrida"), (REF_CARTEIRA, "Carteira")]
+    ref_tipo = models.CharField(max_length=10, choices=REF_CHOICES, null=True, blank=True)
+    ref_objeto_id = models.PositiveIntegerField(null=True, blank=True)
+    ref_payment_id = models.PositiveIntegerField(null=True, blank=True, db_index=True)
     billing_url = models.URLField(null=True, blank=True)
 
     brCode = models.TextField(null=True, blank=True)
-    brCodeBase64 = models.TextField(null=True, blank=True)
+    # sha256 do PNG do QR no blob store (pagamentos.qr); ver a property brCodeBase64
+    qr_hash = models.CharField(max_length=64, null=True, blank=True)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     payment_method = models.CharField(max_length=32, null=True, blank=True)
@@ -47,22 +78,54 @@ class Payment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     paid_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # última consulta de status na AbacatePay feita pela conciliação (pagamentos.conciliacao)
+    conciliado_em = models.DateTimeField(null=True, blank=True)
+
+    objects = PaymentManager()
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["abacate_id"]),
             models.Index(fields=["external_id"]),
-            models.Index(fields=["status"]),
+            # varredura de expiração (pagamentos.expiracao); serve também aos filtros só por status
+            models.Index(fields=["status", "expires_at"]),
+            models.Index(fields=["ref_tipo", "ref_objeto_id"]),
         ]
 
+    @property
+    def brCodeBase64(self):
+        """PNG do QR em base64, lido do blob store só quando acessado."""
+        return qr.ler_base64(self.qr_hash) if self.qr_hash else None
+
+    @brCodeBase64.setter
+    def brCodeBase64(self, valor):
+        self.qr_hash = qr.guardar_base64(valor) if valor else None
+
+    @property
+    def qr_url(self):
+        return reverse("pagamentos:qr", args=[self.qr_hash]) if self.qr_hash else None
+
+    def save(self, *args, **kwargs):
+        self.ref_tipo, self.ref_objeto_id, self.ref_payment_id = decompor_external_id(self.external_id)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "external_id" in update_fields:
+                update_fields |= {"ref_tipo", "ref_objeto_id", "ref_payment_id"}
+            # brCodeBase64 não é mais coluna: quem o atribuiu grava qr_hash
+            if "brCodeBase64" in update_fields:
+                update_fields = (update_fields - {"brCodeBase64"}) | {"qr_hash"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
     def amount_display(self) -> str:
         try:
             return f"R$ {self.amount_cents/100:.2f}"
         except Exception:
             return f"{self.amount_cents} (cents)"
 
-    def mark_paid(self, when=None, carteira_motorista=None, taxa_percentual: float = 0.0):
+    def mark_paid(self, when=None):
         if when is None:
             when = timezone.now()
         self.status = self.STATUS_PAID
@@ -70,42 +133,289 @@ class Payment(models.Model):
             self.paid_at = when
         self.save(update_fields=["status", "paid_at", "updated_at"])
 
-        if self.payment_type == self.PAYMENT_TYPE_CORRIDA and self.corrida and carteira_motorista:
-            valor_total = self.amount_cents / 100
-            taxa = valor_total * taxa_percentual / 100
-            repasse = valor_total - taxa
-            carteira_motorista.depositar(repasse)
+        if self.payment_type == self.PAYMENT_TYPE_CORRIDA and self.corrida_id:
+            # o motorista não é creditado aqui: o repasse é provisionado e entra na liquidação do período
+            from .liquidacao import provisionar_repasse
+            provisionar_repasse(self)
 
 
 class Carteira(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    saldo = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    saldo = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def depositar(self, valor: float):
-        self.saldo += valor
-        self.save(update_fields=["saldo", "updated_at"])
+    def depositar(self, valor, tipo=None, payment=None, descricao=""):
+        # UPDATE com F() + lançamento no ledger, na mesma transação — ver ledger.py
+        from .ledger import Movimento, registrar_lancamentos
+        registrar_lancamentos([Movimento(
+            user_id=self.user_id,
+            valor=valor,
+            tipo=tipo or LedgerEntry.TIPO_DEPOSITO,
+            payment_id=getattr(payment, "pk", None),
+            descricao=descricao,
+        )])
+        self.refresh_from_db(fields=["saldo", "updated_at"])
 
-    def retirar(self, valor: float):
-        if valor > self.saldo:
-            raise ValueError("Saldo insuficiente")
-        self.saldo -= valor
-        self.save(update_fields=["saldo", "updated_at"])
+    def retirar(self, valor, tipo=None, payment=None, descricao=""):
+        # débito condicional (saldo >= valor); levanta SaldoInsuficiente (ValueError)
+        from .ledger import Movimento, registrar_lancamentos
+        registrar_lancamentos([Movimento(
+            user_id=self.user_id,
+            valor=-Decimal(str(valor)),
+            tipo=tipo or LedgerEntry.TIPO_SAQUE,
+            payment_id=getattr(payment, "pk", None),
+            descricao=descricao,
+        )])
+        self.refresh_from_db(fields=["saldo", "updated_at"])
 
     def __str__(self):
         return f"{self.user.nome} - R${self.saldo:.2f}"
 
 
+class LedgerEntry(models.Model):
+    """
+    Lançamento da carteira (append-only). `valor` é assinado: crédito > 0,
+    débito < 0. Carteira.saldo é o acumulado, mantido na mesma transação.
+    """
+    TIPO_DEPOSITO = "DEPOSITO"
+    TIPO_SAQUE = "SAQUE"
+    TIPO_PAGAMENTO_CORRIDA = "PAGAMENTO_CORRIDA"
+    TIPO_REPASSE_CORRIDA = "REPASSE_CORRIDA"
+    TIPO_AJUSTE = "AJUSTE"
+    TIPO_LIQUIDACAO = "LIQUIDACAO"
+
+    TIPO_CHOICES = [
+        (TIPO_DEPOSITO, "Depósito"),
+        (TIPO_SAQUE, "Saque"),
+        (TIPO_PAGAMENTO_CORRIDA, "Pagamento de corrida"),
+        (TIPO_REPASSE_CORRIDA, "Repasse de corrida"),
+        (TIPO_AJUSTE, "Ajuste"),
+        (TIPO_LIQUIDACAO, "Liquidação de repasses"),
+    ]
+
+    # PROTECT de propósito: o extrato não some com o usuário. Excluir um usuário
+    # com lançamentos levanta ProtectedError; no admin, a saída é desativá-lo.
+    carteira = models.ForeignKey(Carteira, on_delete=models.PROTECT, related_name="lancamentos")
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name="lancamentos")
+    descricao = models.CharField(max_length=255, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["carteira", "-id"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("LedgerEntry é append-only: lançamentos não podem ser alterados.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("LedgerEntry é append-only: lançamentos não podem ser apagados.")
+
+    def __str__(self):
+        return f"{self.carteira_id} {self.tipo} {self.valor}"
+
+
+class SaldoSnapshot(models.Model):
+    """
+    Saldo da carteira apurado pelo ledger até `ultimo_lancamento_id` (inclusive).
+    Saldo pelo ledger = último snapshot + soma dos lançamentos posteriores.
+    """
+    carteira = models.ForeignKey(Carteira, on_delete=models.CASCADE, related_name="snapshots")
+    saldo = models.DecimalField(max_digits=12, decimal_places=2)
+    ultimo_lancamento_id = models.BigIntegerField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["carteira", "-ultimo_lancamento_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.carteira_id} R${self.saldo} até #{self.ultimo_lancamento_id}"
+
+
 class WebhookEventProcessed(models.Model):
     """
-    Registro de eventos processados para idempotência.
-    event_id: top-level "id" do payload do AbacatePay.
+    Registro compacto de eventos processados, para idempotência
+    (pagamentos.eventos_processados). event_hash: sha256 truncado (128 bits, hex)
+    do top-level "id" do payload do AbacatePay. O payload fica aqui só nos
+    primeiros dias; depois vai comprimido para WebhookEventArquivo.
     """
-    event_id = models.CharField(max_length=255, unique=True, db_index=True)
+    event_hash = models.CharField(max_length=32, unique=True)
     event_type = models.CharField(max_length=100, blank=True)
     payload = models.JSONField(null=True, blank=True)  # funciona com SQLite no Django moderno
     processed_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_hash})"
+
+
+class WebhookEventArquivo(models.Model):
+    """Payload de evento processado já fora da janela quente, JSON comprimido com zlib."""
+    event_hash = models.CharField(max_length=32, unique=True)
+    processed_at = models.DateTimeField()
+    payload_zlib = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at"]),
+        ]
+
+    def __str__(self):
+        return f"Arquivo {self.event_hash}"
+
+
+class WebhookInbox(models.Model):
+    """
+    Caixa de entrada durável dos webhooks: o evento bruto é gravado aqui pela
+    view e processado depois por pagamentos.webhook.processar_inbox.
+    """
+    STATUS_PENDENTE = "PENDENTE"
+    STATUS_PROCESSADO = "PROCESSADO"
+    STATUS_MORTO = "MORTO"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_PROCESSADO, "Processado"),
+        (STATUS_MORTO, "Dead-letter"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    # cobrança a que o evento se refere (id da AbacatePay ou externalId): eventos
+    # da mesma cobrança são aplicados em ordem de chegada
+    cobranca = models.CharField(max_length=255, blank=True, default="")
+    payload = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    recebido_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa_em"]),
+            models.Index(fields=["cobranca", "status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id}) - {self.status}"
+
+
+class CobrancaOutbox(models.Model):
+    """
+    Outbox da criação de cobranças PIX: gravada na mesma transação que cria o
+    Payment (ex.: Corrida.iniciar) e processada depois do commit, fora de
+    qualquer lock, por pagamentos.cobrancas.processar_outbox.
+    """
+    STATUS_PENDENTE = "PENDENTE"
+    STATUS_FEITO = "FEITO"
+    STATUS_MORTO = "MORTO"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_FEITO, "Feito"),
+        (STATUS_MORTO, "Dead-letter"),
+    ]
+
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name="outbox_cobranca")
+    descricao = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa_em = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa_em"]),
+        ]
+
+    def __str__(self):
+        return f"Cobrança do payment {self.payment_id} - {self.status}"
+
+
+class PendenciaConciliacao(models.Model):
+    """
+    Evento de pagamento do webhook que não casou com nenhum Payment pelas chaves
+    determinísticas (abacate_id, external_id, referência decomposta). Fica aqui
+    para conciliação manual em vez de o webhook varrer a tabela.
+    """
+    event_id = models.CharField(max_length=255, db_index=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    abacate_id = models.CharField(max_length=128, null=True, blank=True)
+    external_id = models.CharField(max_length=255, null=True, blank=True)
+    amount_cents = models.PositiveIntegerField(null=True, blank=True)
+    motivo = models.CharField(max_length=255, blank=True)
+    payload = models.JSONField(null=True, blank=True)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name="pendencias")
+    criada_em = models.DateTimeField(auto_now_add=True)
+    resolvida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-criada_em"]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.external_id or self.abacate_id})"
+
+
+class Liquidacao(models.Model):
+    """
+    Liquidação dos repasses de um motorista num período: um único crédito na
+    carteira (`lancamento`) com a soma dos Repasse do período. Serve também de
+    relatório (totais bruto/retenção/líquido). Ver pagamentos.liquidacao.
+    """
+    motorista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="liquidacoes")
+    periodo_inicio = models.DateTimeField()
+    periodo_fim = models.DateTimeField()
+    quantidade = models.PositiveIntegerField(default=0)
+    valor_bruto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    retencao = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    valor_liquido = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    lancamento = models.OneToOneField(LedgerEntry, on_delete=models.PROTECT, null=True, blank=True, related_name="liquidacao")
+    criada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-periodo_fim", "motorista_id"]
+        indexes = [
+            models.Index(fields=["motorista", "-periodo_fim"]),
+        ]
+
+    def __str__(self):
+        return f"{self.motorista_id} {self.periodo_inicio:%Y-%m-%d} R${self.valor_liquido}"
+
+
+class Repasse(models.Model):
+    """
+    Ganho do motorista com um pagamento de corrida, provisionado quando o
+    pagamento é confirmado (retenção já calculada) e creditado depois, em lote,
+    pela Liquidacao do período. liquidacao nula = ainda a liquidar.
+    """
+    payment = models.OneToOneField(Payment, on_delete=models.PROTECT, related_name="repasse")
+    motorista = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="repasses")
+    corrida = models.ForeignKey(Corrida, on_delete=models.SET_NULL, null=True, blank=True, related_name="repasses")
+    valor_bruto = models.DecimalField(max_digits=10, decimal_places=2)
+    retencao = models.DecimalField(max_digits=10, decimal_places=2)
+    valor_liquido = models.DecimalField(max_digits=10, decimal_places=2)
+    criado_em = models.DateTimeField(default=timezone.now)
+    liquidacao = models.ForeignKey(Liquidacao, on_delete=models.PROTECT, null=True, blank=True, related_name="repasses")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["liquidacao", "motorista", "criado_em"]),
+        ]
+
     def __str__(self):
-        return f"{self.event_type} ({self.event_id})"
+        return f"Repasse payment {self.payment_id} -> {self.motorista_id} R${self.valor_liquido}"
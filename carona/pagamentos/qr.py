@@ -0,0 +1,74 @@
+# pagamentos/qr.py
+"""
+Blob store dos QR Codes PIX (PNG), endereçado por conteúdo.
+
+O PNG sai da linha do Payment (antes em brCodeBase64) e fica em
+PAGAMENTOS_QR_DIR/<2 primeiros hex>/<sha256>.png; o Payment guarda só o hash
+(qr_hash). Conteúdo igual => mesmo arquivo, e um arquivo nunca muda, o que
+permite servir a imagem com cache HTTP longo (views.qr_imagem).
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional
+
+from django.conf import settings
+
+QR_DIR = getattr(settings, "PAGAMENTOS_QR_DIR", os.path.join(settings.BASE_DIR, "media", "qr"))
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_PREFIXO_DATA_URI = re.compile(r"^data:image/[a-z]+;base64,", re.IGNORECASE)
+
+
+def hash_valido(qr_hash: str) -> bool:
+    return bool(qr_hash and _HASH_RE.match(qr_hash))
+
+
+def caminho(qr_hash: str) -> str:
+    return os.path.join(QR_DIR, qr_hash[:2], f"{qr_hash}.png")
+
+
+def guardar_png(dados: bytes) -> str:
+    """Grava o PNG (se ainda não existir) e retorna o sha256 dele."""
+    qr_hash = hashlib.sha256(dados).hexdigest()
+    destino = caminho(qr_hash)
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # escrita atômica: arquivo temporário no mesmo diretório + rename
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(destino), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dados)
+            os.replace(tmp, destino)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    return qr_hash
+
+
+def guardar_base64(valor: str) -> Optional[str]:
+    """Aceita base64 puro ou data URI. Retorna o hash, ou None se o valor não decodifica."""
+    try:
+        dados = base64.b64decode(_PREFIXO_DATA_URI.sub("", valor.strip()))
+    except (binascii.Error, ValueError):
+        return None
+    return guardar_png(dados) if dados else None
+
+
+def ler_png(qr_hash: str) -> Optional[bytes]:
+    if not hash_valido(qr_hash):
+        return None
+    try:
+        with open(caminho(qr_hash), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def ler_base64(qr_hash: str) -> Optional[str]:
+    dados = ler_png(qr_hash)
+    return base64.b64encode(dados).decode("ascii") if dados is not None else None
@@ -0,0 +1,50 @@
+# pagamentos/referencias.py
+"""
+Decomposição dos external_id que geramos em chaves estruturadas.
+
+Formatos conhecidos:
+    corrida-{corrida_id}-payment-{payment_id}
+    corrida-{corrida_id}-carteira
+    corrida-{corrida_id}
+    carteira-{user_id}-deposito-{payment_id}-{hex}   (refresh de QR)
+    carteira-{user_id}-deposito-{hex}
+    carteira-{user_id}-{payment_id}-{hex}            (formato antigo)
+
+Usado pelo Payment.save() (colunas ref_*), pela migração de backfill e pelo
+webhook, que resolve o Payment por essas chaves em vez de LIKE em external_id.
+Deve continuar sendo uma função pura (a migração importa este módulo).
+"""
+import re
+from typing import NamedTuple, Optional
+
+REF_CORRIDA = "corrida"
+REF_CARTEIRA = "carteira"
+
+_FIM = r"(?![0-9A-Za-z])"
+
+# do mais específico para o mais genérico; a busca aceita prefixo/sufixo em volta
+_PADROES = [
+    (re.compile(r"corrida-(\d+)-payment-(\d+)" + _FIM), REF_CORRIDA, True),
+    (re.compile(r"carteira-(\d+)-deposito-(\d+)-[0-9a-f]+" + _FIM), REF_CARTEIRA, True),
+    (re.compile(r"carteira-(\d+)-(\d+)-[0-9a-f]+" + _FIM), REF_CARTEIRA, True),
+    (re.compile(r"carteira-(\d+)-deposito-[0-9a-f]+" + _FIM), REF_CARTEIRA, False),
+    (re.compile(r"corrida-(\d+)(?:-carteira)?" + _FIM), REF_CORRIDA, False),
+]
+
+
+class Referencia(NamedTuple):
+    tipo: Optional[str] = None
+    objeto_id: Optional[int] = None
+    payment_id: Optional[int] = None
+
+
+def decompor_external_id(external_id) -> Referencia:
+    """Extrai (tipo, objeto_id, payment_id) de um external_id; campos None se não reconhecido."""
+    if not external_id:
+        return Referencia()
+    texto = str(external_id)
+    for padrao, tipo, tem_payment in _PADROES:
+        m = padrao.search(texto)
+        if m:
+            return Referencia(tipo, int(m.group(1)), int(m.group(2)) if tem_payment else None)
+    return Referencia()
@@ -11,11 +11,12 @@ Objetivos:
 """
 from __future__ import annotations
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import time
 import json
 from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from django.conf import settings
 from pagamentos.models import Payment, Carteira
 
@@ -49,8 +50,8 @@ def _build_headers() -> Dict[str, str]:
     return headers
 
 
-def _full_url(path: str) -> str:
-    base = getattr(settings, "ABACATEPAY_BASE_URL", "").rstrip("/")
+def _full_url(path: str, base_url: Optional[str] = None) -> str:
+    base = (base_url or getattr(settings, "ABACATEPAY_BASE_URL", "")).rstrip("/")
     path_norm = path.lstrip("/")
     if base.endswith("/v1") and path_norm.startswith("v1/"):
         path_norm = path_norm[len("v1/"):]
@@ -86,27 +87,36 @@ def _post_with_retries(
 
 
 def _parse_expires_at(value: Any) -> Optional[datetime]:
+    """expiresAt da AbacatePay (ISO 8601 ou epoch) como datetime aware; sem fuso, assume UTC."""
     if not value:
         return None
     if isinstance(value, (int, float)):
         try:
-            return datetime.fromtimestamp(int(value))
+            return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
         except Exception:
             return None
     if isinstance(value, str):
         iso = value.strip()
         if iso.endswith("Z"):
-            iso = iso[:-1]
+            iso = iso[:-1] + "+00:00"
         try:
-            return datetime.fromisoformat(iso)
+            parsed = datetime.fromisoformat(iso)
         except Exception:
             try:
-                return datetime.strptime(iso.split(".")[0], "%Y-%m-%dT%H:%M:%S")
+                parsed = datetime.strptime(iso.split(".")[0], "%Y-%m-%dT%H:%M:%S")
             except Exception:
                 return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
     return None
 
 
+def expires_at_da_cobranca(data: Optional[Dict[str, Any]]) -> Optional[datetime]:
+    """Validade da cobrança a partir do `data` da resposta (expiresAt / expires_at)."""
+    if not isinstance(data, dict):
+        return None
+    return _parse_expires_at(data.get("expiresAt") or data.get("expires_at"))
+
+
 def _normalize_body(resp_body: Any) -> Dict[str, Any]:
     if isinstance(resp_body, dict):
         body = resp_body
@@ -130,11 +140,13 @@ def criar_pix_qr(
     completion_url: Optional[str] = None,
     allow_coupons: bool = False,
     coupons: Optional[list] = None,
-    dev_mode: bool = True  # ativa modo teste
+    dev_mode: bool = True,  # ativa modo teste
+    session: Optional[requests.Session] = None,
 ) -> Dict[str, Any]:
     """
     Cria uma cobrança PIX na AbacatePay usando o endpoint v1/billing/create.
     Retorna dicionário com dados da cobrança, incluindo `billing_url`.
+    `session` permite reaproveitar conexões ao criar cobranças em lote.
     """
     base_url = getattr(settings, "ABACATEPAY_BASE_URL", "").rstrip("/")
     url = f"{base_url}/billing/create"
@@ -168,7 +180,7 @@ def criar_pix_qr(
     }
 
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        resp = (session or requests).post(url, json=payload, headers=headers, timeout=10)
         resp.raise_for_status()
         data = resp.json().get("data", {})
 
@@ -192,47 +204,22 @@ def criar_pix_qr(
         }
 
 
-def create_payment_for_corrida(corrida):
-    """
-    Cria um Payment para a corrida, gera QR PIX via AbacatePay
-    e atualiza os campos billing_url, brCode e brCodeBase64.
-    """
-    if not corrida:
-        return None
+def nova_sessao(conexoes: int) -> requests.Session:
+    """Session com pool de `conexoes` conexões keep-alive, para chamadas em paralelo."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    amount_cents = int(corrida.valor_total * 100)
-    description = f"Pagamento corrida #{corrida.id}"
-    external_id = f"corrida-{corrida.id}"
-    return_url = f"https://SEU-DOMINIO/pagamentos/retorno/{corrida.id}/"
-    completion_url = f"https://SEU-DOMINIO/pagamentos/concluido/{corrida.id}/"
-
-    payment = Payment.objects.create(
-        corrida=corrida,
-        amount=amount_cents,
-        status="PENDING",
-    )
-
-    result_qr = criar_pix_qr(
-        amount_cents=amount_cents,
-        description=description,
-        external_id=external_id,
-        return_url=return_url,
-        completion_url=completion_url,
-    )
-
-    data = result_qr.get("data") or {}
-    payment.billing_url = data.get("billing_url") or data.get("url")
-    payment.brCode = data.get("brCode")
-    payment.brCodeBase64 = data.get("brCodeBase64")
-    payment.status = "CREATED" if payment.billing_url else "FAILED"
-    payment.save()
-
-    return {"payment": payment, "data": data}
-
-
-def obter_charge(abacate_id: str) -> Dict[str, Any]:
+
+def obter_charge(
+    abacate_id: str, session: Optional[requests.Session] = None, base_url: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Consulta uma cobrança já existente na AbacatePay pelo id.
+    `session` permite reaproveitar conexões (keep-alive) em consultas em lote;
+    `base_url` sobrescreve ABACATEPAY_BASE_URL (ex.: um stand-in local da API).
     """
     if not abacate_id:
         return {"ok": False, "status_code": 0, "body": None, "data": None, "error": "missing abacate_id"}
@@ -249,9 +236,9 @@ def obter_charge(abacate_id: str) -> Dict[str, Any]:
 
     last_error = None
     for path in candidate_paths:
-        url = _full_url(path)
+        url = _full_url(path, base_url)
         try:
-            resp = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+            resp = (session or requests).get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
             status = resp.status_code
             try:
                 body = resp.json()
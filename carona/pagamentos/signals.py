@@ -0,0 +1,42 @@
+# pagamentos/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from corrida.models import SolicitacaoCarona
+from notificacao import eventos
+
+from . import status_cache
+from .models import Payment
+
+
+def interessados(payment) -> set:
+    """
+    Usuários que acompanham o pagamento: o dono e o motorista da corrida. Cada
+    passageiro tem o seu Payment; só o Payment antigo, único por corrida e sem
+    user, é compartilhado pelos passageiros aceitos.
+    """
+    ids = {payment.user_id}
+    if payment.corrida_id:
+        if payment.user_id is None:
+            ids.update(
+                SolicitacaoCarona.objects.filter(
+                    corrida_id=payment.corrida_id, status=SolicitacaoCarona.STATUS_ACEITA
+                ).values_list("passageiro_id", flat=True)
+            )
+        ids.add(payment.corrida.motorista_id)
+    ids.discard(None)
+    return ids
+
+
+@receiver(post_save, sender=Payment)
+def publicar_status_pagamento(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "status" not in update_fields:
+        return
+    status_cache.sinalizar([instance.id])
+    if not eventos.ha_assinantes():
+        return
+    eventos.publicar(
+        interessados(instance),
+        "pagamento",
+        {"id": instance.id, "corrida_id": instance.corrida_id, "status": instance.status},
+    )
@@ -2,6 +2,16 @@ document.addEventListener("DOMContentLoaded", function () {
   const form = document.getElementById("adicionar-saldo-form");
   if (!form) return;
 
+  // uma chave por intenção de depósito: retry/duplo clique reaproveitam a mesma cobrança
+  function novaChave() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2);
+  }
+  let chaveIdempotencia = novaChave();
+  form.querySelector("input[name='valor']").addEventListener("input", function () {
+    chaveIdempotencia = novaChave();
+  });
+
   form.addEventListener("submit", async function (e) {
     e.preventDefault();
 
@@ -25,7 +35,8 @@ document.addEventListener("DOMContentLoaded", function () {
         method: "POST",
         headers: {
           "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]").value,
-          "Accept": "application/json"
+          "Accept": "application/json",
+          "Idempotency-Key": chaveIdempotencia
         },
         body: new URLSearchParams({ valor: valorInput.value })
       });
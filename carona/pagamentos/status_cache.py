@@ -0,0 +1,43 @@
+# pagamentos/status_cache.py
+"""
+Versão do status de cada Payment no cache, para o long-poll (views.aguardar_status).
+
+Toda mudança de status (post_save em signals.py e o bulk_update da conciliação)
+chama `sinalizar`, que troca a versão no cache depois do commit. O long-poll
+consulta só essa chave enquanto espera e relê o banco quando ela muda.
+
+Com o cache padrão (LocMem) o aviso só vale dentro do processo; para acordar
+clientes a partir dos workers (webhook/conciliação) configure um cache
+compartilhado (Redis, Memcached ou DatabaseCache) — sem isso o long-poll ainda
+funciona, relendo o banco a cada CHECAGEM_DB_S.
+"""
+import time
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def _chave(payment_id) -> str:
+    return f"pag:status:v:{payment_id}"
+
+
+def etag(payment_id, status) -> str:
+    return f'"{payment_id}-{status}"'
+
+
+def sinalizar(payment_ids: Iterable[int]) -> None:
+    """Troca a versão dos pagamentos depois do commit (acorda quem espera no long-poll)."""
+    ids = [pid for pid in payment_ids if pid]
+    if not ids:
+        return
+    transaction.on_commit(
+        lambda: cache.set_many({_chave(pid): time.time_ns() for pid in ids}, CACHE_TIMEOUT),
+        robust=True,
+    )
+
+
+async def aversao(payment_id):
+    return await cache.aget(_chave(payment_id))
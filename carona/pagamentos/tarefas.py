@@ -0,0 +1,46 @@
+# pagamentos/tarefas.py
+"""
+Tarefas da fila (app fila) do módulo de pagamentos. Cada job processa uma
+entrada das outboxes já existentes; se ela falhar, a própria entrada guarda o
+backoff e o job é reagendado para a próxima tentativa dela. Os comandos
+processar_webhooks / processar_cobrancas continuam valendo como varredura.
+"""
+from itertools import groupby
+
+from fila.services import enfileirar
+from fila.tarefas import tarefa
+
+from .cobrancas import processar_entrada, processar_entradas
+from .models import CobrancaOutbox, WebhookInbox
+from .webhook import processar_da_inbox
+
+
+@tarefa("pagamentos.processar_webhook")
+def processar_webhook(evento_id):
+    if processar_da_inbox(evento_id) == WebhookInbox.STATUS_PENDENTE:
+        proxima = WebhookInbox.objects.values_list("proxima_tentativa_em", flat=True).get(id=evento_id)
+        enfileirar("pagamentos.processar_webhook", {"evento_id": evento_id}, executar_apos=proxima)
+
+
+@tarefa("pagamentos.criar_cobranca")
+def criar_cobranca(entrada_id):
+    if processar_entrada(entrada_id) == CobrancaOutbox.STATUS_PENDENTE:
+        proxima = CobrancaOutbox.objects.values_list("proxima_tentativa_em", flat=True).get(id=entrada_id)
+        enfileirar("pagamentos.criar_cobranca", {"entrada_id": entrada_id}, executar_apos=proxima)
+
+
+@tarefa("pagamentos.criar_cobrancas")
+def criar_cobrancas(entrada_ids):
+    resultado = processar_entradas(entrada_ids)
+    pendentes = [entrada_id for entrada_id, status in resultado.items() if status == CobrancaOutbox.STATUS_PENDENTE]
+    if not pendentes:
+        return
+    # reagenda as que falharam, agrupadas pela próxima tentativa de cada uma
+    proximas = (
+        CobrancaOutbox.objects.filter(id__in=pendentes)
+        .order_by("proxima_tentativa_em", "id")
+        .values_list("proxima_tentativa_em", "id")
+    )
+    for proxima, grupo in groupby(proximas, key=lambda linha: linha[0]):
+        enfileirar("pagamentos.criar_cobrancas", {"entrada_ids": [entrada_id for _, entrada_id in grupo]},
+                   executar_apos=proxima)
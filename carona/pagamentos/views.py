@@ -1,30 +1,39 @@
 # pagamentos/views.py
+import asyncio
 import re
 import json
 import hmac
-import hashlib
 import logging
 import time
 import uuid
-
-import base64
+from datetime import timedelta
 
 from decimal import Decimal, InvalidOperation
 from django.contrib import messages
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET, require_POST
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 
 from decimal import Decimal
-from .services import create_payment_for_corrida
-from .models import Payment, Carteira, WebhookEventProcessed
+from .models import Payment, Carteira, LedgerEntry, WebhookInbox
+from .ledger import Movimento, SaldoInsuficiente, registrar_lancamentos
+from .liquidacao import PORCENTAGEM_RETENCAO, a_liquidar_do_motorista, calcular_retencao, provisionar_repasse
+from . import qr, status_cache
+from .cobrancas import registrar_cobranca
+from .expiracao import STATUS_ABERTOS, status_efetivo, validade, vencido
+from .idempotencia import chave, chave_corrida_pix, chave_do_cliente, qr_valido
+from .signals import interessados
+from .webhook import assinatura_webhook, chave_cobranca
+from fila.services import enfileirar
 from corrida.models import Corrida
 from pagamentos.services import criar_pix_carteira
 import os
@@ -45,45 +54,6 @@ def _get_webhook_secret():
     return getattr(settings, "ABACATEPAY_WEBHOOK_SECRET", None)
 
 
-def _find_in_payload(obj, keys):
-    """
-    Busca recursiva em dict/list por chaves em `keys` (lista de strings).
-    Retorna tuple (value, path_list) com o primeiro match encontrado, ou (None, None).
-    Normaliza comparações ignorando case e '_' (external_id == externalId).
-    """
-    normalized_keys = set(k.lower().replace("_", "") for k in keys)
-
-    def norm(k):
-        return str(k).lower().replace("_", "")
-
-    visited = set()
-
-    def _walk(o, path):
-        oid = id(o)
-        if oid in visited:
-            return None, None
-        visited.add(oid)
-
-        if isinstance(o, dict):
-            # check direct keys first
-            for k, v in o.items():
-                if norm(k) in normalized_keys:
-                    return v, path + [k]
-            # then recurse
-            for k, v in o.items():
-                val, p = _walk(v, path + [k])
-                if val is not None:
-                    return val, p
-        elif isinstance(o, (list, tuple)):
-            for idx, item in enumerate(o):
-                val, p = _walk(item, path + [f"[{idx}]"])
-                if val is not None:
-                    return val, p
-        return None, None
-
-    return _walk(obj, [])
-
-
 @csrf_exempt
 def abacatepay_webhook(request):
     if request.method != "POST":
@@ -115,11 +85,8 @@ def abacatepay_webhook(request):
         logger.warning("Header de assinatura ausente")
         return JsonResponse({"status": "missing-signature"}, status=401)
 
-    pubkey = getattr(settings, "ABACATEPAY_PUBLIC_KEY", None)
-    key_bytes = (pubkey or webhook_secret).encode("utf-8")
-
     try:
-        expected_sig = base64.b64encode(hmac.new(key_bytes, raw_body, hashlib.sha256).digest()).decode()
+        expected_sig = assinatura_webhook(raw_body)
     except Exception as exc:
         logger.exception("Erro ao calcular assinatura esperada: %s", exc)
         return JsonResponse({"status": "server-error"}, status=500)
@@ -143,191 +110,72 @@ def abacatepay_webhook(request):
         logger.warning("Evento sem id (ignorado): %s", data)
         return JsonResponse({"status": "missing-event-id"}, status=400)
 
-    # idempotência
-    if WebhookEventProcessed.objects.filter(event_id=event_id).exists():
-        logger.info("Evento %s já processado, ignorando", event_id)
-        return JsonResponse({"status": "already_processed"}, status=200)
-
+    # só grava na inbox; o processamento é do worker (pagamentos.webhook.processar_inbox).
+    # event_id é único: reentrega do provedor é apenas confirmada.
     try:
         with transaction.atomic():
-            logger.debug("Processando evento webhook id=%s tipo=%s payload_keys=%s", event_id, event_type, list(payload.keys()) if isinstance(payload, dict) else None)
-
-            # detectar billing.paid (aceita variações como 'paid' no tipo)
-            if event_type == "billing.paid" or (isinstance(event_type, str) and "paid" in event_type.lower()):
-                # procurar external_id e abacate_id/ids aninhados
-                ext_value, ext_path = _find_in_payload(payload, ["external_id", "externalId", "externalid"])
-                abacate_value, abacate_path = _find_in_payload(payload, ["id", "bill_id", "billing_id", "billingid", "payment_id", "paymentid"])
-
-                logger.info("Webhook search results: external_id=%s (path=%s) abacate_id=%s (path=%s)",
-                            ext_value, "->".join(ext_path) if ext_path else None,
-                            abacate_value, "->".join(abacate_path) if abacate_path else None)
-
-                # buscar amount (em centavos)
-                amount_cents = None
-                # tentar locais comuns
-                for kloc in ("amount", "amount_cents", "value", "price"):
-                    v = None
-                    # checar payment/billing blocks se existirem
-                    if isinstance(payload, dict):
-                        if "payment" in payload and isinstance(payload["payment"], dict):
-                            v = payload["payment"].get(kloc)
-                        if v is None and "billing" in payload and isinstance(payload["billing"], dict):
-                            v = payload["billing"].get(kloc)
-                        if v is None:
-                            v = payload.get(kloc)
-                    if v is not None:
-                        try:
-                            amount_cents = int(v)
-                            break
-                        except (ValueError, TypeError):
-                            continue
-                if amount_cents is None:
-                    try:
-                        amount_cents = int(payload.get("amount") or payload.get("amount_cents") or 0)
-                    except Exception:
-                        amount_cents = 0
-
-                # localizar Payment: primeiro por abacate_id, em seguida por external_id
-                payment_qs = Payment.objects.none()
-                if abacate_value:
-                    # normalizar para string
-                    payment_qs = Payment.objects.filter(abacate_id=str(abacate_value))
-                if not payment_qs.exists() and ext_value:
-                    payment_qs = Payment.objects.filter(external_id=str(ext_value))
-
-                # fallback: se ainda não encontrou, tentar contains em external_id (caso payload traga prefix/sufix)
-                if not payment_qs.exists() and ext_value:
-                    payment_qs = Payment.objects.filter(external_id__icontains=str(ext_value))
-
-                if not payment_qs.exists():
-                    logger.warning(
-                        "Nenhum Payment encontrado para external_id=%s abacate_id=%s (evento %s). payload keys: %s",
-                        ext_value, abacate_value, event_id, list(payload.keys()) if isinstance(payload, dict) else None
-                    )
-                else:
-                    for p in payment_qs:
-                        if not p.abacate_id and abacate_value:
-                            p.abacate_id = str(abacate_value)
-
-                        # processar apenas se ainda não estiver pago
-                        if p.status != Payment.STATUS_PAID:
-                            # converter amount para Decimal reais
-                            try:
-                                valor_reais = (Decimal(amount_cents) / Decimal(100)).quantize(Decimal("0.01"))
-                            except (InvalidOperation, TypeError):
-                                valor_reais = Decimal("0.00")
-
-                            if p.payment_type == Payment.PAYMENT_TYPE_DEPOSITO:
-                                p.status = Payment.STATUS_PAID
-                                if not p.paid_at:
-                                    p.paid_at = timezone.now()
-
-                                # se Payment.user ausente, tentar metadata.user_id no payload
-                                if p.user:
-                                    carteira, _ = Carteira.objects.get_or_create(user=p.user)
-                                    carteira.depositar(valor_reais)
-                                    logger.info("Carteira atualizada (DEPÓSITO) usuario=%s +R$ %s (payment=%s)",
-                                                getattr(p.user, "nome", str(p.user)), valor_reais, p.id)
-                                else:
-                                    # procurar user_id dentro do payload
-                                    candidate_user, cand_path = _find_in_payload(payload, ["user_id", "userid"])
-                                    if candidate_user:
-                                        try:
-                                            user = User.objects.get(pk=int(candidate_user))
-                                            p.user = user
-                                            p.save(update_fields=["user"])
-                                            carteira, _ = Carteira.objects.get_or_create(user=user)
-                                            carteira.depositar(valor_reais)
-                                            logger.info("Associado user.id=%s ao Payment %s e depositei R$ %s", user.id, p.id, valor_reais)
-                                        except Exception:
-                                            logger.exception("Falha ao associar user_id %s ao payment %s", candidate_user, p.id)
-                                    else:
-                                        logger.warning("Payment %s sem user e metadata.user_id ausente — não foi possível creditar.", p.id)
-                            else:
-                                # para corrida, marcar pago (implementação em Payment.mark_paid)
-                                p.mark_paid(when=timezone.now())
-
-                        # atualizar payload e campos
-                        p.payload = payload
-                        if isinstance(payload, dict):
-                            billing_url = payload.get("billing_url") or payload.get("billingUrl")
-                            if billing_url:
-                                p.billing_url = billing_url
-                        if ext_value:
-                            p.external_id = p.external_id or str(ext_value)
-
-                        update_fields = ["payload", "updated_at"]
-                        if p.abacate_id:
-                            update_fields.append("abacate_id")
-                        if getattr(p, "billing_url", None):
-                            update_fields.append("billing_url")
-                        if p.external_id:
-                            update_fields.append("external_id")
-                        if p.status:
-                            update_fields.append("status")
-                        if p.paid_at:
-                            update_fields.append("paid_at")
-
-                        # remover duplicados mantendo ordem
-                        seen = set()
-                        final_update_fields = []
-                        for f in update_fields:
-                            if f not in seen:
-                                final_update_fields.append(f)
-                                seen.add(f)
-
-                        p.save(update_fields=final_update_fields)
-
-            elif event_type and ("withdraw" in str(event_type).lower()):
-                # tratar withdraw.done / withdraw.failed (simplificado)
-                txn = payload.get("transaction") or {}
-                txn_external = txn.get("externalId") or txn.get("external_id")
-                if txn_external:
-                    payments = Payment.objects.filter(external_id=txn_external)
-                    for p in payments:
-                        p.payload = payload
-                        p.save(update_fields=["payload"])
-                if "failed" in str(event_type).lower():
-                    for p in payments:
-                        p.status = Payment.STATUS_FAILED
-                        p.payload = payload
-                        p.save(update_fields=["status", "payload"])
-
-            else:
-                logger.info("Evento não tratado: %s (payload keys: %s)", event_type, list(payload.keys()) if isinstance(payload, dict) else None)
-
-            # registrar evento processado
-            WebhookEventProcessed.objects.create(
-                event_id=event_id,
-                event_type=event_type or "",
-                payload=payload
+            evento = WebhookInbox.objects.create(
+                event_id=str(event_id),
+                event_type=str(event_type or "")[:100],
+                cobranca=chave_cobranca(payload),
+                payload=payload,
             )
+            enfileirar("pagamentos.processar_webhook", {"evento_id": evento.id}, prioridade=20)
+    except IntegrityError:
+        logger.info("Evento %s já recebido, ignorando", event_id)
+        return JsonResponse({"status": "already_received"}, status=200)
 
-        return JsonResponse({"status": "ok"}, status=200)
+    return JsonResponse({"status": "accepted"}, status=200)
 
-    except Exception as exc:
-        logger.exception("Erro processando webhook: %s", exc)
-        return JsonResponse({"status": "error"}, status=500)
 
+# prazo da reserva de uma renovação de QR enquanto a AbacatePay responde
+RENOVACAO_RESERVA_S = 60
 
 
 @login_required
-@transaction.atomic
 def refresh_qr(request, payment_id):
-    """Recria o QR ou cria um novo Payment se o anterior falhou/expirou."""
-    old_payment = get_object_or_404(Payment, pk=payment_id)
-
-    # Controle de acesso: apenas o dono do pagamento
-    if old_payment.user and old_payment.user != request.user:
-        return JsonResponse({"error": "Acesso negado"}, status=403)
-
-    # Só permite refresh se status for FAILED ou EXPIRED
-    if old_payment.status not in [Payment.STATUS_FAILED, Payment.STATUS_EXPIRED]:
-        return JsonResponse({"error": "QR ainda válido", "status": old_payment.status}, status=400)
-
-    # --- Cria novo pagamento via AbacatePay ---
-    from .services import criar_pix_carteira
+    """
+    Recria o QR de um Payment que falhou/expirou. Reserva numa transação curta,
+    chama a AbacatePay fora dela (sem segurar o lock de escrita do SQLite) e
+    grava o resultado com um UPDATE condicional à reserva.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        # lock na linha: cliques simultâneos no refresh viram uma única cobrança nova
+        old_payment = get_object_or_404(Payment.objects.select_for_update(), pk=payment_id)
+
+        # Controle de acesso: apenas o dono do pagamento
+        if old_payment.user and old_payment.user != request.user:
+            return JsonResponse({"error": "Acesso negado"}, status=403)
+
+        # QR ainda pagável: devolve o mesmo em vez de gerar outra cobrança
+        if qr_valido(old_payment):
+            return JsonResponse({
+                "ok": True,
+                "reutilizado": True,
+                "billing_url": old_payment.billing_url,
+                "status": old_payment.status,
+                "payment_id": old_payment.id,
+            })
+
+        # outra requisição já reservou a renovação e espera a AbacatePay
+        if (old_payment.status == Payment.STATUS_PENDING and not old_payment.abacate_id
+                and old_payment.expires_at and old_payment.expires_at > agora):
+            return JsonResponse({"error": "Renovação do QR em andamento", "status": old_payment.status}, status=409)
+
+        # Só permite refresh se status for FAILED/EXPIRED ou se o QR em aberto já venceu (expires_at)
+        if old_payment.status not in [Payment.STATUS_FAILED, Payment.STATUS_EXPIRED] and not vencido(old_payment):
+            return JsonResponse({"error": "QR indisponível para renovação", "status": old_payment.status}, status=400)
+
+        # reserva: o QR antigo sai de cena já aqui, e a renovação ganha um prazo curto
+        external_id = f"carteira-{request.user.id}-deposito-{old_payment.id}-{uuid.uuid4().hex[:6]}"
+        Payment.objects.filter(id=old_payment.id).update(
+            status=Payment.STATUS_PENDING, abacate_id=None, billing_url=None, brCode=None, qr_hash=None,
+            external_id=external_id, expires_at=agora + timedelta(seconds=RENOVACAO_RESERVA_S), updated_at=agora,
+        )
+        status_cache.sinalizar([old_payment.id])
 
+    # --- Cria novo pagamento via AbacatePay (fora da transação) ---
     customer_info = {
         "id": request.user.id,
         "name": request.user.nome,
@@ -335,8 +183,6 @@ def refresh_qr(request, payment_id):
         "cellphone": "(00) 0000-0000",  # opcional, se precisar
         "taxId": "00000000000"           # opcional, se precisar
     }
-
-    external_id = f"carteira-{request.user.id}-deposito-{old_payment.id}-{uuid.uuid4().hex[:6]}"
     result = criar_pix_carteira(
         amount_cents=old_payment.amount_cents,
         description=f"Depósito na carteira - {request.user.nome}",
@@ -346,85 +192,133 @@ def refresh_qr(request, payment_id):
         completion_url=request.build_absolute_uri("/pagamentos/carteira/")
     )
 
-    # Atualiza campos críticos do payment antigo ou cria um novo se necessário
-    old_payment.abacate_id = result.get("id")
-    old_payment.billing_url = result.get("billing_url") or result.get("url") or result.get("payment_url")
-    old_payment.external_id = external_id
-    old_payment.status = Payment.STATUS_PENDING
-    old_payment.save(update_fields=["abacate_id", "billing_url", "external_id", "status"])
+    # só grava se a reserva ainda é desta requisição
+    reserva = Payment.objects.filter(id=old_payment.id, external_id=external_id, status=Payment.STATUS_PENDING)
+    if not result.get("id"):
+        if reserva.update(status=Payment.STATUS_FAILED, expires_at=None, updated_at=timezone.now()):
+            status_cache.sinalizar([old_payment.id])
+        return JsonResponse({"error": "Erro ao renovar o QR", "status": Payment.STATUS_FAILED}, status=502)
+
+    billing_url = result.get("billing_url") or result.get("url") or result.get("payment_url")
+    br_code_base64 = result.get("brCodeBase64")
+    aplicado = reserva.update(
+        abacate_id=result.get("id"),
+        billing_url=billing_url,
+        brCode=result.get("brCode"),
+        qr_hash=qr.guardar_base64(br_code_base64) if br_code_base64 else None,
+        expires_at=validade(result),
+        updated_at=timezone.now(),
+    )
+    if not aplicado:
+        logger.warning("Payment %s mudou durante a renovação do QR; cobrança %s descartada",
+                       old_payment.id, result.get("id"))
+        return JsonResponse({"error": "Pagamento alterado durante a renovação"}, status=409)
+    status_cache.sinalizar([old_payment.id])
 
     return JsonResponse({
         "ok": True,
-        "billing_url": old_payment.billing_url,
-        "status": old_payment.status,
+        "billing_url": billing_url,
+        "status": Payment.STATUS_PENDING,
         "payment_id": old_payment.id
     })
 
 
 
-@transaction.atomic
 @login_required
+@transaction.atomic
 def iniciar_pagamento(request, corrida_id):
-    """Cria Payment e retorna template de acompanhamento."""
+    """
+    Garante a cobrança PIX do passageiro na corrida e abre o acompanhamento.
+    Um Payment por (corrida, passageiro), pela chave de idempotência: repetir a
+    requisição não cria outro Payment nem outra cobrança.
+    """
     corrida = get_object_or_404(Corrida, pk=corrida_id)
+    if not SolicitacaoCarona.objects.filter(
+        corrida=corrida, passageiro=request.user, status=SolicitacaoCarona.STATUS_ACEITA
+    ).exists():
+        return JsonResponse({"error": "Acesso negado: não é passageiro desta corrida"}, status=403)
+
+    if Payment.objects.filter(corrida=corrida, user=request.user, status=Payment.STATUS_PAID).exists():
+        messages.info(request, "Esta corrida já está paga.")
+        return redirect("corrida:acompanhamento", corrida_id=corrida.id)
+
+    valor = corrida.valor or (corrida.parent_template.valor if corrida.parent_template else None)
+    if not valor:
+        messages.error(request, "Valor da corrida não definido.")
+        return redirect("corrida:acompanhamento", corrida_id=corrida.id)
+
+    payment, criado = Payment.objects.get_or_create(
+        idempotency_key=chave_corrida_pix(request.user.id, corrida.id),
+        defaults={
+            "corrida": corrida,
+            "user": request.user,
+            "amount_cents": int(round(Decimal(valor) * 100)),
+            "status": Payment.STATUS_PENDING,
+        },
+    )
+    if criado:
+        payment.external_id = f"corrida-{corrida.id}-payment-{payment.id}"
+        payment.save(update_fields=["external_id"])
+        # HTTP na AbacatePay fica com o worker da fila (pagamentos.cobrancas)
+        registrar_cobranca(payment, f"Pagamento corrida #{corrida.id}")
+    return redirect("corrida:acompanhamento", corrida_id=corrida.id)
 
-    # controle de acesso opcional
-    # if request.user != corrida.motorista: ...
-
-    result = create_payment_for_corrida(corrida, user=request.user if request.user.is_authenticated else None)
-    if not result:
-        return render(request, "pagamentos/pagamento_resultado.html", {"erro": "Erro ao criar pagamento"})
-
-    payment = result.get("payment")
-    data = result.get("data") or {}
-
-    # atualiza campos críticos se necessário
-    updates = {
-        "abacate_id": data.get("id"),
-        "brCode": data.get("brCode"),
-        "brCodeBase64": data.get("brCodeBase64"),
-        "billing_url": data.get("billing_url") or data.get("url") or data.get("payment_url"),
-        "external_id": data.get("external_id") or data.get("externalId") or f"corrida-{corrida.id}-payment-{payment.id}"
-    }
-
-    updated_fields = []
-    for k, v in updates.items():
-        if _safe_setattr(payment, k, v):
-            updated_fields.append(k)
-    if updated_fields:
-        payment.save(update_fields=updated_fields)
 
-    context = {
-        "data": data,
-        "payment_id": payment.id,
-        "payment": {
-            "id": payment.id,
-            "status": payment.status,
-            "amount_display": payment.amount_display(),
-            "brCode": payment.brCode,
-            "brCodeBase64": payment.brCodeBase64,
-            "billing_url": getattr(payment, "billing_url", None),
-            "expires_in": int(data.get("expires_in") or 3600),
-        },
-        "raw": payment.payload,
-    }
-    return render(request, "corrida/acompanhamento.html", context)
+LANCAMENTOS_POR_PAGINA = 30
 
 
 @login_required
 def carteira_view(request):
     carteira, _ = Carteira.objects.get_or_create(user=request.user)
-    pagamentos = Payment.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "pagamentos/carteira.html", {"carteira": carteira, "pagamentos": pagamentos})
 
+    # extrato pelo ledger, paginado por id (keyset): ?antes=<id do último lançamento visto>
+    lancamentos = LedgerEntry.objects.filter(carteira=carteira).order_by("-id")
+    try:
+        antes = int(request.GET.get("antes", ""))
+    except ValueError:
+        antes = None
+    if antes:
+        lancamentos = lancamentos.filter(id__lt=antes)
+    lancamentos = list(lancamentos[:LANCAMENTOS_POR_PAGINA + 1])
+    proximo = None
+    if len(lancamentos) > LANCAMENTOS_POR_PAGINA:
+        lancamentos = lancamentos[:LANCAMENTOS_POR_PAGINA]
+        proximo = lancamentos[-1].id
+
+    # depósitos ainda aguardando o PIX (não estão no ledger)
+    pendentes = (
+        Payment.objects
+        .filter(user=request.user, payment_type=Payment.PAYMENT_TYPE_DEPOSITO,
+                status__in=[Payment.STATUS_PENDING, Payment.STATUS_CREATED])
+        .only("id", "amount_cents", "status", "created_at", "payment_type")
+        .order_by("-created_at")[:5]
+    )
+    return render(request, "pagamentos/carteira.html", {
+        "carteira": carteira,
+        "lancamentos": lancamentos,
+        "pendentes": pendentes,
+        "proximo_cursor": proximo,
+        "primeira_pagina": not antes,
+        "a_liquidar": a_liquidar_do_motorista(request.user.id),
+    })
+
+
+
+def _resposta_deposito_existente(pagamento):
+    """Resposta de adicionar_saldo_view para um depósito já criado (requisição repetida)."""
+    if pagamento.billing_url and qr_valido(pagamento):
+        return JsonResponse({"success": True, "url": pagamento.billing_url, "abacate_id": pagamento.abacate_id,
+                             "repetido": True})
+    return JsonResponse({"success": False, "message": "Este depósito não está mais disponível para pagamento",
+                         "status": pagamento.status, "repetido": True})
 
 
 @login_required
-@transaction.atomic
 def adicionar_saldo_view(request):
     """
     View para adicionar saldo à carteira.
     Cria um Payment local, chama a API AbacatePay e retorna JSON com URL do pagamento.
+    A chamada HTTP fica fora de transação: o Payment é gravado (commit) antes dela.
     """
     if request.method != "POST":
         return JsonResponse({"error": "Método inválido"}, status=405)
@@ -436,15 +330,38 @@ def adicionar_saldo_view(request):
             raise ValueError()
     except:
         return JsonResponse({"error": "Valor inválido"}, status=400)
+    amount_cents = int(valor * 100)
+
+    # 0️⃣ Idempotência: mesma chave (header Idempotency-Key) devolve o depósito já criado;
+    # sem chave, um depósito em aberto do mesmo valor com QR ainda válido é reaproveitado
+    chave_idem = chave_do_cliente(request, "deposito")
+    if chave_idem:
+        existente = Payment.objects.filter(idempotency_key=chave_idem).first()
+    else:
+        existente = next((
+            p for p in Payment.objects.filter(
+                user=request.user, payment_type=Payment.PAYMENT_TYPE_DEPOSITO, amount_cents=amount_cents,
+                status__in=[Payment.STATUS_PENDING, Payment.STATUS_CREATED],
+            ).order_by("-created_at")[:5]
+            if qr_valido(p)
+        ), None)
+    if existente:
+        return _resposta_deposito_existente(existente)
 
     # 1️⃣ Criar Payment localmente (external_id gerado agora para garantir sincronia)
-    pagamento = Payment.objects.create(
-        user=request.user,
-        amount_cents=int(valor * 100),
-        status=Payment.STATUS_PENDING,
-        payment_type=Payment.PAYMENT_TYPE_DEPOSITO,
-        external_id=f"carteira-{request.user.id}-deposito-{uuid.uuid4().hex[:8]}",  # id único já na criação
-    )
+    try:
+        with transaction.atomic():
+            pagamento = Payment.objects.create(
+                user=request.user,
+                amount_cents=amount_cents,
+                status=Payment.STATUS_PENDING,
+                payment_type=Payment.PAYMENT_TYPE_DEPOSITO,
+                external_id=f"carteira-{request.user.id}-deposito-{uuid.uuid4().hex[:8]}",  # id único já na criação
+                idempotency_key=chave_idem,
+            )
+    except IntegrityError:
+        # requisição concorrente com a mesma chave chegou primeiro
+        return _resposta_deposito_existente(Payment.objects.get(idempotency_key=chave_idem))
 
     # 2️⃣ Chamar AbacatePay
     try:
@@ -492,6 +409,9 @@ def adicionar_saldo_view(request):
         pagamento.payload = data or result
         if "payload" not in changed_fields:
             changed_fields.append("payload")
+        if abacate_id or billing_url:
+            pagamento.expires_at = validade(data)
+            changed_fields.append("expires_at")
 
         pagamento.save(update_fields=changed_fields)
 
@@ -505,11 +425,25 @@ def adicionar_saldo_view(request):
     except Exception as e:
         logger.exception("Erro ao processar pagamento AbacatePay")
         # opcional: marcar pagamento como FAILED ou deixar como CREATED/PENDING para tentativa posterior
-        pagamento.status = Payment.STATUS_FAILED
-        pagamento.save(update_fields=["status"])
+        # condicional: um webhook pode ter mudado o status enquanto a chamada rodava
+        if Payment.objects.filter(id=pagamento.id, status=Payment.STATUS_PENDING).update(
+            status=Payment.STATUS_FAILED, updated_at=timezone.now()
+        ):
+            status_cache.sinalizar([pagamento.id])
         return JsonResponse({"success": False, "message": "Erro ao processar pagamento"})
 
 
+def _debitar_corrida(user, corrida, valor_corrida, payment):
+    registrar_lancamentos([Movimento(
+        user_id=user.id,
+        valor=-valor_corrida,
+        tipo=LedgerEntry.TIPO_PAGAMENTO_CORRIDA,
+        payment_id=payment.id,
+        descricao=f"Corrida #{corrida.id}",
+    )])
+    provisionar_repasse(payment)
+
+
 @login_required
 @transaction.atomic
 def pagar_corrida_view(request, corrida_id):
@@ -536,42 +470,48 @@ def pagar_corrida_view(request, corrida_id):
     
     valor_corrida = Decimal(valor_corrida)
 
-    # carteira do passageiro
-    passageiro_carteira, _ = Carteira.objects.get_or_create(user=request.user)
-
-    if passageiro_carteira.saldo < valor_corrida:
+    # retenção da plataforma: mesma regra da liquidação (pagamentos.liquidacao)
+    valor_retenido, valor_liquido_motorista = calcular_retencao(valor_corrida)
+
+    # débito do passageiro (UPDATE com F() + ledger) e repasse provisionado, tudo ou nada;
+    # o motorista recebe na liquidação do período, não aqui
+    # um pagamento por (corrida, passageiro): a chave faz o duplo clique/retry devolver o mesmo
+    chave_idem = chave("corrida-carteira", request.user.id, corrida.id)
+    if Payment.objects.filter(corrida=corrida, user=request.user, status=Payment.STATUS_PAID).exclude(
+        idempotency_key=chave_idem
+    ).exists():
+        return JsonResponse({"ok": False, "error": "Corrida já paga"}, status=400)
+    try:
+        with transaction.atomic():
+            payment, criado = Payment.objects.get_or_create(
+                idempotency_key=chave_idem,
+                defaults={
+                    "corrida": corrida,
+                    "user": request.user,
+                    "amount_cents": int(valor_corrida * 100),
+                    "status": Payment.STATUS_PAID,
+                    "payment_method": "CARTEIRA",
+                    "external_id": f"corrida-{corrida.id}-carteira",
+                    "payload": {
+                        "retencao_percent": float(PORCENTAGEM_RETENCAO),
+                        "valor_retenido": float(valor_retenido),
+                        "valor_liquido_motorista": float(valor_liquido_motorista),
+                    },
+                },
+            )
+            if criado:
+                _debitar_corrida(request.user, corrida, valor_corrida, payment)
+                # a cobrança PIX do passageiro nesta corrida deixa de valer: sem pagamento em dobro
+                for aberto in Payment.objects.select_for_update().filter(
+                    idempotency_key=chave_corrida_pix(request.user.id, corrida.id), status__in=STATUS_ABERTOS
+                ):
+                    aberto.status = Payment.STATUS_EXPIRED
+                    aberto.save(update_fields=["status", "updated_at"])
+    except SaldoInsuficiente:
         return JsonResponse({"ok": False, "error": "Saldo insuficiente"}, status=400)
 
-    # carteira do motorista
-    motorista_carteira, _ = Carteira.objects.get_or_create(user=corrida.motorista)
-
-    # porcentagem de retenção (flexível via settings)
-    RETENCAO_PORCENTAGEM = Decimal(getattr(settings, "PORCENTAGEM_RETENCAO", 0.10))
-    valor_retenido = (valor_corrida * RETENCAO_PORCENTAGEM).quantize(Decimal("0.01"))
-    valor_liquido_motorista = (valor_corrida - valor_retenido).quantize(Decimal("0.01"))
-
-    # debitar passageiro
-    passageiro_carteira.saldo -= valor_corrida
-    passageiro_carteira.save(update_fields=["saldo"])
-
-    # creditar motorista
-    motorista_carteira.saldo += valor_liquido_motorista
-    motorista_carteira.save(update_fields=["saldo"])
-
-    # registra pagamento no histórico (Payment)
-    payment = Payment.objects.create(
-        corrida=corrida,
-        user=request.user,
-        amount_cents=int(valor_corrida * 100),
-        status=Payment.STATUS_PAID,
-        payment_method="CARTEIRA",
-        external_id=f"corrida-{corrida.id}-carteira",
-        payload={
-            "retencao_percent": float(RETENCAO_PORCENTAGEM),
-            "valor_retenido": float(valor_retenido),
-            "valor_liquido_motorista": float(valor_liquido_motorista),
-        }
-    )
+
+    novo_saldo = Carteira.objects.filter(user=request.user).values_list("saldo", flat=True).get()
 
     return JsonResponse({
         "ok": True,
@@ -579,17 +519,87 @@ def pagar_corrida_view(request, corrida_id):
         "valor_corrida": float(valor_corrida),
         "retencao": float(valor_retenido),
         "valor_motorista": float(valor_liquido_motorista),
-        "novo_saldo_passageiro": float(passageiro_carteira.saldo),
-        "novo_saldo_motorista": float(motorista_carteira.saldo),
+        "novo_saldo_passageiro": float(novo_saldo),
+        "repetido": not criado,
         "mensagem": "Pagamento realizado com sucesso!"
     })
 
 
 
+# a URL do QR carrega o sha256 do conteúdo: a imagem nunca muda
+QR_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _etag_qr(request, qr_hash):
+    return qr_hash if qr.hash_valido(qr_hash) else None
+
+
+@login_required
+@require_GET
+@cache_control(private=True, max_age=QR_CACHE_MAX_AGE, immutable=True)
+@condition(etag_func=_etag_qr)
+def qr_imagem(request, qr_hash):
+    """PNG do QR PIX, servido do blob store (pagamentos.qr)."""
+    dados = qr.ler_png(qr_hash)
+    if dados is None:
+        raise Http404("QR Code não encontrado")
+    return HttpResponse(dados, content_type="image/png")
+
+
 @login_required
 def payment_status(request, payment_id):
     """Retorna status de um payment (opcional)."""
     payment = Payment.objects.filter(id=payment_id).first()
     if not payment:
         return JsonResponse({"error": "Payment não encontrado"}, status=404)
-    return JsonResponse({"status": payment.status})
+    return JsonResponse({"status": status_efetivo(payment)})
+
+
+# long-poll: tempo máximo segurando a requisição e intervalos de checagem
+LONGPOLL_MAX_S = getattr(settings, "PAGAMENTOS_LONGPOLL_MAX_S", 25)
+LONGPOLL_INTERVALO_S = 0.5
+# rede de segurança para quando o aviso vem de outro processo e o cache não é compartilhado
+LONGPOLL_CHECAGEM_DB_S = 5
+
+
+@require_GET
+async def aguardar_status(request, payment_id):
+    """
+    Long-poll do status de um Payment. Com If-None-Match igual ao ETag atual,
+    segura a requisição até o status mudar (aviso via status_cache) ou até
+    ?aguardar= segundos (máx. LONGPOLL_MAX_S), respondendo 304 no timeout.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"error": "Não autenticado"}, status=403)
+    payment = await Payment.objects.select_related("corrida").filter(id=payment_id).afirst()
+    if payment is None:
+        return JsonResponse({"error": "Payment não encontrado"}, status=404)
+    if user.id not in await sync_to_async(interessados)(payment):
+        return JsonResponse({"error": "Acesso negado"}, status=403)
+
+    try:
+        espera = max(0.0, min(float(request.GET.get("aguardar", LONGPOLL_MAX_S)), LONGPOLL_MAX_S))
+    except ValueError:
+        espera = LONGPOLL_MAX_S
+    etag_cliente = (request.headers.get("If-None-Match") or "").removeprefix("W/")
+
+    loop = asyncio.get_running_loop()
+    prazo = loop.time() + espera
+    status = status_efetivo(payment)
+    versao = await status_cache.aversao(payment_id)
+    ultima_leitura = loop.time()
+    while status_cache.etag(payment_id, status) == etag_cliente and loop.time() < prazo:
+        await asyncio.sleep(LONGPOLL_INTERVALO_S)
+        nova_versao = await status_cache.aversao(payment_id)
+        if nova_versao != versao or loop.time() - ultima_leitura >= LONGPOLL_CHECAGEM_DB_S:
+            versao = nova_versao
+            atual = await Payment.objects.only("status", "expires_at", "created_at").filter(id=payment_id).afirst()
+            status = status_efetivo(atual) if atual else status
+            ultima_leitura = loop.time()
+
+    tag = status_cache.etag(payment_id, status)
+    response = HttpResponseNotModified() if tag == etag_cliente else JsonResponse({"id": payment_id, "status": status})
+    response["ETag"] = tag
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,401 @@
+# pagamentos/webhook.py
+"""
+Ingestão assíncrona dos webhooks do AbacatePay.
+
+A view (views.abacatepay_webhook) só verifica a assinatura, grava o evento bruto
+em WebhookInbox (event_id único) junto com um job da fila (pagamentos.tarefas)
+e responde 200. O job aplica o evento via `processar_da_inbox`; `processar_inbox`
+— chamado pelo comando processar_webhooks — varre os pendentes em ordem de
+chegada. Cada evento é aplicado na sua transação, com novas tentativas em
+backoff exponencial e dead-letter (status MORTO) depois de
+WEBHOOK_MAX_TENTATIVAS falhas. Eventos da mesma cobrança (WebhookInbox.cobranca)
+são aplicados em ordem de chegada: enquanto um anterior estiver pendente, o
+seguinte é adiado.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .eventos_processados import ja_processado, registrar_processado
+from .models import Carteira, Payment, PendenciaConciliacao, WebhookInbox
+from .referencias import decompor_external_id
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+WEBHOOK_MAX_TENTATIVAS = getattr(settings, "ABACATEPAY_WEBHOOK_MAX_TENTATIVAS", 8)
+# espera antes da tentativa n: BACKOFF_BASE_S * 2**(n-1), limitada a BACKOFF_MAX_S
+BACKOFF_BASE_S = 30
+BACKOFF_MAX_S = 3600
+LOTE_PADRAO = 100
+# folga depois da próxima tentativa do evento anterior da mesma cobrança
+ESPERA_ORDEM_S = 5
+
+
+def assinatura_webhook(corpo: bytes) -> str:
+    """Assinatura esperada no header: HMAC-SHA256 do corpo em base64, com ABACATEPAY_PUBLIC_KEY (ou o secret)."""
+    chave = getattr(settings, "ABACATEPAY_PUBLIC_KEY", None) or getattr(settings, "ABACATEPAY_WEBHOOK_SECRET", None) or ""
+    return base64.b64encode(hmac.new(chave.encode("utf-8"), corpo, hashlib.sha256).digest()).decode()
+
+
+def _find_in_payload(obj, keys):
+    """
+    Busca recursiva em dict/list por chaves em `keys` (lista de strings).
+    Retorna tuple (value, path_list) com o primeiro match encontrado, ou (None, None).
+    Normaliza comparações ignorando case e '_' (external_id == externalId).
+    """
+    normalized_keys = set(k.lower().replace("_", "") for k in keys)
+
+    def norm(k):
+        return str(k).lower().replace("_", "")
+
+    visited = set()
+
+    def _walk(o, path):
+        oid = id(o)
+        if oid in visited:
+            return None, None
+        visited.add(oid)
+
+        if isinstance(o, dict):
+            # check direct keys first
+            for k, v in o.items():
+                if norm(k) in normalized_keys:
+                    return v, path + [k]
+            # then recurse
+            for k, v in o.items():
+                val, p = _walk(v, path + [k])
+                if val is not None:
+                    return val, p
+        elif isinstance(o, (list, tuple)):
+            for idx, item in enumerate(o):
+                val, p = _walk(item, path + [f"[{idx}]"])
+                if val is not None:
+                    return val, p
+        return None, None
+
+    return _walk(obj, [])
+
+
+def localizar_payments(abacate_id, external_id, amount_cents=None):
+    """
+    Resolve o(s) Payment(s) de um evento por chaves determinísticas, nesta ordem:
+    abacate_id, external_id exato, referência decomposta do external_id
+    (payment_id; ou tipo+objeto com um único candidato em aberto de mesmo valor).
+    Retorna (lista, motivo) — motivo explica a falha quando a lista vem vazia.
+    """
+    if abacate_id:
+        encontrados = list(Payment.objects.filter(abacate_id=str(abacate_id)))
+        if encontrados:
+            return encontrados, ""
+    if not external_id:
+        return [], "evento sem external_id e abacate_id desconhecido"
+
+    encontrados = list(Payment.objects.filter(external_id=str(external_id)))
+    if encontrados:
+        return encontrados, ""
+
+    ref = decompor_external_id(external_id)
+    if ref.tipo is None:
+        return [], "external_id em formato desconhecido"
+    if ref.payment_id is not None:
+        encontrados = list(
+            Payment.objects.filter(pk=ref.payment_id, ref_tipo=ref.tipo, ref_objeto_id=ref.objeto_id)
+        )
+        return encontrados, "" if encontrados else "payment_id da referência não existe"
+
+    candidatos = Payment.objects.filter(ref_tipo=ref.tipo, ref_objeto_id=ref.objeto_id).exclude(status=Payment.STATUS_PAID)
+    if amount_cents:
+        candidatos = candidatos.filter(amount_cents=amount_cents)
+    candidatos = list(candidatos[:2])
+    if len(candidatos) == 1:
+        return candidatos, ""
+    return [], "referência ambígua" if candidatos else "nenhum pagamento em aberto para a referência"
+
+
+def aplicar_pagamento(p, valor_reais, payload):
+    """
+    Efeito de um pagamento confirmado (webhook ou conciliação): depósito credita a
+    carteira; corrida é marcada paga. O chamador grava status/paid_at do depósito.
+    PIX de corrida que o passageiro já pagou pela carteira vira crédito na carteira.
+    """
+    if p.payment_type == Payment.PAYMENT_TYPE_DEPOSITO:
+        p.status = Payment.STATUS_PAID
+        if not p.paid_at:
+            p.paid_at = timezone.now()
+
+        # se Payment.user ausente, tentar metadata.user_id no payload
+        if p.user:
+            carteira, _ = Carteira.objects.get_or_create(user=p.user)
+            carteira.depositar(valor_reais, payment=p, descricao="Depósito via PIX")
+            logger.info("Carteira atualizada (DEPÓSITO) usuario=%s +R$ %s (payment=%s)",
+                        getattr(p.user, "nome", str(p.user)), valor_reais, p.id)
+        else:
+            # procurar user_id dentro do payload
+            candidate_user, cand_path = _find_in_payload(payload, ["user_id", "userid"])
+            if candidate_user:
+                try:
+                    user = User.objects.get(pk=int(candidate_user))
+                    p.user = user
+                    p.save(update_fields=["user"])
+                    carteira, _ = Carteira.objects.get_or_create(user=user)
+                    carteira.depositar(valor_reais, payment=p, descricao="Depósito via PIX")
+                    logger.info("Associado user.id=%s ao Payment %s e depositei R$ %s", user.id, p.id, valor_reais)
+                except Exception:
+                    logger.exception("Falha ao associar user_id %s ao payment %s", candidate_user, p.id)
+            else:
+                logger.warning("Payment %s sem user e metadata.user_id ausente — não foi possível creditar.", p.id)
+    elif p.user_id and Payment.objects.filter(
+        corrida_id=p.corrida_id, user_id=p.user_id, status=Payment.STATUS_PAID
+    ).exclude(id=p.id).exists():
+        # o passageiro já pagou a corrida por outro meio (carteira): sem segundo
+        # repasse; o valor recebido volta para a carteira dele e fica a pendência
+        p.status = Payment.STATUS_PAID
+        if not p.paid_at:
+            p.paid_at = timezone.now()
+        valor_reais = valor_reais or (Decimal(p.amount_cents) / Decimal(100)).quantize(Decimal("0.01"))
+        carteira, _ = Carteira.objects.get_or_create(user_id=p.user_id)
+        carteira.depositar(valor_reais, payment=p, descricao=f"Estorno: corrida #{p.corrida_id} já paga")
+        PendenciaConciliacao.objects.create(
+            event_id=p.abacate_id or p.external_id or str(p.id),
+            abacate_id=p.abacate_id,
+            external_id=p.external_id,
+            amount_cents=p.amount_cents,
+            motivo="corrida já paga pelo passageiro; valor creditado na carteira",
+            payload=payload,
+            payment=p,
+        )
+        logger.warning("Payment %s: corrida %s já paga pelo usuário %s; R$ %s creditados na carteira",
+                       p.id, p.corrida_id, p.user_id, valor_reais)
+    else:
+        # para corrida, marcar pago (implementação em Payment.mark_paid)
+        p.mark_paid(when=timezone.now())
+
+
+def processar_evento(event_id, event_type, payload):
+    """Aplica um evento do AbacatePay (pagamento/saque) e registra a idempotência."""
+    logger.debug("Processando evento webhook id=%s tipo=%s payload_keys=%s", event_id, event_type, list(payload.keys()) if isinstance(payload, dict) else None)
+
+    # detectar billing.paid (aceita variações como 'paid' no tipo)
+    if event_type == "billing.paid" or (isinstance(event_type, str) and "paid" in event_type.lower()):
+        # procurar external_id e abacate_id/ids aninhados
+        ext_value, ext_path = _find_in_payload(payload, ["external_id", "externalId", "externalid"])
+        abacate_value, abacate_path = _find_in_payload(payload, ["id", "bill_id", "billing_id", "billingid", "payment_id", "paymentid"])
+
+        logger.info("Webhook search results: external_id=%s (path=%s) abacate_id=%s (path=%s)",
+                    ext_value, "->".join(ext_path) if ext_path else None,
+                    abacate_value, "->".join(abacate_path) if abacate_path else None)
+
+        # buscar amount (em centavos)
+        amount_cents = None
+        # tentar locais comuns
+        for kloc in ("amount", "amount_cents", "value", "price"):
+            v = None
+            # checar payment/billing blocks se existirem
+            if isinstance(payload, dict):
+                if "payment" in payload and isinstance(payload["payment"], dict):
+                    v = payload["payment"].get(kloc)
+                if v is None and "billing" in payload and isinstance(payload["billing"], dict):
+                    v = payload["billing"].get(kloc)
+                if v is None:
+                    v = payload.get(kloc)
+            if v is not None:
+                try:
+                    amount_cents = int(v)
+                    break
+                except (ValueError, TypeError):
+                    continue
+        if amount_cents is None:
+            try:
+                amount_cents = int(payload.get("amount") or payload.get("amount_cents") or 0)
+            except Exception:
+                amount_cents = 0
+
+        # localizar Payment só por chaves indexadas; sem match vai para conciliação
+        payment_qs, motivo = localizar_payments(abacate_value, ext_value, amount_cents)
+
+        if not payment_qs:
+            logger.warning(
+                "Nenhum Payment encontrado para external_id=%s abacate_id=%s (evento %s): %s",
+                ext_value, abacate_value, event_id, motivo
+            )
+            PendenciaConciliacao.objects.create(
+                event_id=str(event_id),
+                event_type=str(event_type or "")[:100],
+                abacate_id=str(abacate_value)[:128] if abacate_value else None,
+                external_id=str(ext_value)[:255] if ext_value else None,
+                amount_cents=amount_cents or None,
+                motivo=motivo,
+                payload=payload,
+            )
+        else:
+            for p in payment_qs:
+                if not p.abacate_id and abacate_value:
+                    p.abacate_id = str(abacate_value)
+
+                # processar apenas se ainda não estiver pago
+                if p.status != Payment.STATUS_PAID:
+                    # converter amount para Decimal reais
+                    try:
+                        valor_reais = (Decimal(amount_cents) / Decimal(100)).quantize(Decimal("0.01"))
+                    except (InvalidOperation, TypeError):
+                        valor_reais = Decimal("0.00")
+                    aplicar_pagamento(p, valor_reais, payload)
+
+                # atualizar payload e campos
+                p.payload = payload
+                if isinstance(payload, dict):
+                    billing_url = payload.get("billing_url") or payload.get("billingUrl")
+                    if billing_url:
+                        p.billing_url = billing_url
+                if ext_value:
+                    p.external_id = p.external_id or str(ext_value)
+
+                update_fields = ["payload", "updated_at"]
+                if p.abacate_id:
+                    update_fields.append("abacate_id")
+                if getattr(p, "billing_url", None):
+                    update_fields.append("billing_url")
+                if p.external_id:
+                    update_fields.append("external_id")
+                if p.status:
+                    update_fields.append("status")
+                if p.paid_at:
+                    update_fields.append("paid_at")
+
+                # remover duplicados mantendo ordem
+                seen = set()
+                final_update_fields = []
+                for f in update_fields:
+                    if f not in seen:
+                        final_update_fields.append(f)
+                        seen.add(f)
+
+                p.save(update_fields=final_update_fields)
+
+    elif event_type and ("withdraw" in str(event_type).lower()):
+        # tratar withdraw.done / withdraw.failed (simplificado)
+        txn = payload.get("transaction") or {}
+        txn_external = txn.get("externalId") or txn.get("external_id")
+        payments = []
+        if txn_external:
+            payments = Payment.objects.filter(external_id=txn_external)
+            for p in payments:
+                p.payload = payload
+                p.save(update_fields=["payload"])
+        if "failed" in str(event_type).lower():
+            for p in payments:
+                p.status = Payment.STATUS_FAILED
+                p.payload = payload
+                p.save(update_fields=["status", "payload"])
+
+    else:
+        logger.info("Evento não tratado: %s (payload keys: %s)", event_type, list(payload.keys()) if isinstance(payload, dict) else None)
+
+    # registrar evento processado
+    registrar_processado(event_id, event_type, payload)
+
+
+def chave_cobranca(payload) -> str:
+    """Cobrança do evento, pelas mesmas chaves que processar_evento usa para achar o Payment."""
+    txn = payload.get("transaction") if isinstance(payload, dict) else None
+    if isinstance(txn, dict) and (txn.get("externalId") or txn.get("external_id")):
+        return str(txn.get("externalId") or txn.get("external_id"))[:255]
+    abacate_value, _ = _find_in_payload(payload, ["id", "bill_id", "billing_id", "billingid", "payment_id", "paymentid"])
+    if abacate_value:
+        return str(abacate_value)[:255]
+    ext_value, _ = _find_in_payload(payload, ["external_id", "externalId", "externalid"])
+    return str(ext_value)[:255] if ext_value else ""
+
+
+def _anterior_pendente(evento: WebhookInbox):
+    """Evento mais antigo da mesma cobrança ainda por aplicar (MORTO não segura a fila)."""
+    if not evento.cobranca:
+        return None
+    return (
+        WebhookInbox.objects
+        .filter(cobranca=evento.cobranca, status=WebhookInbox.STATUS_PENDENTE, id__lt=evento.id)
+        .order_by("id")
+        .only("id", "proxima_tentativa_em")
+        .first()
+    )
+
+
+def _backoff(tentativas: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_S * 2 ** (tentativas - 1), BACKOFF_MAX_S))
+
+
+def processar_da_inbox(evento_id: int) -> str:
+    """Processa um evento da inbox. Retorna o status final dele (ou "" se outro worker o pegou)."""
+    with transaction.atomic():
+        evento = (
+            WebhookInbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(id=evento_id, status=WebhookInbox.STATUS_PENDENTE)
+            .first()
+        )
+        if evento is None:
+            return ""
+
+        agora = timezone.now()
+        anterior = _anterior_pendente(evento)
+        if anterior is not None:
+            # um evento mais antigo da mesma cobrança ainda não foi aplicado
+            # (pago antes de estornado/expirado): este espera, sem gastar tentativa
+            evento.proxima_tentativa_em = max(anterior.proxima_tentativa_em, agora) + timedelta(seconds=ESPERA_ORDEM_S)
+            evento.save(update_fields=["proxima_tentativa_em"])
+            logger.info("Webhook %s aguarda o evento %s da mesma cobrança", evento.event_id, anterior.id)
+            return evento.status
+
+        evento.tentativas += 1
+        try:
+            with transaction.atomic():
+                if ja_processado(evento.event_id):
+                    logger.info("Evento %s já processado, ignorando", evento.event_id)
+                else:
+                    processar_evento(evento.event_id, evento.event_type, evento.payload)
+        except Exception as exc:
+            logger.exception("Erro processando webhook %s (tentativa %s)", evento.event_id, evento.tentativas)
+            evento.ultimo_erro = f"{type(exc).__name__}: {exc}"[:2000]
+            if evento.tentativas >= WEBHOOK_MAX_TENTATIVAS:
+                evento.status = WebhookInbox.STATUS_MORTO
+                logger.error("Webhook %s movido para dead-letter após %s tentativas", evento.event_id, evento.tentativas)
+            else:
+                evento.proxima_tentativa_em = agora + _backoff(evento.tentativas)
+        else:
+            evento.status = WebhookInbox.STATUS_PROCESSADO
+            evento.processado_em = agora
+            evento.ultimo_erro = ""
+        evento.save(update_fields=["status", "tentativas", "proxima_tentativa_em", "processado_em", "ultimo_erro"])
+        return evento.status
+
+
+def processar_inbox(lote: int = LOTE_PADRAO) -> dict:
+    """
+    Processa até `lote` eventos pendentes cuja próxima tentativa já venceu, em
+    ordem de chegada. Retorna contagens por status final.
+    """
+    ids = list(
+        WebhookInbox.objects
+        .filter(status=WebhookInbox.STATUS_PENDENTE, proxima_tentativa_em__lte=timezone.now())
+        .order_by("id")
+        .values_list("id", flat=True)[:lote]
+    )
+    resultado = {"processados": 0, "falhas": 0, "mortos": 0}
+    for evento_id in ids:
+        status = processar_da_inbox(evento_id)
+        if status == WebhookInbox.STATUS_PROCESSADO:
+            resultado["processados"] += 1
+        elif status == WebhookInbox.STATUS_MORTO:
+            resultado["mortos"] += 1
+        elif status == WebhookInbox.STATUS_PENDENTE:
+            resultado["falhas"] += 1
+    return resultado
@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils.text import capfirst
+from pagamentos.models import LedgerEntry
 from .models import Usuario, Profile
 
 class UsuarioAdmin(UserAdmin):
@@ -23,6 +25,27 @@ class UsuarioAdmin(UserAdmin):
         }),
     )
 
+    actions = ['desativar']
+
+    @admin.action(description='Desativar (mantém o extrato da carteira)')
+    def desativar(self, request, queryset):
+        n = queryset.update(is_active=False)
+        self.message_user(request, f'{n} usuário(s) desativado(s).')
+
+    def get_deleted_objects(self, objs, request):
+        # o extrato da carteira é append-only (LedgerEntry.carteira é PROTECT):
+        # usuário com lançamentos não é excluído, é desativado
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        lancamentos = LedgerEntry.objects.filter(carteira__user__in=objs).count()
+        if lancamentos:
+            prefixo = f'{capfirst(LedgerEntry._meta.verbose_name)}:'
+            protected = [o for o in protected if not str(o).startswith(prefixo)]
+            protected.append(
+                f'Extrato da carteira ({lancamentos} lançamento(s)): '
+                f'use a ação "Desativar" em vez de excluir o usuário'
+            )
+        return deleted, model_count, perms_needed, protected
+
 admin.site.register(Usuario, UsuarioAdmin)
 
 class ProfileAdmin(admin.ModelAdmin):